@@ -0,0 +1,79 @@
+"""
+Resource usage of recent executions, aggregated by node type.
+
+Every finished execution's resource accounting (wall and CPU time, peak RSS,
+bytes read and written, subprocesses started) is appended to a bounded
+history in the API process, which the metrics endpoint summarizes per node
+type for capacity planning.
+"""
+import collections
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, List
+
+# Executions remembered for the metrics endpoint
+METRICS_HISTORY_SIZE = int(os.getenv("SMART_FOLDER_METRICS_HISTORY", "1000"))
+
+RESOURCE_FIELDS = ("wall_seconds", "cpu_seconds", "peak_rss_bytes", "read_bytes", "write_bytes", "child_processes")
+
+_history = collections.deque(maxlen=max(METRICS_HISTORY_SIZE, 1))
+_lock = threading.Lock()
+
+def record_execution(node_type: Optional[str], result: Dict[str, Any]):
+    """Remember the outcome and resource usage of a finished execution"""
+    with _lock:
+        _history.append({
+            "node_type": node_type or "unknown",
+            "finished_at": time.time(),
+            "success": bool(result.get("success")),
+            "error_type": result.get("error_type"),
+            "resources": result.get("resources")
+        })
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def _summarize(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    metered = [entry["resources"] for entry in entries if entry["resources"]]
+    summary = {
+        "executions": len(entries),
+        "failed": sum(1 for entry in entries if not entry["success"]),
+        "stopped": sum(1 for entry in entries if entry["error_type"] in ("TimeoutError", "MemoryError", "CancelledError")),
+        "metered": len(metered)
+    }
+    for field in RESOURCE_FIELDS:
+        values = [resources.get(field, 0) for resources in metered]
+        if not values:
+            continue
+        summary[field] = {
+            "total": round(sum(values), 3),
+            "max": max(values),
+            "p50": _percentile(values, 0.5),
+            "p95": _percentile(values, 0.95)
+        }
+    return summary
+
+def get_execution_metrics(node_type: Optional[str] = None) -> Dict[str, Any]:
+    """Summarize recorded executions, overall and per node type"""
+    with _lock:
+        entries = list(_history)
+    if node_type is not None:
+        entries = [entry for entry in entries if entry["node_type"] == node_type]
+    by_type = collections.defaultdict(list)
+    for entry in entries:
+        by_type[entry["node_type"]].append(entry)
+    return {
+        "overall": _summarize(entries),
+        "node_types": {name: _summarize(group) for name, group in sorted(by_type.items())},
+        "history_size": METRICS_HISTORY_SIZE,
+        "since": entries[0]["finished_at"] if entries else None
+    }
+
+def clear_execution_metrics() -> int:
+    """Forget recorded executions and return how many were removed"""
+    with _lock:
+        removed = len(_history)
+        _history.clear()
+        return removed
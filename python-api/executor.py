@@ -1,3 +1,4 @@
+import sys
 import time
 import traceback
 from typing import Dict, Any, Optional
@@ -16,20 +17,156 @@ import glob
 import subprocess
 import tempfile
 import zipfile
+import hashlib
+import threading
+import types
+from concurrent.futures import Future, ThreadPoolExecutor
 import google.cloud
 import google.cloud.storage
 
-# Global session registry for cancellation checks
-_session_registry = {}
+from worker_pool import get_worker_pool, CANCEL_GRACE_SECONDS
+import log_buffer
+import session_manager
+import supervisor
+from execution_metrics import record_execution
+from model_registry import hold_model, release_models, use_model
+from transcription import transcribe_chunked
+from llm_client import get_anthropic_client
+from file_catalog import query_files
+from file_ops import find_old_files, delete_files
 
 def register_session_for_cancellation(log_file_id: str, session_data: Dict):
     """Register a session for cancellation checks"""
-    _session_registry[log_file_id] = session_data
+    session_manager.track_session(log_file_id, session_data)
+
+def get_log_path(log_file_id: str) -> str:
+    """Return the temp file path an execution's log spills to"""
+    return log_buffer.get_spill_path(log_file_id)
+
+# Destination for execution log text; worker processes forward it to the API process
+_log_sink = log_buffer.append_log
+
+def set_log_sink(sink):
+    """Route execution log text through sink(log_file_id, text)"""
+    global _log_sink
+    _log_sink = sink
+
+def write_log(log_file_id: str, text: str):
+    """Append text to an execution's log, never raising"""
+    try:
+        _log_sink(log_file_id, text)
+    except Exception:
+        pass
+
+def _cancel_marker_path(log_file_id: str) -> str:
+    return os.path.join(tempfile.gettempdir(), f"smart_folder_cancel_{log_file_id}")
+
+# Seconds of CPU time a single execution may use (0 for no limit)
+EXECUTION_CPU_LIMIT = float(os.getenv("SMART_FOLDER_EXECUTION_CPU_LIMIT", "0"))
+
+def _load_node_limits(value: str) -> Dict[str, Dict[str, float]]:
+    """Parse SMART_FOLDER_NODE_LIMITS, given inline as JSON or as a path to a JSON file"""
+    if not value:
+        return {}
+    if not value.lstrip().startswith("{"):
+        with open(value) as f:
+            value = f.read()
+    return json.loads(value)
+
+# Per node type caps, e.g. {"whisperTranscription": {"memory_mb": 4096, "cpu_seconds": 1800}, "*": {"timeout": 900}};
+# "*" applies to every node type, keys are timeout, cpu_seconds and memory_mb
+NODE_LIMITS = _load_node_limits(os.getenv("SMART_FOLDER_NODE_LIMITS", ""))
+
+def get_node_limits(node_type: Optional[str] = None) -> Dict[str, float]:
+    """Resource caps configured for a node type, layered over the "*" defaults"""
+    limits = dict(NODE_LIMITS.get("*", {}))
+    if node_type:
+        limits.update(NODE_LIMITS.get(node_type, {}))
+    return limits
+
+# Executions running in this process, and why any of them were stopped
+_active_executions = set()
+# Executions whose thread is running node code rather than setting up or cleaning up
+_in_user_code = set()
+_stopped_executions: Dict[str, Dict[str, str]] = {}
+_stopped_lock = threading.Lock()
+
+_watchdog = supervisor.ExecutionWatchdog()
+
+# Called with (log_file_id, reason, message) when an execution exceeds a limit;
+# worker processes report it to the pool, which kills them if they don't stop
+_limit_hook = None
+
+def set_limit_hook(hook):
+    """Route limit violations through hook(log_file_id, reason, message)"""
+    global _limit_hook
+    _limit_hook = hook
+
+def stop_execution_locally(log_file_id: str, reason: str = "cancelled", message: str = "Execution cancelled by user") -> int:
+    """
+    Flag an execution running in this process as stopped and kill every
+    process tree it started.
+    
+    Returns:
+        Number of processes killed
+    """
+    with _stopped_lock:
+        if log_file_id not in _active_executions:
+            return 0
+        _stopped_executions.setdefault(log_file_id, {"reason": reason, "message": message})
+    return supervisor.kill_children(log_file_id)
+
+def build_stopped_result(reason: str, message: str, start_time: float, log_file_id: Optional[str] = None) -> Dict[str, Any]:
+    """Result of an execution that was cancelled or ran over a limit"""
+    if reason == "cancelled":
+        error_type = "CancelledError"
+    elif reason == "memory_limit":
+        error_type = "MemoryError"
+    else:
+        error_type = "TimeoutError"
+    return build_error_result(message, error_type, start_time, log_file_id)
+
+def cancel_running_execution(log_file_id: str, reason: str = "cancelled", message: str = "Execution cancelled by user") -> Dict[str, Any]:
+    """
+    Stop an execution wherever it runs
+    
+    Code checking check_cancellation() stops at its next check and the
+    processes it started are killed right away. In a worker process, the pool
+    kills the worker if the execution hasn't stopped after a grace period.
+    The execution's future resolves immediately either way.
+    """
+    mark_execution_cancelled(log_file_id)
+    killed = stop_execution_locally(log_file_id, reason, message)
+    pool = get_worker_pool()
+    if pool is not None and pool.cancel(log_file_id, reason, message):
+        return {"cancelled": True, "processes_killed": killed, "where": "worker"}
+    resolved = _resolve_in_process(log_file_id, reason, message)
+    return {"cancelled": resolved or killed > 0, "processes_killed": killed, "where": "in-process"}
 
 def is_execution_cancelled(log_file_id: str) -> bool:
     """Check if execution should be cancelled"""
-    session = _session_registry.get(log_file_id)
-    return session and session.get("status") == "cancelled"
+    if log_file_id in _stopped_executions:
+        return True
+    session = session_manager.get_session(log_file_id)
+    if session is not None:
+        return session.get("status") == "cancelled"
+    # Worker processes don't share the registry, so fall back to the marker file
+    return os.path.exists(_cancel_marker_path(log_file_id))
+
+def mark_execution_cancelled(log_file_id: str):
+    """Flag an execution as cancelled for code running in worker processes"""
+    try:
+        with open(_cancel_marker_path(log_file_id), 'w'):
+            pass
+    except OSError:
+        pass
+
+def clear_cancellation_marker(log_file_id: str):
+    """Remove the cancellation marker once an execution has finished"""
+    try:
+        os.remove(_cancel_marker_path(log_file_id))
+    except OSError:
+        pass
 
 # Available modules that users can import
 AVAILABLE_MODULES = {
@@ -55,71 +192,509 @@ AVAILABLE_MODULES = {
     'storage': google.cloud.storage,  # Add direct access to storage module
 }
 
-def execute_python_function(function_code: str, input_value: str, timeout: int = 600, log_file_id: str = None) -> Dict[str, Any]:
+# LRU cache of compiled user code, keyed by a hash of the source
+CODE_CACHE_MAX_ENTRIES = int(os.getenv("SMART_FOLDER_CODE_CACHE_SIZE", "128"))
+
+_code_cache = collections.OrderedDict()
+_code_cache_lock = threading.Lock()
+_code_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+def _hash_source(function_code: str) -> str:
+    """Return the cache key for a piece of user code"""
+    return hashlib.sha256(function_code.encode("utf-8")).hexdigest()
+
+def _get_cached_function(source_hash: str) -> Optional[Dict[str, Any]]:
+    """Look up a compiled function, updating LRU order and hit/miss counters"""
+    with _code_cache_lock:
+        entry = _code_cache.get(source_hash)
+        if entry is None:
+            _code_cache_stats["misses"] += 1
+            return None
+        _code_cache.move_to_end(source_hash)
+        _code_cache_stats["hits"] += 1
+        return entry
+
+def _store_cached_function(source_hash: str, entry: Dict[str, Any]):
+    """Store a compiled function, evicting the least recently used entries"""
+    if CODE_CACHE_MAX_ENTRIES <= 0:
+        return
+    with _code_cache_lock:
+        _code_cache[source_hash] = entry
+        _code_cache.move_to_end(source_hash)
+        while len(_code_cache) > CODE_CACHE_MAX_ENTRIES:
+            _code_cache.popitem(last=False)
+            _code_cache_stats["evictions"] += 1
+
+def get_code_cache_stats() -> Dict[str, Any]:
+    """Return hit/miss/eviction counters for the compiled code cache"""
+    with _code_cache_lock:
+        lookups = _code_cache_stats["hits"] + _code_cache_stats["misses"]
+        return {
+            "size": len(_code_cache),
+            "max_entries": CODE_CACHE_MAX_ENTRIES,
+            "hits": _code_cache_stats["hits"],
+            "misses": _code_cache_stats["misses"],
+            "evictions": _code_cache_stats["evictions"],
+            "hit_rate": (_code_cache_stats["hits"] / lookups) if lookups else 0.0
+        }
+
+def clear_code_cache() -> int:
+    """Drop all compiled functions from the cache and return how many were removed"""
+    with _code_cache_lock:
+        removed = len(_code_cache)
+        _code_cache.clear()
+        return removed
+
+def _bind_process_function(process_func, run_globals: Dict[str, Any]):
+    """
+    Rebind a cached process function to a fresh globals dict so that
+    per-execution helpers (log_progress, check_cancellation) are isolated
+    between concurrent runs of the same code.
+    """
+    if not isinstance(process_func, types.FunctionType):
+        return process_func
+    bound = types.FunctionType(
+        process_func.__code__,
+        run_globals,
+        process_func.__name__,
+        process_func.__defaults__,
+        process_func.__closure__
+    )
+    bound.__kwdefaults__ = process_func.__kwdefaults__
+    return bound
+
+def build_error_result(error: str, error_type: str, start_time: float, log_file_id: Optional[str] = None) -> Dict[str, Any]:
+    """Build a failed execution result in the same shape run_python_function returns"""
+    return {
+        "success": False,
+        "output": None,
+        "execution_time": time.time() - start_time,
+        "error": error,
+        "error_type": error_type,
+        "log_file_id": log_file_id,
+        "log_path": get_log_path(log_file_id) if log_file_id else None
+    }
+
+# Execution running on the current thread, used to route print() output into its log
+_execution_context = threading.local()
+_output_capture_lock = threading.Lock()
+_output_capture_installed = False
+
+class _ExecutionOutputStream:
+    """
+    sys.stdout/sys.stderr proxy that copies writes made on an execution
+    thread into that execution's log, then passes them through unchanged.
+    """
+
+    def __init__(self, original):
+        self._original = original
+
+    def write(self, text):
+        log_file_id = getattr(_execution_context, "log_file_id", None)
+        if log_file_id is not None and text:
+            write_log(log_file_id, text)
+        return self._original.write(text)
+
+    def flush(self):
+        self._original.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._original, name)
+
+def _install_output_capture():
+    """Wrap sys.stdout and sys.stderr once per process"""
+    global _output_capture_installed
+    if _output_capture_installed:
+        return
+    with _output_capture_lock:
+        if not _output_capture_installed:
+            sys.stdout = _ExecutionOutputStream(sys.stdout)
+            sys.stderr = _ExecutionOutputStream(sys.stderr)
+            _output_capture_installed = True
+
+def stream_subprocess(cmd, log_file_id: str, **popen_kwargs) -> subprocess.CompletedProcess:
+    """
+    Run a command, writing each line of its combined stdout/stderr to the
+    execution log as it is produced.
+    
+    Returns:
+        CompletedProcess with the collected output in stdout
+    
+    Raises:
+        KeyboardInterrupt: the execution was cancelled while the command ran
+    """
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        **popen_kwargs
+    )
+    lines = []
+    try:
+        for line in process.stdout:
+            lines.append(line)
+            write_log(log_file_id, line)
+            if is_execution_cancelled(log_file_id):
+                supervisor.kill_process_tree(process.pid)
+                process.wait()
+                raise KeyboardInterrupt("Execution cancelled by user")
+        returncode = process.wait()
+    finally:
+        process.stdout.close()
+    return subprocess.CompletedProcess(cmd, returncode, "".join(lines), None)
+
+# In-process fallback used for background executions when no worker pool is running
+EXECUTION_THREADS = int(os.getenv("SMART_FOLDER_EXECUTION_THREADS", "32"))
+_execution_threads = ThreadPoolExecutor(max_workers=EXECUTION_THREADS, thread_name_prefix="smart-folder-exec")
+
+# Executions running on _execution_threads by log file id: their future, start time and thread
+_in_process_futures: Dict[str, Dict[str, Any]] = {}
+# Stopped executions whose thread is still busy after being interrupted
+_leaked_executions: Dict[str, Dict[str, Any]] = {}
+_in_process_lock = threading.Lock()
+
+# Times a stopped in-process execution is interrupted before its thread is reported as leaked
+INTERRUPT_ATTEMPTS = 2
+
+class ExecutionStopped(BaseException):
+    """Raised inside an in-process execution that kept running after it was stopped"""
+
+def _resolve_in_process(log_file_id: str, reason: str, message: str) -> bool:
     """
-    Execute a Python function with file-based logging for streaming updates.
+    Resolve an in-process execution's future early, releasing its caller
+
+    If the execution is still running after the cancel grace period, its
+    thread is interrupted so the thread can be reused.
     """
+    with _in_process_lock:
+        entry = _in_process_futures.pop(log_file_id, None)
+    if entry is None:
+        return False
+    future = entry["future"]
+    if not future.done():
+        result = build_stopped_result(reason, message, entry["start_time"], log_file_id)
+        result["resources"] = _watchdog.usage(log_file_id)
+        future.set_result(result)
+    if entry["thread_id"] is not None:
+        _schedule_reclaim(log_file_id, entry["thread_id"], 0)
+    return True
+
+def _schedule_reclaim(log_file_id: str, thread_id: int, attempts: int):
+    timer = threading.Timer(CANCEL_GRACE_SECONDS, _reclaim_thread, (log_file_id, thread_id, attempts))
+    timer.daemon = True
+    timer.start()
+
+def _reclaim_thread(log_file_id: str, thread_id: int, attempts: int):
+    """Interrupt a stopped execution that is still running, or report its thread as leaked"""
+    with _stopped_lock:
+        # Checked under the lock the execution takes before it cleans up, so
+        # the interrupt can't land in its cleanup or whatever the thread runs next
+        if log_file_id not in _in_user_code:
+            return
+        if attempts < INTERRUPT_ATTEMPTS:
+            supervisor.interrupt_thread(thread_id, ExecutionStopped)
+    if attempts < INTERRUPT_ATTEMPTS:
+        write_log(log_file_id, "⏱️ Execution ignored the stop request, interrupting it...\n")
+        _schedule_reclaim(log_file_id, thread_id, attempts + 1)
+        return
+    with _in_process_lock:
+        _leaked_executions[log_file_id] = {"thread_id": thread_id, "since": time.time()}
+    write_log(
+        log_file_id,
+        "⚠️ Execution is blocked and can't be interrupted; its thread stays busy until it returns. "
+        "Set SMART_FOLDER_WORKERS to run executions in processes that can be killed.\n"
+    )
+
+def _leave_user_code(log_file_id: str):
+    """Stop _reclaim_thread from interrupting an execution that is about to clean up"""
+    try:
+        with _stopped_lock:
+            _in_user_code.discard(log_file_id)
+    except ExecutionStopped:
+        # Interrupted while waiting for the lock; no interrupt is fired once the flag is cleared
+        with _stopped_lock:
+            _in_user_code.discard(log_file_id)
+
+def get_execution_thread_stats() -> Dict[str, Any]:
+    """Busy and leaked threads of the in-process execution fallback"""
+    with _in_process_lock:
+        return {
+            "threads": EXECUTION_THREADS,
+            "active": len(_in_process_futures),
+            "leaked": len(_leaked_executions),
+            "leaked_executions": [
+                {"log_file_id": log_file_id, "since": entry["since"]}
+                for log_file_id, entry in _leaked_executions.items()
+            ]
+        }
+
+def _run_in_process(future: Future, payload: Dict[str, Any]):
+    log_file_id = payload["log_file_id"]
+    with _in_process_lock:
+        entry = _in_process_futures.get(log_file_id)
+        if entry is None or future.done():
+            # Stopped while it was still queued
+            return
+        entry["thread_id"] = threading.get_ident()
     start_time = time.time()
+    try:
+        result = run_python_function(**payload)
+    except BaseException as e:
+        result = build_error_result(f"RuntimeError: {str(e)}", "RuntimeError", start_time, log_file_id)
+    finally:
+        with _in_process_lock:
+            _in_process_futures.pop(log_file_id, None)
+            _leaked_executions.pop(log_file_id, None)
+    record_execution(payload.get("node_type"), result)
+    if not future.done():
+        future.set_result(result)
+
+def submit_python_function(function_code: str, input_value: str, timeout: int = 600, log_file_id: str = None, node_type: Optional[str] = None) -> Future:
+    """
+    Start a Python function execution in the background.
+    
+    Executions are dispatched to the warm worker pool when one is running,
+    otherwise to a bounded thread pool in this process. The timeout and the
+    node type's SMART_FOLDER_NODE_LIMITS are enforced either way. Worker
+    processes are killed outright when code ignores cancellation; in-process
+    executions are interrupted, and once every thread is held by one that
+    can't be interrupted, new executions fail instead of queueing forever.
+    
+    Returns:
+        Future resolving to the execution result dictionary
+    """
+    # Callers tracking a session have already logged the start of execution
+    log_start = log_file_id is None
+    if log_start:
+        log_file_id = str(uuid.uuid4())
+    limits = get_node_limits(node_type)
+    if limits.get("timeout"):
+        timeout = min(timeout, limits["timeout"]) if timeout else limits["timeout"]
+    payload = {
+        "function_code": function_code,
+        "input_value": input_value,
+        "timeout": timeout,
+        "log_file_id": log_file_id,
+        "log_start": log_start,
+        "node_type": node_type,
+        "limits": limits
+    }
+    pool = get_worker_pool()
+    if pool is not None:
+        return pool.submit(payload)
+    
+    future = Future()
+    future.set_running_or_notify_cancel()
+    with _in_process_lock:
+        leaked = len(_leaked_executions)
+        if leaked < EXECUTION_THREADS:
+            _in_process_futures[log_file_id] = {"future": future, "start_time": time.time(), "thread_id": None}
+    if leaked >= EXECUTION_THREADS:
+        future.set_result(build_error_result(
+            f"All {EXECUTION_THREADS} execution threads are held by executions that ignored cancellation; "
+            f"restart the API or set SMART_FOLDER_WORKERS to run executions in worker processes",
+            "RuntimeError",
+            time.time(),
+            log_file_id
+        ))
+        return future
+    _execution_threads.submit(_run_in_process, future, payload)
+    return future
+
+def execute_python_function(function_code: str, input_value: str, timeout: int = 600, log_file_id: str = None, node_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Execute a Python function and wait for its result.
+    
+    Runs in a worker process when the pool is enabled, otherwise on the
+    execution threads so the timeout can be enforced.
+    """
+    return submit_python_function(function_code, input_value, timeout, log_file_id, node_type).result()
+
+def _on_limit_exceeded(log_file_id: str, reason: str, message: str):
+    write_log(log_file_id, f"⏱️ {message}, stopping...\n")
+    stop_execution_locally(log_file_id, reason, message)
+    if _limit_hook is not None:
+        _limit_hook(log_file_id, reason, message)
+    else:
+        _resolve_in_process(log_file_id, reason, message)
+
+def _current_execution() -> Optional[str]:
+    return getattr(_execution_context, "log_file_id", None)
+
+def run_python_function(
+    function_code: str,
+    input_value: str,
+    timeout: int = 600,
+    log_file_id: str = None,
+    log_start: Optional[bool] = None,
+    node_type: Optional[str] = None,
+    limits: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """
+    Execute a Python function in the current process, streaming its log,
+    stdout and stderr into the execution log.
+    
+    The watchdog meters the execution's resource use, reported under the
+    result's "resources" key, and stops it once it exceeds its timeout, CPU
+    time or memory limit, killing the subprocesses it started. Limits come
+    from the node type's SMART_FOLDER_NODE_LIMITS (falling back to
+    SMART_FOLDER_EXECUTION_CPU_LIMIT for CPU time); subprocesses also get
+    them as rlimits.
+    """
+    _install_output_capture()
+    supervisor.install_subprocess_tracking(_current_execution)
     
+    if log_start is None:
+        log_start = log_file_id is None
     if log_file_id is None:
         log_file_id = str(uuid.uuid4())
     
-    log_path = os.path.join(tempfile.gettempdir(), f"smart_folder_log_{log_file_id}.txt")
+    if limits is None:
+        limits = get_node_limits(node_type)
+    if limits.get("timeout"):
+        timeout = min(timeout, limits["timeout"]) if timeout else limits["timeout"]
+    cpu_limit = limits.get("cpu_seconds") or EXECUTION_CPU_LIMIT
+    memory_limit = limits.get("memory_mb")
     
+    start_time = time.time()
+    with _stopped_lock:
+        _active_executions.add(log_file_id)
+    supervisor.set_child_limits(log_file_id, memory_limit, cpu_limit)
+    _watchdog.watch(
+        log_file_id,
+        threading.get_ident(),
+        timeout,
+        cpu_limit,
+        _on_limit_exceeded,
+        memory_limit_mb=memory_limit,
+        native_thread_id=threading.get_native_id()
+    )
+    
+    previous_log_file_id = getattr(_execution_context, "log_file_id", None)
+    _execution_context.log_file_id = log_file_id
     try:
-        # Create log file if it doesn't exist, or append if it does
-        if not os.path.exists(log_path):
-            with open(log_path, 'w') as log:
-                log.write("🚀 Starting execution...\n")
-                log.flush()
-        
-        # Compile the Python code
-        with open(log_path, 'a') as log:
-            log.write("⚙️ Compiling function...\n")
-            log.flush()
-            
-        code = compile(function_code, filename="<user_function>", mode="exec")
-        
-        # Set up execution environment with all standard modules
-        exec_globals = globals().copy()
-        exec_globals.update(AVAILABLE_MODULES)
+        with _stopped_lock:
+            _in_user_code.add(log_file_id)
+        result = _run_python_function(function_code, input_value, timeout, log_file_id, log_start)
+    finally:
+        _leave_user_code(log_file_id)
+        _execution_context.log_file_id = previous_log_file_id
+        resources = _watchdog.unwatch(log_file_id)
+        supervisor.forget_children(log_file_id)
+        release_models(log_file_id)
+        with _stopped_lock:
+            _active_executions.discard(log_file_id)
+            stopped = _stopped_executions.pop(log_file_id, None)
+    
+    # Report why a stopped execution ended rather than the error it raised on the way out
+    if stopped is not None and (not result["success"] or stopped["reason"] != "cancelled"):
+        result = build_stopped_result(stopped["reason"], stopped["message"], start_time, log_file_id)
+    result["resources"] = resources
+    return result
+
+def _run_python_function(function_code: str, input_value: str, timeout: int, log_file_id: str, log_start: bool) -> Dict[str, Any]:
+    start_time = time.time()
+    log_path = get_log_path(log_file_id)
+    
+    try:
+        if log_start:
+            write_log(log_file_id, "🚀 Starting execution...\n")
         
-        # Add log file path to globals so function can write to it
-        exec_globals['_log_file_path'] = log_path
+        source_hash = _hash_source(function_code)
+        cached = _get_cached_function(source_hash)
         
         # Add logging helper function
         def log_progress(message):
             """Helper function for user code to log progress"""
             try:
-                with open(log_path, 'a') as log:
-                    log.write(f"{message}\n")
-                    log.flush()
+                write_log(log_file_id, f"{message}\n")
             except:
                 pass  # Fail silently if logging fails
         
-        exec_globals['log_progress'] = log_progress
-        
         # Add cancellation check helper
         def check_cancellation():
             """Helper function for user code to check if execution was cancelled"""
             if is_execution_cancelled(log_file_id):
                 raise KeyboardInterrupt("Execution cancelled by user")
         
-        exec_globals['check_cancellation'] = check_cancellation
+        # Add subprocess helper that streams command output into the log
+        def run_streaming(cmd, **popen_kwargs):
+            """Run a command, streaming its combined stdout/stderr into the execution log"""
+            return stream_subprocess(cmd, log_file_id, **popen_kwargs)
+        
+        # Add model helper that keeps the model loaded until this execution ends
+        def run_get_model(kind, name, **options):
+            """Return a shared model, pinned against eviction for the rest of the execution"""
+            return hold_model(log_file_id, kind, name, **options)
         
-        with open(log_path, 'a') as log:
-            log.write("⚙️ Executing function...\n")
-            log.flush()
+        # Add chunked transcription helper that reports partial transcripts in the log
+        def run_transcribe_chunked(audio_path, model_size="base", **options):
+            """Transcribe a long recording in parallel chunks, logging each chunk's text as it completes"""
+            return transcribe_chunked(
+                audio_path,
+                model_size,
+                on_chunk=log_progress,
+                should_stop=check_cancellation,
+                **options
+            )
+        
+        # Add bulk delete helper that logs progress and stops between batches when cancelled
+        def run_delete_files(paths, mode="trash", dry_run=False, **options):
+            """Delete or trash files in batches, logging the running totals after each batch"""
+            def report(totals):
+                verb = "Would remove" if dry_run else ("Trashed" if mode == "trash" else "Deleted")
+                log_progress(
+                    f"🗑️ {totals['processed']}/{totals['total']} processed - {verb} {totals['deleted']}, "
+                    f"skipped {totals['skipped']}, errors {totals['errors']}, "
+                    f"{totals['bytes_freed'] / (1024 * 1024):.2f} MB"
+                )
+            return delete_files(paths, mode, dry_run, on_progress=report, should_stop=check_cancellation, **options)
+        
+        run_helpers = {
+            '_log_file_path': log_path,
+            'log_progress': log_progress,
+            'check_cancellation': check_cancellation,
+            'stream_subprocess': run_streaming,
+            'get_model': run_get_model,
+            'use_model': use_model,
+            'transcribe_chunked': run_transcribe_chunked,
+            'get_anthropic_client': get_anthropic_client,
+            'query_files': query_files,
+            'find_old_files': find_old_files,
+            'delete_files': run_delete_files
+        }
         
-        # Execute the code
-        local_vars = {}
-        exec(code, exec_globals, local_vars)
+        if cached is None:
+            # Compile the Python code
+            write_log(log_file_id, "⚙️ Compiling function...\n")
+                
+            code = compile(function_code, filename="<user_function>", mode="exec")
+            
+            # Set up execution environment with all standard modules
+            exec_globals = globals().copy()
+            exec_globals.update(AVAILABLE_MODULES)
+            exec_globals.update(run_helpers)
+            
+            write_log(log_file_id, "⚙️ Executing function...\n")
+            
+            # Execute the code
+            local_vars = {}
+            exec(code, exec_globals, local_vars)
+            
+            cached = {
+                "code": code,
+                "globals": exec_globals,
+                "process": local_vars.get('process')
+            }
+            _store_cached_function(source_hash, cached)
+        else:
+            write_log(log_file_id, "⚡ Using cached compiled function...\n")
         
         # Check if 'process' function exists
-        if 'process' not in local_vars:
-            with open(log_path, 'a') as log:
-                log.write("❌ Function 'process(inputs)' not found in code\n")
-                log.flush()
+        if cached["process"] is None:
+            write_log(log_file_id, "❌ Function 'process(inputs)' not found in code\n")
             return {
                 "success": False,
                 "output": None,
@@ -130,40 +705,32 @@ def execute_python_function(function_code: str, input_value: str, timeout: int =
                 "log_path": log_path
             }
         
-        process_func = local_vars['process']
+        run_globals = dict(cached["globals"])
+        run_globals.update(run_helpers)
+        process_func = _bind_process_function(cached["process"], run_globals)
         
-        with open(log_path, 'a') as log:
-            log.write("🚀 Executing process function...\n")
-            log.flush()
+        write_log(log_file_id, "🚀 Executing process function...\n")
         
         # Parse input_value as JSON to get multiple inputs, fallback to single input
         try:
             if input_value.strip().startswith('{'):
                 # Multiple inputs as JSON
                 inputs_dict = json.loads(input_value)
-                with open(log_path, 'a') as log:
-                    log.write(f"📊 Processing multiple inputs: {list(inputs_dict.keys())}\n")
-                    log.flush()
+                write_log(log_file_id, f"📊 Processing multiple inputs: {list(inputs_dict.keys())}\n")
             else:
                 # Single input (backward compatibility)
                 inputs_dict = {"input": input_value}
-                with open(log_path, 'a') as log:
-                    log.write("📝 Processing single input (legacy mode)\n")
-                    log.flush()
+                write_log(log_file_id, "📝 Processing single input (legacy mode)\n")
         except json.JSONDecodeError:
             # Treat as single string input
             inputs_dict = {"input": input_value}
-            with open(log_path, 'a') as log:
-                log.write("📝 Processing single string input\n")
-                log.flush()
+            write_log(log_file_id, "📝 Processing single string input\n")
         
         # Execute the process function
         try:
             result = process_func(inputs_dict)
         except KeyboardInterrupt as e:
-            with open(log_path, 'a') as log:
-                log.write(f"🚫 Function cancelled: {str(e)}\n")
-                log.flush()
+            write_log(log_file_id, f"🚫 Function cancelled: {str(e)}\n")
             return {
                 "success": False,
                 "output": None,
@@ -174,9 +741,7 @@ def execute_python_function(function_code: str, input_value: str, timeout: int =
                 "log_path": log_path
             }
         except Exception as e:
-            with open(log_path, 'a') as log:
-                log.write(f"❌ Function raised exception: {str(e)}\n")
-                log.flush()
+            write_log(log_file_id, f"❌ Function raised exception: {str(e)}\n")
             raise e
         
         execution_time = time.time() - start_time
@@ -187,9 +752,7 @@ def execute_python_function(function_code: str, input_value: str, timeout: int =
         else:
             output = "None"
         
-        with open(log_path, 'a') as log:
-            log.write("✅ Execution completed successfully!\n")
-            log.flush()
+        write_log(log_file_id, "✅ Execution completed successfully!\n")
         
         return {
             "success": True,
@@ -212,9 +775,7 @@ def execute_python_function(function_code: str, input_value: str, timeout: int =
             "log_path": log_path
         }
     except SyntaxError as e:
-        with open(log_path, 'a') as log:
-            log.write(f"❌ SyntaxError: {str(e)}\n")
-            log.flush()
+        write_log(log_file_id, f"❌ SyntaxError: {str(e)}\n")
         return {
             "success": False,
             "output": None,
@@ -225,9 +786,7 @@ def execute_python_function(function_code: str, input_value: str, timeout: int =
             "log_path": log_path
         }
     except ImportError as e:
-        with open(log_path, 'a') as log:
-            log.write(f"❌ ImportError: {str(e)}\n")
-            log.flush()
+        write_log(log_file_id, f"❌ ImportError: {str(e)}\n")
         return {
             "success": False,
             "output": None,
@@ -238,9 +797,7 @@ def execute_python_function(function_code: str, input_value: str, timeout: int =
             "log_path": log_path
         }
     except Exception as e:
-        with open(log_path, 'a') as log:
-            log.write(f"❌ RuntimeError: {str(e)}\n")
-            log.flush()
+        write_log(log_file_id, f"❌ RuntimeError: {str(e)}\n")
         return {
             "success": False,
             "output": None,
@@ -0,0 +1,683 @@
+"""
+Persistent catalog of the files under watched directories.
+
+Camera recording and upload directories are listed constantly, and listing
+them by walking the filesystem gets slow once they hold hundreds of
+thousands of files. The catalog indexes each watched root once into SQLite
+(path, size, mtime, ctime, extension) and keeps the index current from
+inotify events, so listings and queries by extension, age and size are index
+lookups. Roots where inotify is unavailable or out of watches are rescanned
+every SMART_FOLDER_CATALOG_RESCAN seconds instead.
+
+The API process runs the watcher thread and owns all writes; worker
+processes read the same database. Roots are configured with
+SMART_FOLDER_CATALOG_ROOTS (separated by os.pathsep) or added at runtime, and
+are remembered across restarts. Like file_scanner, hidden files and
+directories are not indexed.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import queue
+import select
+import sqlite3
+import struct
+import threading
+import time
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Tuple
+
+from storage import FLOWS_DIR, ensure_flows_directory
+from file_scanner import ExtensionMatcher, scan_files
+
+# Directories indexed and watched, separated by os.pathsep
+CATALOG_ROOTS = os.getenv("SMART_FOLDER_CATALOG_ROOTS", "")
+
+# Seconds between rescans of roots not watched through inotify
+CATALOG_RESCAN_INTERVAL = float(os.getenv("SMART_FOLDER_CATALOG_RESCAN", "300"))
+
+# Use inotify where available (set to 0 to always rescan)
+CATALOG_USE_INOTIFY = os.getenv("SMART_FOLDER_CATALOG_INOTIFY", "1").lower() not in ("0", "false", "no")
+
+# Seconds file events are coalesced before they are written to the index
+CATALOG_FLUSH_INTERVAL = 0.5
+
+# Rows written per transaction while scanning
+_SCAN_BATCH = 2000
+
+# Rows fetched per query while paging through a listing
+_FETCH_BATCH = 1000
+
+QUERY_SORT_FIELDS = ("path", "mtime", "size", "ctime", "name")
+
+# inotify event bits from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+class Inotify:
+    """Minimal inotify binding through libc"""
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+    def add_watch(self, path: str, mask: int = _WATCH_MASK) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        # Fails harmlessly if the kernel already dropped the watch
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout: float) -> List[Tuple[int, int, int, str]]:
+        """Wait up to timeout seconds and return (wd, mask, cookie, name) events"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 1024 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+def _has_hidden_part(relative: str) -> bool:
+    return any(part.startswith('.') for part in relative.split(os.sep) if part not in ('', '.'))
+
+class FileCatalog:
+    """SQLite index of files under watched roots, kept current by a watcher thread"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS catalog_roots (
+        root TEXT PRIMARY KEY,
+        added_at REAL NOT NULL,
+        scanned_at REAL,
+        scan_seconds REAL
+    );
+    CREATE TABLE IF NOT EXISTS catalog_files (
+        path TEXT PRIMARY KEY,
+        root TEXT NOT NULL,
+        name TEXT NOT NULL,
+        ext TEXT NOT NULL,
+        depth INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        ctime REAL NOT NULL,
+        scanned REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS catalog_files_ext_mtime ON catalog_files (root, ext, mtime);
+    CREATE INDEX IF NOT EXISTS catalog_files_mtime ON catalog_files (root, mtime);
+    CREATE INDEX IF NOT EXISTS catalog_files_size ON catalog_files (root, size);
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(FLOWS_DIR, "file_catalog.db")
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._commands: "queue.Queue[Tuple[str, Optional[str]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Watcher thread state
+        self._inotify: Optional[Inotify] = None
+        self._watches: Dict[int, str] = {}
+        self._polling: Dict[str, float] = {}
+        self._dirty_files = set()
+        self._new_dirs = set()
+        self._removed_dirs = set()
+        self._stats = {"events": 0, "flushes": 0, "scans": 0, "overflows": 0, "watch_failures": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.db_path.startswith(FLOWS_DIR):
+                ensure_flows_directory()
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(self.SCHEMA)
+                    self._schema_ready = True
+        return conn
+
+    def roots(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT root, added_at, scanned_at, scan_seconds FROM catalog_roots ORDER BY root"
+        ).fetchall()
+        return [
+            {"root": root, "added_at": added_at, "scanned_at": scanned_at, "scan_seconds": scan_seconds}
+            for root, added_at, scanned_at, scan_seconds in rows
+        ]
+
+    def covering_root(self, path: str) -> Optional[str]:
+        """The indexed root whose catalog answers listings of path, if any"""
+        path = os.path.abspath(path)
+        for root in self.roots():
+            if root["scanned_at"] is None:
+                continue
+            if path == root["root"]:
+                return root["root"]
+            if path.startswith(root["root"] + os.sep) and not _has_hidden_part(path[len(root["root"]) + 1:]):
+                return root["root"]
+        return None
+
+    def add_root(self, path: str) -> str:
+        """Start indexing and watching a directory; returns the root that covers it"""
+        path = os.path.abspath(path)
+        if not os.path.isdir(path):
+            raise ValueError(f"Not a directory: {path}")
+        conn = self._connect()
+        for root in self.roots():
+            if path == root["root"] or path.startswith(root["root"] + os.sep):
+                return root["root"]
+        # A new root replaces the roots nested inside it
+        for root in self.roots():
+            if root["root"].startswith(path + os.sep):
+                self.remove_root(root["root"])
+        conn.execute("INSERT OR IGNORE INTO catalog_roots (root, added_at) VALUES (?, ?)", (path, time.time()))
+        self._commands.put(("scan", path))
+        return path
+
+    def remove_root(self, path: str) -> bool:
+        """Stop watching a root and drop its files from the index"""
+        path = os.path.abspath(path)
+        conn = self._connect()
+        if conn.execute("DELETE FROM catalog_roots WHERE root = ?", (path,)).rowcount == 0:
+            return False
+        conn.execute("DELETE FROM catalog_files WHERE root = ?", (path,))
+        self._commands.put(("unwatch", path))
+        return True
+
+    def forget_paths(self, paths: Iterable[str]):
+        """Drop files known to be gone without waiting for their events or a rescan"""
+        rows = [(os.path.abspath(path),) for path in paths]
+        if rows and self.roots():
+            self._connect().executemany("DELETE FROM catalog_files WHERE path = ?", rows)
+
+    def rescan(self, path: Optional[str] = None):
+        """Queue a full rescan of one root or of every root"""
+        self._commands.put(("scan", os.path.abspath(path) if path else None))
+
+    def iter_paths(
+        self,
+        directory: str,
+        extensions: Iterable[str],
+        max_depth: Optional[int] = None,
+        after: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Yield indexed files under directory matching extensions, in sorted order
+
+        Paths are returned relative to directory as given, the same way
+        file_scanner.scan_files() returns them.
+        """
+        matches = ExtensionMatcher(extensions)
+        base = os.path.abspath(directory)
+        prefix = base.rstrip(os.sep) + os.sep
+        # Paths under prefix sort between it and the next possible separator
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        max_abs_depth = prefix.count(os.sep) + max_depth if max_depth is not None else None
+
+        def to_given(path: str) -> str:
+            return os.path.join(directory, path[len(prefix):])
+
+        lower = prefix
+        if after is not None:
+            # The cursor is a path as returned, i.e. relative to directory as given
+            lower = max(lower, os.path.join(base, os.path.relpath(after, directory)))
+        while True:
+            sql = "SELECT path, name FROM catalog_files WHERE path > ? AND path < ?"
+            params: List[Any] = [lower, upper]
+            if max_abs_depth is not None:
+                sql += " AND depth <= ?"
+                params.append(max_abs_depth)
+            if matches.simple and not matches.compound:
+                sql += f" AND ext IN ({','.join('?' * len(matches.simple))})"
+                params.extend(matches.simple)
+            sql += " ORDER BY path LIMIT ?"
+            params.append(_FETCH_BATCH)
+            rows = self._connect().execute(sql, params).fetchall()
+            for path, name in rows:
+                if matches(name):
+                    yield to_given(path)
+            if len(rows) < _FETCH_BATCH:
+                return
+            lower = rows[-1][0]
+
+    def query(
+        self,
+        directory: str,
+        extensions: Optional[Iterable[str]] = None,
+        older_than: Optional[float] = None,
+        newer_than: Optional[float] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        sort_by: str = "path",
+        descending: bool = False,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Return files under directory filtered by extension, age and size
+
+        Ages are in seconds since the last modification. Answered from the
+        index when a watched root covers directory, otherwise by walking it.
+
+        Returns:
+            Dicts with path, name, ext, size, mtime and ctime
+        """
+        if sort_by not in QUERY_SORT_FIELDS:
+            raise ValueError(f"sort_by must be one of {', '.join(QUERY_SORT_FIELDS)}")
+        now = time.time()
+        if self.covering_root(directory) is None:
+            return self._query_by_walking(
+                directory, extensions, older_than, newer_than, min_size, max_size, max_depth,
+                sort_by, descending, limit, offset, now
+            )
+
+        matches = ExtensionMatcher(extensions) if extensions else None
+        prefix = os.path.abspath(directory).rstrip(os.sep) + os.sep
+        sql = "SELECT path, name, ext, size, mtime, ctime FROM catalog_files WHERE path > ? AND path < ?"
+        params: List[Any] = [prefix, prefix[:-1] + chr(ord(os.sep) + 1)]
+        if matches is not None and not matches.compound:
+            sql += f" AND ext IN ({','.join('?' * len(matches.simple))})"
+            params.extend(matches.simple)
+        if older_than is not None:
+            sql += " AND mtime < ?"
+            params.append(now - older_than)
+        if newer_than is not None:
+            sql += " AND mtime >= ?"
+            params.append(now - newer_than)
+        if min_size is not None:
+            sql += " AND size >= ?"
+            params.append(min_size)
+        if max_size is not None:
+            sql += " AND size <= ?"
+            params.append(max_size)
+        if max_depth is not None:
+            sql += " AND depth <= ?"
+            params.append(prefix.count(os.sep) + max_depth)
+        sql += f" ORDER BY {sort_by} {'DESC' if descending else 'ASC'}, path"
+        if matches is None or not matches.compound:
+            # Every row matches, so paging can happen in SQL
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset])
+        rows = self._connect().execute(sql, params).fetchall()
+        files = [
+            {
+                "path": os.path.join(directory, path[len(prefix):]),
+                "name": name,
+                "ext": ext,
+                "size": size,
+                "mtime": mtime,
+                "ctime": ctime
+            }
+            for path, name, ext, size, mtime, ctime in rows
+            if matches is None or not matches.compound or matches(name)
+        ]
+        if matches is not None and matches.compound:
+            files = files[offset:offset + limit if limit is not None else None]
+        return files
+
+    def _query_by_walking(
+        self, directory, extensions, older_than, newer_than, min_size, max_size, max_depth,
+        sort_by, descending, limit, offset, now
+    ) -> List[Dict[str, Any]]:
+        files = []
+        for path in scan_files(directory, extensions or None, max_depth):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if older_than is not None and not stat.st_mtime < now - older_than:
+                continue
+            if newer_than is not None and not stat.st_mtime >= now - newer_than:
+                continue
+            if min_size is not None and stat.st_size < min_size:
+                continue
+            if max_size is not None and stat.st_size > max_size:
+                continue
+            name = os.path.basename(path)
+            files.append({
+                "path": path,
+                "name": name,
+                "ext": os.path.splitext(name)[1].lower(),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "ctime": stat.st_ctime
+            })
+        files.sort(key=lambda entry: entry["path"])
+        if sort_by != "path":
+            files.sort(key=lambda entry: entry[sort_by], reverse=descending)
+        elif descending:
+            files.reverse()
+        return files[offset:offset + limit if limit is not None else None]
+
+    def start(self) -> threading.Thread:
+        """Start the watcher thread, indexing configured and remembered roots"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self._thread
+            self._stop.clear()
+            # Files may have changed while nothing was watching; until the startup
+            # rescan of a remembered root finishes, listings of it scan the disk
+            self._connect().execute("UPDATE catalog_roots SET scanned_at = NULL")
+            for path in filter(None, (part.strip() for part in CATALOG_ROOTS.split(os.pathsep))):
+                try:
+                    self.add_root(path)
+                except ValueError as e:
+                    print(f"⚠️  File catalog root skipped: {e}")
+            self._thread = threading.Thread(target=self._run, name="smart-folder-file-catalog", daemon=True)
+            self._thread.start()
+            return self._thread
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def _run(self):
+        if CATALOG_USE_INOTIFY:
+            try:
+                self._inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                print(f"⚠️  inotify unavailable ({e}); file catalog roots will be rescanned periodically")
+        # Roots remembered from earlier runs are rescanned to catch changes made while stopped
+        self._commands.put(("scan", None))
+        try:
+            while not self._stop.is_set():
+                self._run_commands()
+                if self._inotify is not None:
+                    self._queue_events(self._inotify.read(CATALOG_FLUSH_INTERVAL))
+                else:
+                    self._stop.wait(CATALOG_FLUSH_INTERVAL)
+                self._flush()
+                self._rescan_polled_roots()
+        except Exception as e:
+            print(f"❌ File catalog watcher stopped: {e}")
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            self._watches.clear()
+
+    def _run_commands(self):
+        """Run queued commands, scanning each root at most once however often it was queued"""
+        scans = set()
+        while True:
+            try:
+                command, path = self._commands.get_nowait()
+            except queue.Empty:
+                break
+            if command == "unwatch":
+                self._unwatch(path)
+                self._polling.pop(path, None)
+                scans.discard(path)
+            elif path is None:
+                scans.update(root["root"] for root in self.roots())
+            else:
+                scans.add(path)
+        for root in sorted(scans):
+            self._scan_root(root)
+
+    @staticmethod
+    def _root_of(path: str, roots: List[str]) -> Optional[str]:
+        for root in roots:
+            if path == root or path.startswith(root + os.sep):
+                return root
+        return None
+
+    def _watch(self, root: str, directory: str):
+        if self._inotify is None or root in self._polling:
+            return
+        try:
+            self._watches[self._inotify.add_watch(directory)] = directory
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                self._stats["watch_failures"] += 1
+                print(f"⚠️  Out of inotify watches; rescanning {root} every {CATALOG_RESCAN_INTERVAL:.0f}s instead")
+                self._unwatch(root)
+                self._polling[root] = time.time()
+
+    def _unwatch(self, directory: str):
+        prefix = directory + os.sep
+        for wd, path in list(self._watches.items()):
+            if path == directory or path.startswith(prefix):
+                del self._watches[wd]
+                if self._inotify is not None:
+                    self._inotify.rm_watch(wd)
+
+    def _write_rows(self, rows: List[tuple]):
+        if not rows:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO catalog_files (path, root, name, ext, depth, size, mtime, ctime, scanned) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _row(root: str, path: str, name: str, stat: os.stat_result, scanned: float) -> tuple:
+        return (
+            path, root, name, os.path.splitext(name)[1].lower(), path.count(os.sep),
+            stat.st_size, stat.st_mtime, stat.st_ctime, scanned
+        )
+
+    def _index_tree(self, root: str, top: str, scanned: float) -> int:
+        """Index every visible file under top, watching its directories"""
+        indexed = 0
+        rows = []
+        try:
+            top_stat = os.stat(top)
+        except OSError:
+            return 0
+        visited = {(top_stat.st_dev, top_stat.st_ino)}
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            # Watch before listing so files created in between aren't missed
+            self._watch(root, directory)
+            try:
+                with os.scandir(directory) as iterator:
+                    entries = list(iterator)
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir():
+                        stat = entry.stat()
+                        if (stat.st_dev, stat.st_ino) not in visited:
+                            visited.add((stat.st_dev, stat.st_ino))
+                            stack.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                    rows.append(self._row(root, entry.path, entry.name, entry.stat(), scanned))
+                except OSError:
+                    continue
+                if len(rows) >= _SCAN_BATCH:
+                    self._write_rows(rows)
+                    indexed += len(rows)
+                    rows = []
+        self._write_rows(rows)
+        return indexed + len(rows)
+
+    def _scan_root(self, root: str):
+        """Reindex a root from scratch, dropping files that are gone"""
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM catalog_roots WHERE root = ?", (root,)).fetchone() is None:
+            return
+        started = time.time()
+        self._index_tree(root, root, started)
+        conn.execute("DELETE FROM catalog_files WHERE root = ? AND scanned < ?", (root, started))
+        conn.execute(
+            "UPDATE catalog_roots SET scanned_at = ?, scan_seconds = ? WHERE root = ?",
+            (time.time(), time.time() - started, root)
+        )
+        self._stats["scans"] += 1
+        if root in self._polling or self._inotify is None:
+            self._polling[root] = time.time()
+
+    def _rescan_polled_roots(self):
+        now = time.time()
+        for root, scanned in list(self._polling.items()):
+            if now - scanned >= CATALOG_RESCAN_INTERVAL:
+                self._scan_root(root)
+
+    def _queue_events(self, events: List[Tuple[int, int, int, str]]):
+        for wd, mask, _, name in events:
+            self._stats["events"] += 1
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; only a rescan can tell what changed
+                self._stats["overflows"] += 1
+                self._commands.put(("scan", None))
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._watches[wd]
+                continue
+            if not name or name.startswith('.'):
+                # Events about the watched directory itself arrive through its parent too
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._new_dirs.add(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._removed_dirs.add(path)
+            else:
+                self._dirty_files.add(path)
+
+    def _flush(self):
+        """Apply coalesced events to the index"""
+        if not (self._dirty_files or self._new_dirs or self._removed_dirs):
+            return
+        conn = self._connect()
+        for directory in self._removed_dirs:
+            self._unwatch(directory)
+            prefix = directory + os.sep
+            conn.execute(
+                "DELETE FROM catalog_files WHERE path > ? AND path < ?",
+                (prefix, prefix[:-1] + chr(ord(os.sep) + 1))
+            )
+        now = time.time()
+        roots = [root["root"] for root in self.roots()]
+        for directory in self._new_dirs:
+            root = self._root_of(directory, roots)
+            if root is not None:
+                self._index_tree(root, directory, now)
+        rows = []
+        gone = []
+        for path in self._dirty_files:
+            root = self._root_of(path, roots)
+            if root is None:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                gone.append((path,))
+                continue
+            if os.path.isfile(path):
+                rows.append(self._row(root, path, os.path.basename(path), stat, now))
+        self._write_rows(rows)
+        if gone:
+            conn.executemany("DELETE FROM catalog_files WHERE path = ?", gone)
+        self._stats["flushes"] += 1
+        self._dirty_files.clear()
+        self._new_dirs.clear()
+        self._removed_dirs.clear()
+
+    def wait_until_indexed(self, path: str, timeout: float = 30.0) -> bool:
+        """Block until a root covering path has been scanned"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.covering_root(path) is not None:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        counts = dict(conn.execute("SELECT root, COUNT(*) FROM catalog_files GROUP BY root").fetchall())
+        roots = []
+        for root in self.roots():
+            root["files"] = counts.get(root["root"], 0)
+            root["mode"] = "polling" if (root["root"] in self._polling or self._inotify is None) else "inotify"
+            roots.append(root)
+        return {
+            "roots": roots,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "inotify": self._inotify is not None,
+            "watches": len(self._watches),
+            "pending_commands": self._commands.qsize(),
+            "rescan_interval": CATALOG_RESCAN_INTERVAL,
+            **self._stats
+        }
+
+# Process-wide catalog; only the API process runs the watcher
+_catalog = FileCatalog()
+
+def get_file_catalog() -> FileCatalog:
+    return _catalog
+
+def start_file_catalog() -> threading.Thread:
+    return _catalog.start()
+
+def stop_file_catalog():
+    _catalog.stop()
+
+def query_files(directory: str, **filters) -> List[Dict[str, Any]]:
+    """Query files under directory by extension, age and size (see FileCatalog.query)"""
+    return _catalog.query(directory, **filters)
@@ -0,0 +1,272 @@
+"""
+Finding old files and deleting them in bulk.
+
+find_old_files() answers "files older than N" with one stat per directory
+entry from a scandir walk, or from the file catalog index when a watched root
+covers the directory, and returns structured results ordered by age or size.
+delete_files() removes or trashes a list of paths in batches, reporting
+progress after each batch and checking for cancellation between them; each
+file is stat'ed once.
+"""
+import datetime
+import fnmatch
+import os
+import platform
+import shutil
+import stat
+import time
+import urllib.parse
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Callable, Union
+
+from file_catalog import get_file_catalog
+
+# Files deleted or trashed between progress reports
+DELETE_BATCH_SIZE = int(os.getenv("SMART_FOLDER_DELETE_BATCH", "500"))
+
+OLD_FILE_SORT_FIELDS = ("mtime", "size", "path")
+
+_AGE_UNITS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+    "week": 604800,
+    "month": 2592000,  # 30 days
+    "year": 31536000  # 365 days
+}
+
+def parse_age(value: Union[str, int, float]) -> float:
+    """Seconds in an age given as seconds or as text like "30 days" or "2 weeks" """
+    if isinstance(value, (int, float)):
+        return float(value)
+    parts = str(value).lower().split()
+    if len(parts) == 1:
+        return float(parts[0])
+    if len(parts) != 2:
+        raise ValueError(f"Invalid age format: {value}. Use format like '30 days' or '2 weeks'")
+    try:
+        amount = float(parts[0])
+    except ValueError:
+        raise ValueError(f"Invalid number in age format: {value}")
+    for unit, seconds in _AGE_UNITS.items():
+        if parts[1].startswith(unit):
+            return amount * seconds
+    raise ValueError(f"Unknown time unit: {parts[1]}")
+
+def _file_entry(path: str, st: os.stat_result, now: float) -> Dict[str, Any]:
+    return {
+        "path": path,
+        "name": os.path.basename(path),
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "age_seconds": round(now - st.st_mtime, 3)
+    }
+
+def iter_old_files(
+    directory: str,
+    older_than: Union[str, float],
+    pattern: str = "*",
+    recursive: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """Yield files under directory last modified more than older_than ago, as they are found"""
+    now = time.time()
+    age = parse_age(older_than)
+    cutoff = now - age
+    catalog = get_file_catalog()
+    if catalog.covering_root(directory) is not None:
+        for entry in catalog.query(directory, older_than=age, max_depth=None if recursive else 0):
+            if fnmatch.fnmatch(entry["name"], pattern):
+                yield {
+                    "path": entry["path"],
+                    "name": entry["name"],
+                    "size": entry["size"],
+                    "mtime": entry["mtime"],
+                    "age_seconds": round(now - entry["mtime"], 3)
+                }
+        return
+
+    stack = [directory]
+    try:
+        top = os.stat(directory)
+    except OSError:
+        return
+    visited = {(top.st_dev, top.st_ino)}
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as iterator:
+                entries = list(iterator)
+        except OSError:
+            continue
+        for entry in entries:
+            # Hidden entries are skipped, as glob() does
+            if entry.name.startswith('.'):
+                continue
+            try:
+                # One stat per entry, following symlinks like glob() and isfile()
+                st = entry.stat()
+            except OSError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                if recursive and (st.st_dev, st.st_ino) not in visited:
+                    visited.add((st.st_dev, st.st_ino))
+                    stack.append(entry.path)
+            elif stat.S_ISREG(st.st_mode) and st.st_mtime < cutoff and fnmatch.fnmatch(entry.name, pattern):
+                yield _file_entry(entry.path, st, now)
+
+def find_old_files(
+    directory: str,
+    older_than: Union[str, float],
+    pattern: str = "*",
+    recursive: bool = True,
+    sort_by: str = "mtime",
+    descending: bool = False,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Return files under directory last modified more than older_than ago
+
+    Args:
+        directory: Directory to search
+        older_than: Age as seconds or text like "30 days"
+        pattern: Shell pattern matched against file names
+        recursive: Include subdirectories
+        sort_by: "mtime" (oldest first), "size" (smallest first) or "path"
+        descending: Reverse the order, e.g. largest first
+        limit: Return at most this many files
+
+    Returns:
+        Dicts with path, name, size, mtime and age_seconds
+    """
+    if sort_by not in OLD_FILE_SORT_FIELDS:
+        raise ValueError(f"sort_by must be one of {', '.join(OLD_FILE_SORT_FIELDS)}")
+    files = list(iter_old_files(directory, older_than, pattern, recursive))
+    files.sort(key=lambda entry: (entry[sort_by], entry["path"]), reverse=descending)
+    return files[:limit] if limit is not None else files
+
+def _trash_dir_for(path: str) -> str:
+    """Trash directory for a file: the desktop trash where there is one, else .trash beside it"""
+    system = platform.system()
+    if system == "Darwin":
+        trash = os.path.expanduser("~/.Trash")
+        if os.path.isdir(trash):
+            return trash
+    elif system != "Windows":
+        trash = os.path.expanduser("~/.local/share/Trash")
+        if os.path.isdir(os.path.dirname(trash)):
+            return trash
+    return os.path.join(os.path.dirname(path), ".trash")
+
+def move_to_trash(path: str) -> str:
+    """Move a file to the trash and return where it went"""
+    trash = _trash_dir_for(path)
+    freedesktop = trash.endswith(os.path.join("share", "Trash"))
+    files_dir = os.path.join(trash, "files") if freedesktop else trash
+    os.makedirs(files_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    base = os.path.join(files_dir, os.path.basename(path))
+    target = base
+    suffix = 0
+    while os.path.lexists(target):
+        suffix += 1
+        target = f"{base}.{stamp}" if suffix == 1 else f"{base}.{stamp}.{suffix}"
+    if freedesktop:
+        # Record the original location so desktop trash tools can restore it
+        info_dir = os.path.join(trash, "info")
+        os.makedirs(info_dir, exist_ok=True)
+        with open(os.path.join(info_dir, os.path.basename(target) + ".trashinfo"), "w") as f:
+            f.write(
+                "[Trash Info]\n"
+                f"Path={urllib.parse.quote(os.path.abspath(path))}\n"
+                f"DeletionDate={datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S')}\n"
+            )
+    try:
+        os.rename(path, target)
+    except OSError:
+        # Different filesystem
+        shutil.move(path, target)
+    return target
+
+def delete_files(
+    paths: Iterable[str],
+    mode: str = "trash",
+    dry_run: bool = False,
+    batch_size: int = DELETE_BATCH_SIZE,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    should_stop: Optional[Callable[[], None]] = None
+) -> Dict[str, Any]:
+    """
+    Delete or trash files in batches
+
+    Args:
+        paths: Files to remove; directories and missing paths are skipped
+        mode: "trash" to move files to the trash, "delete" to remove them
+        dry_run: Only report what would be removed
+        batch_size: Files handled between progress reports
+        on_progress: Called with the running totals after each batch
+        should_stop: Called between batches; raising from it stops the rest
+
+    Returns:
+        Totals (processed, deleted, skipped, errors, bytes_freed) and a
+        details list with one {path, status, size, error} entry per file
+    """
+    if mode not in ("trash", "delete"):
+        raise ValueError("mode must be 'trash' or 'delete'")
+    paths = [path.strip() for path in paths if path and path.strip()]
+    batch_size = max(1, batch_size)
+    results = {
+        "total": len(paths),
+        "processed": 0,
+        "deleted": 0,
+        "skipped": 0,
+        "errors": 0,
+        "bytes_freed": 0,
+        "mode": mode,
+        "dry_run": dry_run,
+        "details": []
+    }
+    removed = []
+    for start in range(0, len(paths), batch_size):
+        if should_stop is not None:
+            should_stop()
+        for path in paths[start:start + batch_size]:
+            results["processed"] += 1
+            try:
+                st = os.lstat(path)
+            except FileNotFoundError:
+                results["skipped"] += 1
+                results["details"].append({"path": path, "status": "not_found"})
+                continue
+            except OSError as e:
+                results["errors"] += 1
+                results["details"].append({"path": path, "status": "error", "error": str(e)})
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                results["skipped"] += 1
+                results["details"].append({"path": path, "status": "not_a_file"})
+                continue
+            try:
+                if dry_run:
+                    status = "would_delete"
+                elif mode == "trash":
+                    move_to_trash(path)
+                    status = "trashed"
+                else:
+                    os.remove(path)
+                    status = "deleted"
+            except OSError as e:
+                results["errors"] += 1
+                results["details"].append({"path": path, "status": "error", "size": st.st_size, "error": str(e)})
+                continue
+            results["deleted"] += 1
+            results["bytes_freed"] += st.st_size
+            results["details"].append({"path": path, "status": status, "size": st.st_size})
+            if not dry_run:
+                removed.append(path)
+        if removed:
+            # Keep listings right for roots that are only rescanned periodically
+            get_file_catalog().forget_paths(removed)
+            removed = []
+        if on_progress is not None:
+            on_progress({key: value for key, value in results.items() if key != "details"})
+    return results
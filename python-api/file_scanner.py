@@ -0,0 +1,167 @@
+"""
+Single-pass directory scanning for the file listing endpoints.
+
+The listing endpoints used to run two glob() calls per extension, walking a
+tree once for every extension. scan_files() walks it once with os.scandir,
+matching each name against a precomputed set of extensions, and yields paths
+as it goes so very large directories can be streamed.
+
+Paths come out in the same order sorted() would put them in: entries are
+visited in name order with directories keyed as "name/", so each subtree
+sorts contiguously. That makes the last path returned a stable cursor; a scan
+resuming after it skips every subtree that sorts entirely before it without
+listing it. Like glob(), hidden files and directories are skipped and
+symlinked directories are followed (each directory is visited once).
+"""
+import os
+from typing import Iterable, Iterator, Optional, List, Dict, Any, Tuple, Callable
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.webm', '.mkv', '.wmv', '.flv')
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.m4a', '.aac', '.flac', '.wma', '.opus')
+TEXT_EXTENSIONS = ('.txt', '.md', '.text', '.log')
+
+# Paths per line when a listing is streamed
+SCAN_STREAM_BATCH = int(os.getenv("SMART_FOLDER_SCAN_STREAM_BATCH", "1000"))
+
+class ExtensionMatcher:
+    """Case-insensitive match of file names against a set of extensions"""
+
+    def __init__(self, extensions: Iterable[str]):
+        suffixes = {
+            ext.lower() if ext.startswith('.') else f'.{ext.lower()}'
+            for ext in (ext.strip().lstrip('*') for ext in extensions) if ext
+        }
+        # Single extensions are a set lookup; compound ones (".tar.gz") need endswith
+        self.simple = frozenset(ext for ext in suffixes if ext.count('.') == 1)
+        self.compound = tuple(ext for ext in suffixes if ext.count('.') > 1)
+
+    def __call__(self, name: str) -> bool:
+        lowered = name.lower()
+        if os.path.splitext(lowered)[1] in self.simple:
+            return True
+        return bool(self.compound) and lowered.endswith(self.compound)
+
+def _sorted_entries(path: str) -> List[Tuple[str, os.DirEntry, bool]]:
+    """A directory's visible entries as (sort key, entry, is_dir) in sorted() order of their paths"""
+    entries = []
+    try:
+        with os.scandir(path) as iterator:
+            for entry in iterator:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                entries.append((entry.name + '/' if is_dir else entry.name, entry, is_dir))
+    except OSError:
+        # Unreadable directories are skipped, as glob() does
+        return []
+    entries.sort(key=lambda item: item[0])
+    return entries
+
+def scan_files(
+    root: str,
+    extensions: Optional[Iterable[str]],
+    max_depth: Optional[int] = None,
+    after: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Yield files under root matching extensions, in sorted order
+
+    Args:
+        root: Directory to scan
+        extensions: Extensions to match, e.g. [".mp4", ".mov"], or None for every file
+        max_depth: Levels of subdirectories to descend into (0 for root only)
+        after: Cursor; only paths sorting after it are yielded
+    """
+    matches = ExtensionMatcher(extensions) if extensions is not None else None
+    try:
+        root_stat = os.stat(root)
+    except OSError:
+        return
+    visited = {(root_stat.st_dev, root_stat.st_ino)}
+    # Stack of iterators over sorted directory entries, one per open level
+    stack = [iter(_sorted_entries(root))]
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+            continue
+        _, entry, is_dir = item
+        path = entry.path
+        if not is_dir:
+            if (after is None or path > after) and (matches is None or matches(entry.name)):
+                yield path
+            continue
+        if max_depth is not None and len(stack) > max_depth:
+            continue
+        prefix = path + os.sep
+        if after is not None and prefix < after and not after.startswith(prefix):
+            # Every path in this subtree sorts before the cursor
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if (stat.st_dev, stat.st_ino) in visited:
+            # Symlink loop or a directory already reached through another link
+            continue
+        visited.add((stat.st_dev, stat.st_ino))
+        stack.append(iter(_sorted_entries(path)))
+
+def list_matching_files(
+    root: str,
+    extensions: Iterable[str],
+    max_depth: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    source: Callable[..., Iterator[str]] = scan_files
+) -> Dict[str, Any]:
+    """
+    Return one page of matching files
+
+    next_cursor is set when the page is full and more files may follow; pass
+    it back as cursor to get the next page. source yields the sorted paths,
+    by default from a scan; the file catalog's iter_paths() has the same
+    signature.
+    """
+    files = []
+    for path in source(root, extensions, max_depth, cursor):
+        if limit is not None and len(files) >= limit:
+            return {"files": files, "next_cursor": files[-1] if files else cursor}
+        files.append(path)
+    return {"files": files, "next_cursor": None}
+
+def iter_file_batches(
+    root: str,
+    extensions: Iterable[str],
+    max_depth: Optional[int] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    batch_size: int = SCAN_STREAM_BATCH,
+    source: Callable[..., Iterator[str]] = scan_files
+) -> Iterator[Tuple[List[str], Optional[str]]]:
+    """
+    Yield matching files in batches as the scan finds them
+
+    Each item is (paths, None) except the last, which is ([], next_cursor).
+    """
+    batch = []
+    count = 0
+    last = None
+    for path in source(root, extensions, max_depth, cursor):
+        if limit is not None and count >= limit:
+            if batch:
+                yield batch, None
+            yield [], last
+            return
+        batch.append(path)
+        count += 1
+        last = path
+        if len(batch) >= batch_size:
+            yield batch, None
+            batch = []
+    if batch:
+        yield batch, None
+    yield [], None
@@ -0,0 +1,180 @@
+"""
+On-disk encodings for saved flows and out-of-line storage of large node values.
+
+Flows can be written as indented JSON (the original format), compact JSON, or
+compact JSON compressed with gzip or zstd. The encoding is detected from the
+file's leading bytes on load, so files in different formats can sit side by
+side. Node data strings over a size threshold (full transcripts, LLM
+responses) are moved into a content-addressed blob directory and replaced by
+a small reference, so the flow file itself stays small.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Any, List, Iterable, Set
+
+try:
+    import zstandard
+except ImportError:
+    # zstd support is optional, gzip is always available
+    zstandard = None
+
+FLOW_FORMATS = ("json", "compact", "gzip", "zstd")
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Key marking a node data value that lives in the blob directory
+BLOB_REF_KEY = "$blob"
+
+def resolve_format(flow_format: str) -> str:
+    """Validate a format name, falling back to gzip when zstd is unavailable"""
+    flow_format = (flow_format or "json").lower()
+    if flow_format not in FLOW_FORMATS:
+        raise ValueError(f"Unknown flow format '{flow_format}', expected one of {', '.join(FLOW_FORMATS)}")
+    if flow_format == "zstd" and zstandard is None:
+        return "gzip"
+    return flow_format
+
+def detect_format(raw: bytes) -> str:
+    """Identify the encoding of a stored flow or blob from its first bytes"""
+    if raw.startswith(GZIP_MAGIC):
+        return "gzip"
+    if raw.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return "json"
+
+def compress(raw: bytes, flow_format: str) -> bytes:
+    if flow_format == "gzip":
+        # mtime=0 keeps the output deterministic for identical content
+        return gzip.compress(raw, compresslevel=6, mtime=0)
+    if flow_format == "zstd":
+        if zstandard is None:
+            raise RuntimeError("The zstd flow format requires the zstandard package")
+        return zstandard.ZstdCompressor(level=3).compress(raw)
+    return raw
+
+def decompress(raw: bytes) -> bytes:
+    detected = detect_format(raw)
+    if detected == "gzip":
+        return gzip.decompress(raw)
+    if detected == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This flow is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(raw)
+    return raw
+
+def encode_flow(data: Dict[str, Any], flow_format: str) -> bytes:
+    """Serialize a flow in the given format"""
+    if flow_format == "json":
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    raw = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return compress(raw, flow_format)
+
+def decode_flow(raw: bytes) -> Dict[str, Any]:
+    """Deserialize a flow written in any supported format"""
+    return json.loads(decompress(raw).decode("utf-8"))
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and BLOB_REF_KEY in value
+
+def iter_blob_refs(nodes: Iterable[Dict[str, Any]]) -> Iterable[str]:
+    """Yield the blob id of every out-of-line value in a list of nodes"""
+    for node in nodes:
+        for value in node.get("data", {}).values():
+            if is_blob_ref(value):
+                yield value[BLOB_REF_KEY]
+
+class BlobStore:
+    """Content-addressed files holding large node data strings"""
+
+    def __init__(self, directory: str, flow_format: str = "compact"):
+        self.directory = directory
+        self.flow_format = flow_format
+        self._lock = threading.Lock()
+
+    def path(self, blob_id: str) -> str:
+        return os.path.join(self.directory, blob_id)
+
+    def put(self, text: str) -> Dict[str, Any]:
+        """Store text (once per distinct content) and return a reference to it"""
+        raw = text.encode("utf-8")
+        blob_id = hashlib.sha256(raw).hexdigest()
+        blob_path = self.path(blob_id)
+        if not os.path.exists(blob_path):
+            with self._lock:
+                os.makedirs(self.directory, exist_ok=True)
+                temp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+                with open(temp_path, 'wb') as f:
+                    f.write(compress(raw, self.flow_format))
+                os.replace(temp_path, blob_path)
+        return {BLOB_REF_KEY: blob_id, "chars": len(text)}
+
+    def get(self, ref: Dict[str, Any]) -> str:
+        with open(self.path(ref[BLOB_REF_KEY]), 'rb') as f:
+            return decompress(f.read()).decode("utf-8")
+
+    def externalize_nodes(self, nodes: List[Dict[str, Any]], min_chars: int) -> List[Dict[str, Any]]:
+        """Return nodes with data strings of at least min_chars replaced by blob references"""
+        if min_chars <= 0:
+            return nodes
+        result = []
+        for node in nodes:
+            data = node.get("data")
+            if isinstance(data, dict) and any(isinstance(v, str) and len(v) >= min_chars for v in data.values()):
+                node = {
+                    **node,
+                    "data": {
+                        key: self.put(value) if isinstance(value, str) and len(value) >= min_chars else value
+                        for key, value in data.items()
+                    }
+                }
+            result.append(node)
+        return result
+
+    def resolve_nodes(self, nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return nodes with blob references replaced by their text"""
+        result = []
+        for node in nodes:
+            data = node.get("data")
+            if isinstance(data, dict) and any(is_blob_ref(v) for v in data.values()):
+                node = {
+                    **node,
+                    "data": {
+                        key: self.get(value) if is_blob_ref(value) else value
+                        for key, value in data.items()
+                    }
+                }
+            result.append(node)
+        return result
+
+    def discard(self, blob_ids: Iterable[str]) -> int:
+        """Delete the given blobs and return how many were removed"""
+        removed = 0
+        with self._lock:
+            for blob_id in blob_ids:
+                try:
+                    os.remove(self.path(blob_id))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def collect_garbage(self, referenced: Set[str]) -> int:
+        """Delete blobs no flow refers to and return how many were removed"""
+        if not os.path.isdir(self.directory):
+            return 0
+        removed = 0
+        with self._lock:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".tmp") or entry.name in referenced:
+                        continue
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
@@ -0,0 +1,280 @@
+"""
+Server-side flow execution engine.
+
+Builds adjacency indexes for a flow once, orders nodes topologically and runs
+every node whose upstream inputs are ready in parallel, so wide fan-out flows
+take as long as their slowest branch instead of the sum of all branches.
+"""
+import collections
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Optional, Iterable
+
+from executor import submit_python_function
+from output_cache import is_memoizable, compute_output_key, get_cached_output, store_output
+
+# Maximum nodes of a single flow run executing at the same time
+FLOW_MAX_PARALLEL = int(os.getenv("SMART_FOLDER_FLOW_PARALLELISM", "8"))
+
+class FlowGraph:
+    """Adjacency indexes over a flow's nodes and edges"""
+
+    def __init__(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+        self.nodes = {node["id"]: node for node in nodes}
+        self.edges = edges
+        self.downstream = collections.defaultdict(list)
+        self.upstream = collections.defaultdict(list)
+        for edge in edges:
+            source, target = edge.get("source"), edge.get("target")
+            if source in self.nodes and target in self.nodes:
+                self.downstream[source].append(target)
+                self.upstream[target].append(source)
+
+    def reachable_from(self, start_ids: Iterable[str]) -> List[str]:
+        """Return the start nodes and everything downstream of them"""
+        seen = set()
+        order = []
+        queue = collections.deque(node_id for node_id in start_ids if node_id in self.nodes)
+        while queue:
+            node_id = queue.popleft()
+            if node_id in seen:
+                continue
+            seen.add(node_id)
+            order.append(node_id)
+            queue.extend(self.downstream[node_id])
+        return order
+
+    def topological_order(self, node_ids: Iterable[str]) -> Dict[str, Any]:
+        """
+        Topologically sort a subset of nodes using edges within that subset
+
+        Returns:
+            Dictionary with the sorted "order", the "cyclic" nodes that sit on
+            a cycle, and the "blocked" nodes downstream of one, mapped to the
+            cyclic nodes upstream of them
+        """
+        members = set(node_ids)
+        indegree = {node_id: 0 for node_id in members}
+        for node_id in members:
+            for target in self.downstream[node_id]:
+                if target in members:
+                    indegree[target] += 1
+
+        ready = collections.deque(node_id for node_id in indegree if indegree[node_id] == 0)
+        order = []
+        while ready:
+            node_id = ready.popleft()
+            order.append(node_id)
+            for target in self.downstream[node_id]:
+                if target in members:
+                    indegree[target] -= 1
+                    if indegree[target] == 0:
+                        ready.append(target)
+
+        ordered = set(order)
+        unordered = members - ordered
+        cyclic = self._cycle_members(unordered)
+        # Everything else left unordered only waits on a cycle upstream of it
+        blocked = collections.defaultdict(set)
+        for cycle_node in cyclic:
+            queue = collections.deque([cycle_node])
+            seen = {cycle_node}
+            while queue:
+                node_id = queue.popleft()
+                for target in self.downstream[node_id]:
+                    if target in unordered and target not in seen:
+                        seen.add(target)
+                        queue.append(target)
+                        if target not in cyclic:
+                            blocked[target].add(cycle_node)
+        return {
+            "order": order,
+            "cyclic": sorted(cyclic),
+            "blocked": {node_id: sorted(sources) for node_id, sources in sorted(blocked.items())}
+        }
+
+    def _cycle_members(self, node_ids: set) -> set:
+        """Nodes of node_ids on a cycle within them (Tarjan's strongly connected components)"""
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        members = set()
+        counter = 0
+        for root in node_ids:
+            if root in index:
+                continue
+            # Iterative DFS: frames of (node, iterator over its successors)
+            work = [(root, iter(self.downstream[root]))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node_id, successors = work[-1]
+                advanced = False
+                for target in successors:
+                    if target not in node_ids:
+                        continue
+                    if target not in index:
+                        index[target] = lowlink[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.downstream[target])))
+                        advanced = True
+                        break
+                    if target in on_stack:
+                        lowlink[node_id] = min(lowlink[node_id], index[target])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node_id])
+                if lowlink[node_id] == index[node_id]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node_id:
+                            break
+                    if len(component) > 1 or node_id in self.downstream[node_id]:
+                        members.update(component)
+        return members
+
+    def collect_inputs(self, node_id: str) -> Dict[str, Any]:
+        """Build a node's inputs from its manual input and upstream outputs"""
+        node = self.nodes[node_id]
+        inputs = {"manual": node["data"].get("manualInput", "")}
+        for source_id in self.upstream[node_id]:
+            source_data = self.nodes[source_id]["data"]
+            if source_data.get("lastOutput"):
+                inputs[source_data.get("label", "input")] = source_data["lastOutput"]
+        return inputs
+
+def run_flow(
+    nodes: List[Dict[str, Any]],
+    edges: List[Dict[str, Any]],
+    start_node_ids: Optional[List[str]] = None,
+    max_parallel: Optional[int] = None,
+    timeout: int = 600,
+    use_output_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Execute a flow in dependency order, running independent branches concurrently
+
+    Nodes are updated in place: each executed node's data["lastOutput"] is set
+    to its result. A node only runs after every upstream node in the same run
+    has finished (join nodes wait for all of their inputs). Memoizable nodes
+    whose code and inputs match a cached run reuse that output.
+
+    Args:
+        nodes: Flow nodes
+        edges: Flow edges
+        start_node_ids: Run these nodes and everything downstream; None runs the whole flow
+        max_parallel: Maximum nodes executing at once
+        timeout: Per-node execution timeout in seconds
+        use_output_cache: Reuse outputs of unchanged nodes from the output cache
+
+    Returns:
+        Dictionary with execution order, per-node results and skipped nodes
+    """
+    start_time = time.time()
+    graph = FlowGraph(nodes, edges)
+    max_parallel = max(1, max_parallel or FLOW_MAX_PARALLEL)
+
+    if start_node_ids is None:
+        members = list(graph.nodes)
+    else:
+        members = graph.reachable_from(start_node_ids)
+    sorted_nodes = graph.topological_order(members)
+    runnable = set(sorted_nodes["order"])
+
+    # Remaining upstream dependencies for each node within this run
+    waiting_on = {
+        node_id: sum(1 for source in graph.upstream[node_id] if source in runnable)
+        for node_id in runnable
+    }
+    ready = collections.deque(node_id for node_id in sorted_nodes["order"] if waiting_on[node_id] == 0)
+    in_flight = {}
+    executed = []
+    results = {}
+
+    def complete(node_id: str):
+        executed.append(node_id)
+        for target in graph.downstream[node_id]:
+            if target in waiting_on:
+                waiting_on[target] -= 1
+                if waiting_on[target] == 0:
+                    ready.append(target)
+
+    while ready or in_flight:
+        while ready and len(in_flight) < max_parallel:
+            node_id = ready.popleft()
+            node_data = graph.nodes[node_id]["data"]
+            if not node_data.get("pythonFunction"):
+                # Nothing to run, pass the existing output straight through
+                complete(node_id)
+                continue
+            inputs = graph.collect_inputs(node_id)
+            cache_key = None
+            if use_output_cache and is_memoizable(graph.nodes[node_id]):
+                cache_key = compute_output_key(node_data["pythonFunction"], inputs)
+                cached_output = get_cached_output(cache_key)
+                if cached_output is not None:
+                    node_data["lastOutput"] = cached_output
+                    results[node_id] = {
+                        "success": True,
+                        "error": None,
+                        "execution_time": 0,
+                        "cached": True
+                    }
+                    complete(node_id)
+                    continue
+            future = submit_python_function(
+                function_code=node_data["pythonFunction"],
+                input_value=json.dumps(inputs),
+                timeout=timeout,
+                node_type=graph.nodes[node_id].get("type") or node_data.get("nodeType")
+            )
+            in_flight[future] = (node_id, cache_key)
+
+        if not in_flight:
+            continue
+
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in done:
+            node_id, cache_key = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"success": False, "output": None, "error": str(e), "execution_time": 0}
+            graph.nodes[node_id]["data"]["lastOutput"] = result.get("output", "")
+            results[node_id] = {
+                "success": result.get("success", False),
+                "error": result.get("error"),
+                "execution_time": result.get("execution_time"),
+                "resources": result.get("resources"),
+                "cached": False
+            }
+            if cache_key is not None and result.get("success"):
+                store_output(cache_key, result.get("output"))
+            complete(node_id)
+
+    return {
+        "success": all(r["success"] for r in results.values()),
+        "executed": executed,
+        "results": results,
+        "cache_hits": sum(1 for r in results.values() if r["cached"]),
+        "skipped": [
+            {"node_id": node_id, "reason": "cycle"} for node_id in sorted_nodes["cyclic"]
+        ] + [
+            {"node_id": node_id, "reason": "blocked_by_cycle", "upstream": upstream}
+            for node_id, upstream in sorted_nodes["blocked"].items()
+        ],
+        "execution_time": time.time() - start_time
+    }
@@ -0,0 +1,163 @@
+"""
+Persistent cache of LLM responses keyed by the full request.
+
+The key is a hash of every request parameter (model, system prompt,
+messages, temperature, sampling settings, max tokens, stop sequences), so a
+hit is only returned for an identical request. Responses are kept in a
+SQLite file shared by the API and worker processes, indexed for LRU
+eviction; entries expire after SMART_FOLDER_LLM_CACHE_TTL and the least
+recently used ones are evicted once the cache is over its entry or size
+limit. Caching is opt-in per request, or for every request with
+SMART_FOLDER_LLM_CACHE=1.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from storage import FLOWS_DIR, ensure_flows_directory
+
+# Cache every LLM request unless it opts out
+LLM_CACHE_DEFAULT = os.getenv("SMART_FOLDER_LLM_CACHE", "0").lower() in ("1", "true", "yes")
+
+# Seconds a cached response stays valid (0 for no expiry)
+LLM_CACHE_TTL = float(os.getenv("SMART_FOLDER_LLM_CACHE_TTL", str(7 * 86400)))
+
+# Responses kept at most
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("SMART_FOLDER_LLM_CACHE_MAX_ENTRIES", "10000"))
+
+# Total response bytes kept at most
+LLM_CACHE_MAX_BYTES = int(float(os.getenv("SMART_FOLDER_LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+class LLMResponseCache:
+    """Responses stored in SQLite with LRU and TTL eviction"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS llm_responses (
+        cache_key TEXT PRIMARY KEY,
+        model TEXT,
+        response TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS llm_responses_last_used ON llm_responses (last_used);
+    CREATE INDEX IF NOT EXISTS llm_responses_created_at ON llm_responses (created_at);
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        ttl: float = LLM_CACHE_TTL,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        max_bytes: int = LLM_CACHE_MAX_BYTES
+    ):
+        self.db_path = db_path or os.path.join(FLOWS_DIR, "llm_cache.db")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evicted": 0}
+
+    def _connect_locked(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.db_path.startswith(FLOWS_DIR):
+                ensure_flows_directory()
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """Hash request parameters into a cache key"""
+        canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached response, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect_locked()
+            row = conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl > 0 and row[1] < now - self.ttl:
+                conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (key,))
+                self._stats["expired"] += 1
+                row = None
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            conn.execute(
+                "UPDATE llm_responses SET last_used = ?, hits = hits + 1 WHERE cache_key = ?", (now, key)
+            )
+            self._stats["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict[str, Any], model: Optional[str] = None):
+        """Store a response and evict down to the size limits"""
+        raw = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            conn = self._connect_locked()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (cache_key, model, response, size, created_at, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, model, raw, len(raw.encode("utf-8")), now, now)
+            )
+            self._stats["stores"] += 1
+            self._evict_locked(conn, now)
+
+    def _evict_locked(self, conn: sqlite3.Connection, now: float):
+        if self.ttl > 0:
+            self._stats["expired"] += conn.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl,)
+            ).rowcount
+        count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        evict = []
+        for key, entry_size in conn.execute("SELECT cache_key, size FROM llm_responses ORDER BY last_used"):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            evict.append((key,))
+            count -= 1
+            size -= entry_size
+        conn.executemany("DELETE FROM llm_responses WHERE cache_key = ?", evict)
+        self._stats["evicted"] += len(evict)
+
+    def clear(self) -> int:
+        with self._lock:
+            return self._connect_locked().execute("DELETE FROM llm_responses").rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, size, total_hits = self._connect_locked().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM llm_responses"
+            ).fetchone()
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "entries": count,
+                "bytes": size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "enabled_by_default": LLM_CACHE_DEFAULT,
+                # Hits on stored entries from every process sharing the cache
+                "stored_entry_hits": total_hits,
+                **self._stats,
+                "hit_rate": (self._stats["hits"] / lookups) if lookups else 0.0
+            }
+
+# Process-wide cache, opened on first use
+_cache = LLMResponseCache()
+
+def get_llm_cache() -> LLMResponseCache:
+    return _cache
@@ -0,0 +1,327 @@
+"""
+Shared Anthropic clients with concurrency limits, rate limiting and retries.
+
+Node code gets a client from get_anthropic_client(api_key) instead of
+constructing anthropic.Anthropic itself, so every execution using a key reuses
+one client and with it the HTTP connection pool and TLS sessions. Calls to
+messages.create() and messages.stream() go through:
+
+- a process-wide concurrency limit and a per-key one
+  (SMART_FOLDER_LLM_CONCURRENCY, SMART_FOLDER_LLM_KEY_CONCURRENCY)
+- a per-key token bucket of requests per minute (SMART_FOLDER_LLM_RPM)
+- retries with exponential backoff and jitter on rate limits, overloads,
+  server errors and connection failures, honouring retry-after
+  (SMART_FOLDER_LLM_MAX_RETRIES)
+
+A streamed request keeps its concurrency slot until the stream is closed or
+read to the end. Other client methods are passed straight to the SDK with its
+own retries.
+
+Requests can opt into the persistent response cache in llm_cache.py with
+create(..., use_cache=True); a hit returns the stored response without
+calling out and is noted in the execution log.
+
+Limits apply per process, so with the worker pool enabled each worker has its
+own. Set SMART_FOLDER_ANTHROPIC_BASE_URL to point every client at another
+endpoint, e.g. the local mock server in mock_anthropic.py.
+"""
+import hashlib
+import os
+import random
+import threading
+import time
+from typing import Dict, Any, Optional, Callable
+
+import anthropic
+
+from llm_cache import get_llm_cache, LLM_CACHE_DEFAULT
+
+# Requests in flight across all keys
+LLM_CONCURRENCY = int(os.getenv("SMART_FOLDER_LLM_CONCURRENCY", "16"))
+
+# Requests in flight per API key
+LLM_KEY_CONCURRENCY = int(os.getenv("SMART_FOLDER_LLM_KEY_CONCURRENCY", "8"))
+
+# Requests started per minute per API key (0 for no limit)
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("SMART_FOLDER_LLM_RPM", "0"))
+
+# Retries of a failed request before giving up
+LLM_MAX_RETRIES = int(os.getenv("SMART_FOLDER_LLM_MAX_RETRIES", "4"))
+
+# Backoff before the first retry and the cap on any single wait, in seconds
+LLM_BACKOFF_BASE = float(os.getenv("SMART_FOLDER_LLM_BACKOFF", "1"))
+LLM_BACKOFF_MAX = 30.0
+
+# Endpoint override for every client, e.g. a local mock server
+ANTHROPIC_BASE_URL = os.getenv("SMART_FOLDER_ANTHROPIC_BASE_URL") or None
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens, sleeping until they are available; returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+_global_slots = threading.BoundedSemaphore(max(1, LLM_CONCURRENCY))
+_clients: Dict[str, "PooledAnthropicClient"] = {}
+_clients_lock = threading.Lock()
+
+def _key_id(api_key: str) -> str:
+    """Stable, non-secret identifier of an API key for stats"""
+    return f"{api_key[:7]}…{hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:8]}"
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying after error, None if it isn't retryable"""
+    if isinstance(error, anthropic.APIConnectionError):
+        # Includes timeouts
+        pass
+    elif isinstance(error, anthropic.APIStatusError) and error.status_code in RETRYABLE_STATUS:
+        retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), LLM_BACKOFF_MAX)
+            except ValueError:
+                pass
+    else:
+        return None
+    # Full jitter keeps fanned-out executions from retrying in lockstep
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+class _SlotStream:
+    """A stream that gives its concurrency slots back once it is closed or read to the end"""
+
+    def __init__(self, stream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self._release()
+
+    def __next__(self):
+        try:
+            return next(self._stream)
+        except BaseException:
+            self._release()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.close()
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+    def __del__(self):
+        # A stream dropped without being closed mustn't hold its slots forever
+        self._release()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+class _LimitedStreamManager:
+    """messages.stream() context manager that opens the stream under the client's limits"""
+
+    def __init__(self, owner: "PooledAnthropicClient", params: Dict[str, Any]):
+        self._owner = owner
+        self._params = params
+        self._stream = None
+
+    def __enter__(self):
+        manager = self._owner._limited.messages.stream(**self._params)
+        self._stream = self._owner.open_stream(manager.__enter__)
+        return self._stream
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        if self._stream is not None:
+            self._stream.close()
+
+class _LimitedMessages:
+    """messages resource whose create() is limited and retried"""
+
+    def __init__(self, owner: "PooledAnthropicClient"):
+        self._owner = owner
+
+    def create(self, use_cache: Optional[bool] = None, **params):
+        """
+        messages.create() under the client's limits
+
+        With use_cache (default SMART_FOLDER_LLM_CACHE) an identical earlier
+        request's response is returned from the response cache.
+        """
+        if use_cache is None:
+            use_cache = LLM_CACHE_DEFAULT
+        if params.get("stream"):
+            return self._owner.open_stream(self._owner._limited.messages.create, **params)
+        if not use_cache:
+            return self._owner.call(self._owner._limited.messages.create, **params)
+
+        cache = get_llm_cache()
+        key = cache.make_key(params)
+        cached = cache.get(key)
+        if cached is not None:
+            self._owner._count("cache_hits")
+            from executor import write_log, _current_execution
+            log_file_id = _current_execution()
+            if log_file_id is not None:
+                write_log(log_file_id, f"💾 LLM cache hit ({params.get('model')}, key {key[:12]}), skipping API call\n")
+            return anthropic.types.Message.model_validate(cached)
+        self._owner._count("cache_misses")
+        response = self._owner.call(self._owner._limited.messages.create, **params)
+        cache.put(key, response.model_dump(mode="json"), params.get("model"))
+        return response
+
+    def stream(self, **params):
+        """messages.stream() under the client's limits"""
+        return _LimitedStreamManager(self._owner, params)
+
+    def __getattr__(self, name):
+        return getattr(self._owner.client.messages, name)
+
+class PooledAnthropicClient:
+    """One long-lived anthropic.Anthropic per API key with limits and retries"""
+
+    def __init__(self, api_key: str, base_url: Optional[str] = ANTHROPIC_BASE_URL):
+        self.key_id = _key_id(api_key)
+        self.client = anthropic.Anthropic(api_key=api_key, base_url=base_url)
+        # Same connection pool without SDK retries; call() retries these so limits and backoff see every attempt
+        self._limited = self.client.with_options(max_retries=0)
+        self.messages = _LimitedMessages(self)
+        self._slots = threading.BoundedSemaphore(max(1, LLM_KEY_CONCURRENCY))
+        self._bucket = (
+            TokenBucket(LLM_REQUESTS_PER_MINUTE / 60.0, max(1.0, LLM_REQUESTS_PER_MINUTE / 60.0))
+            if LLM_REQUESTS_PER_MINUTE > 0 else None
+        )
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "in_flight": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "throttled_seconds": 0.0,
+            "queued_seconds": 0.0
+        }
+
+    def _count(self, name: str, amount: float = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def call(self, method: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run an API call under the concurrency limits, rate limit and retry policy"""
+        return self._run(method, args, kwargs, False)
+
+    def open_stream(self, method: Callable[..., Any], *args, **kwargs) -> _SlotStream:
+        """Open a stream like call(), holding its slots until the stream is closed"""
+        return self._run(method, args, kwargs, True)
+
+    def _run(self, method: Callable[..., Any], args, kwargs, hold: bool) -> Any:
+        attempt = 0
+        while True:
+            if self._bucket is not None:
+                self._count("throttled_seconds", self._bucket.acquire())
+            queued = time.monotonic()
+            # Per-key slot first, so a busy key doesn't hold global slots while it waits
+            self._slots.acquire()
+            _global_slots.acquire()
+            self._count("queued_seconds", time.monotonic() - queued)
+            self._count("requests")
+            self._count("in_flight")
+            try:
+                result = method(*args, **kwargs)
+            except BaseException as e:
+                self._release_slots()
+                delay = _retry_delay(e, attempt) if isinstance(e, Exception) and attempt < LLM_MAX_RETRIES else None
+                if delay is None:
+                    self._count("failed")
+                    raise
+            else:
+                self._count("succeeded")
+                if not hold:
+                    self._release_slots()
+                    return result
+                released = threading.Event()
+
+                def release():
+                    # Once only, whichever of close, exhaustion or garbage collection comes first
+                    with self._lock:
+                        if released.is_set():
+                            return
+                        released.set()
+                    self._release_slots()
+                return _SlotStream(result, release)
+            # Back off without holding a slot
+            self._count("retries")
+            attempt += 1
+            time.sleep(delay)
+
+    def _release_slots(self):
+        self._count("in_flight", -1)
+        _global_slots.release()
+        self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 3)
+        stats["queued_seconds"] = round(stats["queued_seconds"], 3)
+        return stats
+
+def get_anthropic_client(api_key: Optional[str] = None) -> PooledAnthropicClient:
+    """
+    Return the shared client for an API key (ANTHROPIC_API_KEY by default)
+
+    Use it like anthropic.Anthropic: client.messages.create(...).
+    """
+    api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
+    if not api_key:
+        raise ValueError("Anthropic API key required")
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = PooledAnthropicClient(api_key)
+            _clients[api_key] = client
+        return client
+
+def get_llm_stats() -> Dict[str, Any]:
+    """Return per-key request, retry and throttling counters"""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {
+        "clients": {client.key_id: client.stats() for client in clients},
+        "concurrency": LLM_CONCURRENCY,
+        "key_concurrency": LLM_KEY_CONCURRENCY,
+        "requests_per_minute": LLM_REQUESTS_PER_MINUTE,
+        "max_retries": LLM_MAX_RETRIES,
+        "base_url": ANTHROPIC_BASE_URL,
+        "cache": get_llm_cache().stats()
+    }
@@ -0,0 +1,235 @@
+"""
+In-memory execution log buffers with push notification.
+
+Every tracked execution gets a bounded buffer of log text. Readers address the
+stream by character position, so polling clients, long-poll clients and SSE
+subscribers can all resume from where they left off. Writing the log to the
+temp dir is optional (SMART_FOLDER_LOG_SPILL=1).
+"""
+import asyncio
+import collections
+import os
+import tempfile
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+# Maximum characters kept in memory per execution log
+LOG_BUFFER_MAX_CHARS = int(os.getenv("SMART_FOLDER_LOG_BUFFER_CHARS", str(1024 * 1024)))
+
+# Number of finished logs kept around for late readers
+LOG_RETAINED_FINISHED = int(os.getenv("SMART_FOLDER_LOG_RETAINED", "500"))
+
+# Total characters held by finished logs kept for late readers
+LOG_RETAINED_MAX_CHARS = int(os.getenv("SMART_FOLDER_LOG_RETAINED_CHARS", str(64 * 1024 * 1024)))
+
+# Also append log lines to smart_folder_log_<id>.txt in the temp dir
+LOG_SPILL_TO_DISK = os.getenv("SMART_FOLDER_LOG_SPILL", "0").lower() in ("1", "true", "yes")
+
+def get_spill_path(log_file_id: str) -> str:
+    """Return the temp file path an execution log spills to"""
+    return os.path.join(tempfile.gettempdir(), f"smart_folder_log_{log_file_id}.txt")
+
+class LogBuffer:
+    """Bounded log text for one execution with async waiters for new data"""
+
+    def __init__(self, log_file_id: str, max_chars: int = LOG_BUFFER_MAX_CHARS, spill: bool = LOG_SPILL_TO_DISK):
+        self.log_file_id = log_file_id
+        self.max_chars = max_chars
+        self.closed = False
+        self._chunks = collections.deque()
+        self._size = 0
+        self._start = 0
+        self._end = 0
+        self._lock = threading.Lock()
+        self._waiters = set()
+        self._spill = open(get_spill_path(log_file_id), 'a', encoding='utf-8') if spill else None
+
+    @property
+    def position(self) -> int:
+        """Stream position just past the last buffered character"""
+        return self._end
+
+    def append(self, text: str):
+        """Append text and wake any waiting readers"""
+        if not text:
+            return
+        with self._lock:
+            if self.closed:
+                return
+            self._chunks.append(text)
+            self._size += len(text)
+            self._end += len(text)
+            # Drop the oldest chunks once over budget, always keeping the newest
+            while self._size > self.max_chars and len(self._chunks) > 1:
+                dropped = self._chunks.popleft()
+                self._size -= len(dropped)
+                self._start += len(dropped)
+            if self._spill is not None:
+                try:
+                    self._spill.write(text)
+                    self._spill.flush()
+                except (OSError, ValueError):
+                    pass
+            waiters = list(self._waiters)
+        self._notify(waiters)
+
+    def read(self, position: int = 0) -> Tuple[str, int]:
+        """
+        Read everything after a stream position
+
+        Returns:
+            (content, new_position); content starts at the oldest retained
+            character if the requested position has been evicted
+        """
+        with self._lock:
+            position = max(position, self._start)
+            if position >= self._end:
+                return "", self._end
+            parts = []
+            offset = self._start
+            for chunk in self._chunks:
+                chunk_end = offset + len(chunk)
+                if chunk_end > position:
+                    parts.append(chunk[max(0, position - offset):])
+                offset = chunk_end
+            return "".join(parts), self._end
+
+    async def wait(self, position: int, timeout: float) -> bool:
+        """Wait until data past position exists or the log closes; False on timeout"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with self._lock:
+            if self._end > position or self.closed:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    async def follow(self, position: int = 0, heartbeat: float = 15):
+        """
+        Yield (content, position) as output arrives until the log closes.
+        
+        Slow consumers get coalesced chunks rather than stalling the writer;
+        (None, position) is yielded after heartbeat idle seconds.
+        """
+        while True:
+            content, new_position = self.read(position)
+            if content:
+                position = new_position
+                yield content, position
+                continue
+            if self.closed:
+                return
+            if not await self.wait(position, heartbeat):
+                yield None, position
+
+    def close(self):
+        """Mark the log finished and release the spill file"""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self._spill is not None:
+                try:
+                    self._spill.close()
+                except OSError:
+                    pass
+                self._spill = None
+            waiters = list(self._waiters)
+        self._notify(waiters)
+
+    @staticmethod
+    def _notify(waiters):
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+
+# Registry of live and recently finished execution logs
+_buffers: Dict[str, LogBuffer] = {}
+_finished_order = collections.OrderedDict()
+_finished_chars = 0
+_registry_lock = threading.Lock()
+
+def open_log(log_file_id: str, initial_text: str = "") -> LogBuffer:
+    """Create (or return) the buffer for an execution"""
+    with _registry_lock:
+        buffer = _buffers.get(log_file_id)
+        if buffer is None:
+            buffer = LogBuffer(log_file_id)
+            _buffers[log_file_id] = buffer
+    buffer.append(initial_text)
+    return buffer
+
+def get_log(log_file_id: str) -> Optional[LogBuffer]:
+    """Return the buffer for an execution if it is tracked"""
+    return _buffers.get(log_file_id)
+
+def append_log(log_file_id: str, text: str):
+    """
+    Append text to an execution log.
+
+    Untracked executions (no open_log call) are only written when spilling to
+    disk is enabled, so fire-and-forget runs don't accumulate in memory.
+    """
+    buffer = _buffers.get(log_file_id)
+    if buffer is not None:
+        buffer.append(text)
+    elif LOG_SPILL_TO_DISK:
+        try:
+            with open(get_spill_path(log_file_id), 'a', encoding='utf-8') as log:
+                log.write(text)
+        except OSError:
+            pass
+
+def close_log(log_file_id: str):
+    """Mark an execution log finished, retaining it for late readers"""
+    global _finished_chars
+    buffer = _buffers.get(log_file_id)
+    if buffer is None or buffer.closed:
+        return
+    buffer.close()
+    with _registry_lock:
+        _finished_order[log_file_id] = buffer._size
+        _finished_chars += buffer._size
+        while _finished_order and (
+            len(_finished_order) > LOG_RETAINED_FINISHED or _finished_chars > LOG_RETAINED_MAX_CHARS
+        ):
+            evicted_id, size = _finished_order.popitem(last=False)
+            _finished_chars -= size
+            _buffers.pop(evicted_id, None)
+
+def discard_log(log_file_id: str):
+    """Forget an execution log, closing it first if it is still open"""
+    global _finished_chars
+    buffer = _buffers.get(log_file_id)
+    if buffer is None:
+        return
+    buffer.close()
+    with _registry_lock:
+        _buffers.pop(log_file_id, None)
+        _finished_chars -= _finished_order.pop(log_file_id, 0)
+
+def get_log_stats() -> Dict[str, Any]:
+    """Return counts of tracked logs and buffered characters"""
+    with _registry_lock:
+        buffers = list(_buffers.values())
+    return {
+        "tracked": len(buffers),
+        "running": sum(1 for b in buffers if not b.closed),
+        "finished": sum(1 for b in buffers if b.closed),
+        "buffered_chars": sum(b._size for b in buffers),
+        "retained_chars": _finished_chars,
+        "max_retained": LOG_RETAINED_FINISHED,
+        "max_retained_chars": LOG_RETAINED_MAX_CHARS,
+        "spill_to_disk": LOG_SPILL_TO_DISK
+    }
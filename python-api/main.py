@@ -1,6 +1,7 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import sys
@@ -11,7 +12,9 @@ import threading
 import tempfile
 import time
 import uuid
-import glob
+import asyncio
+import itertools
+import queue
 
 # Load environment variables from .env file
 try:
@@ -21,14 +24,41 @@ except ImportError:
     # dotenv not installed, skip loading .env file
     pass
 
-from executor import execute_python_function, register_session_for_cancellation
-from storage import save_flow, load_flow, list_flows
-
-# Session management for execution cancellation
-execution_sessions: Dict[str, Dict[str, Any]] = {}
-
-# Webhook inbox store for named webhook endpoints
-webhook_inbox_store: Dict[str, Dict[str, Any]] = {}
+from executor import (
+    submit_python_function,
+    cancel_running_execution,
+    clear_cancellation_marker,
+    get_code_cache_stats,
+    clear_code_cache,
+    get_execution_thread_stats,
+    NODE_LIMITS
+)
+from worker_pool import start_worker_pool, stop_worker_pool, get_worker_pool
+from log_buffer import open_log, get_log, append_log, close_log, get_log_stats, get_spill_path
+from storage import save_flow, load_flow, list_flows, update_node_data, get_flow_etag, FLOW_SORT_FIELDS
+from flow_runner import run_flow
+from output_cache import get_output_cache_stats, clear_output_cache
+from webhook_queue import start_webhook_queue, stop_webhook_queue, JOB_STATUSES, WEBHOOK_MAX_BATCH
+from webhook_inbox import record_payload, get_history, get_entry, get_inbox_stats, clear_inbox
+from execution_metrics import get_execution_metrics, clear_execution_metrics
+from model_registry import get_model_registry, start_preloading
+from transcription import shutdown_transcription_pools, get_transcription_pool_stats
+from llm_client import get_llm_stats
+from llm_cache import get_llm_cache
+from file_scanner import list_matching_files, iter_file_batches, VIDEO_EXTENSIONS, AUDIO_EXTENSIONS, TEXT_EXTENSIONS, SCAN_STREAM_BATCH
+from file_catalog import get_file_catalog, start_file_catalog, stop_file_catalog, QUERY_SORT_FIELDS
+from uploads import save_multipart_upload, unique_path, get_upload_sessions, UploadTooLarge, UploadOffsetMismatch, UPLOAD_CHUNK_SIZE
+from media import media_response
+from file_ops import iter_old_files, find_old_files, delete_files, parse_age, OLD_FILE_SORT_FIELDS, DELETE_BATCH_SIZE
+from session_manager import (
+    create_session,
+    get_session,
+    finish_session,
+    reap,
+    start_session_reaper,
+    stop_session_reaper,
+    get_session_stats
+)
 
 # Get allowed origins from environment variable
 def get_allowed_origins():
@@ -58,10 +88,32 @@ app.add_middleware(
     expose_headers=["*"],  # Allow streaming headers
 )
 
+@app.on_event("startup")
+async def start_execution_workers():
+    """Spawn the warm worker pool when SMART_FOLDER_WORKERS is configured"""
+    if start_worker_pool() is None:
+        # Executions run in this process, so preload shared models here;
+        # otherwise each worker preloads its own
+        start_preloading()
+    # Resume webhook deliveries left over from the previous run
+    start_webhook_queue(process_webhook, webhook_batch_policy)
+    start_session_reaper()
+    start_file_catalog()
+
+@app.on_event("shutdown")
+async def stop_execution_workers():
+    """Stop worker processes, webhook dispatching, session reaping and file watching with the API"""
+    stop_file_catalog()
+    stop_session_reaper()
+    stop_webhook_queue()
+    stop_worker_pool()
+    shutdown_transcription_pools()
+
 class ExecutionRequest(BaseModel):
     function_code: str
     input_value: str
     timeout: int = 600
+    node_type: Optional[str] = None
 
 class ExecutionResponse(BaseModel):
     success: bool
@@ -69,6 +121,16 @@ class ExecutionResponse(BaseModel):
     execution_time: float
     error: str | None
     error_type: str | None
+    resources: Optional[Dict[str, Any]] = None
+
+def format_resources(resources: Dict[str, Any]) -> str:
+    """One log line summarizing an execution's resource usage"""
+    return (
+        f"📈 Resources: {resources['wall_seconds']:.2f}s wall, {resources['cpu_seconds']:.2f}s CPU, "
+        f"{resources['peak_rss_bytes'] / (1024 * 1024):.1f} MB peak RSS, "
+        f"{resources['read_bytes']} bytes read, {resources['write_bytes']} bytes written, "
+        f"{resources['child_processes']} subprocesses\n"
+    )
 
 class FlowData(BaseModel):
     nodes: List[Dict[str, Any]]
@@ -78,6 +140,13 @@ class SaveFlowRequest(BaseModel):
     flow_data: FlowData
     flow_id: str = "default"
 
+class RunFlowRequest(BaseModel):
+    start_node_ids: Optional[List[str]] = None
+    max_parallel: Optional[int] = None
+    timeout: int = 600
+    save: bool = True
+    use_output_cache: bool = True
+
 class FlowResponse(BaseModel):
     success: bool
     message: str
@@ -116,11 +185,13 @@ async def execute_function(request: ExecutionRequest):
     ```
     """
     try:
-        result = execute_python_function(
+        # Await the execution so a heavy node doesn't stall the event loop
+        result = await asyncio.wrap_future(submit_python_function(
             function_code=request.function_code,
             input_value=request.input_value,
-            timeout=request.timeout
-        )
+            timeout=request.timeout,
+            node_type=request.node_type
+        ))
         return ExecutionResponse(**result)
     
     except Exception as e:
@@ -130,21 +201,50 @@ async def execute_function(request: ExecutionRequest):
         )
 
 @app.post("/api/execute/stream")
-async def execute_function_stream(request: ExecutionRequest):
+async def execute_function_stream(request: ExecutionRequest, http_request: Request):
     """
-    Execute a Python function with streaming output for subprocess commands.
+    Execute a Python function, streaming its progress as Server-Sent Events.
+    
+    log_progress() messages, print() output from user code and output of
+    commands run through stream_subprocess() are pushed as 'log' events as
+    they are produced, followed by a 'success' or 'error' event and a final
+    'complete' event. Disconnecting cancels the execution.
     """
-    def generate_stream():
+    log_file_id = str(uuid.uuid4())
+    open_log(log_file_id, "🚀 Starting execution...\n")
+    session = create_session(log_file_id)
+    
+    future = submit_python_function(
+        function_code=request.function_code,
+        input_value=request.input_value,
+        timeout=request.timeout,
+        log_file_id=log_file_id,
+        node_type=request.node_type
+    )
+    
+    def on_execution_done(_):
+        # All log output has been delivered by the time the result is available
+        close_log(log_file_id)
+        clear_cancellation_marker(log_file_id)
+        finish_session(log_file_id, "completed")
+    
+    future.add_done_callback(on_execution_done)
+    
+    async def generate_stream():
+        finished = False
         try:
-            # Simple streaming for subprocess commands
-            yield f"data: {json.dumps({'type': 'start', 'content': 'Starting execution...'})}\n\n"
+            yield f"data: {json.dumps({'type': 'start', 'content': 'Starting execution...', 'log_file_id': log_file_id})}\n\n"
             
-            # Execute the function but capture subprocess output
-            result = execute_python_function(
-                function_code=request.function_code,
-                input_value=request.input_value,
-                timeout=request.timeout
-            )
+            async for content, _ in get_log(log_file_id).follow():
+                if content is None:
+                    if await http_request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps({'type': 'log', 'content': content})}\n\n"
+            
+            result = await asyncio.wrap_future(future)
+            finished = True
             
             # Stream the final result
             if result["success"]:
@@ -152,83 +252,88 @@ async def execute_function_stream(request: ExecutionRequest):
             else:
                 yield f"data: {json.dumps({'type': 'error', 'content': result['error']})}\n\n"
                 
-            yield f"data: {json.dumps({'type': 'complete', 'execution_time': result['execution_time']})}\n\n"
+            yield f"data: {json.dumps({'type': 'complete', 'execution_time': result['execution_time'], 'resources': result.get('resources')})}\n\n"
             
         except Exception as e:
             yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+        finally:
+            if not finished and not future.done():
+                # Client went away, stop the execution and anything it started
+                session["status"] = "cancelled"
+                cancel_running_execution(log_file_id)
     
-    return StreamingResponse(generate_stream(), media_type="text/event-stream")
+    return StreamingResponse(
+        generate_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/api/execute/logging")
 async def execute_function_with_logging(request: ExecutionRequest):
     """
-    Execute a Python function with file-based logging for streaming updates.
-    Returns immediately with log_file_id for polling.
+    Execute a Python function with buffered logging for streaming updates.
+    Returns immediately with log_file_id; follow the log via
+    /api/logs/{log_file_id}/stream (SSE) or poll /api/logs/{log_file_id}.
     """
     try:
         # Generate log file ID immediately
         log_file_id = str(__import__('uuid').uuid4())
-        log_path = os.path.join(tempfile.gettempdir(), f"smart_folder_log_{log_file_id}.txt")
-        
-        # Create initial log file
-        with open(log_path, 'w') as log:
-            log.write("🚀 Starting execution...\n")
-            log.flush()
-        
-        # Track session
-        execution_sessions[log_file_id] = {
-            "start_time": time.time(),
-            "status": "running",
-            "log_path": log_path,
-            "thread_ref": None,
-            "process_refs": []
-        }
         
-        # Register session for cancellation checks
-        register_session_for_cancellation(log_file_id, execution_sessions[log_file_id])
+        # Create the in-memory log buffer
+        open_log(log_file_id, "🚀 Starting execution...\n")
         
-        # Start execution in background thread
-        def run_execution():
-            result = execute_python_function(
-                function_code=request.function_code,
-                input_value=request.input_value,
-                timeout=request.timeout,
-                log_file_id=log_file_id  # Pass existing log file ID
-            )
+        # Track session, which is also checked for cancellation
+        session = create_session(log_file_id, log_path=get_spill_path(log_file_id), future=None)
+        
+        # Record the outcome once the background execution finishes
+        def on_execution_done(future):
+            clear_cancellation_marker(log_file_id)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"success": False, "output": None, "error": str(e)}
             
             # Check if session was cancelled
-            session = execution_sessions.get(log_file_id)
-            if session and session["status"] == "cancelled":
-                with open(log_path, 'a') as log:
-                    log.write("🚫 EXECUTION CANCELLED\n--- FINAL RESULT ---\nExecution was cancelled by user\n")
-                    log.flush()
+            if session["status"] == "cancelled":
+                append_log(log_file_id, "🚫 EXECUTION CANCELLED\n--- FINAL RESULT ---\nExecution was cancelled by user\n")
+                close_log(log_file_id)
+                finish_session(log_file_id)
                 return
             
             # Write completion status to log
-            with open(log_path, 'a') as log:
-                if result["success"]:
-                    log.write(f"✅ EXECUTION COMPLETE\n--- FINAL RESULT ---\n{result['output']}\n")
-                else:
-                    log.write(f"❌ EXECUTION FAILED\n--- ERROR ---\n{result['error']}\n")
-                log.flush()
+            if result.get("resources"):
+                append_log(log_file_id, format_resources(result["resources"]))
+            if result["success"]:
+                append_log(log_file_id, f"✅ EXECUTION COMPLETE\n--- FINAL RESULT ---\n{result['output']}\n")
+            else:
+                append_log(log_file_id, f"❌ EXECUTION FAILED\n--- ERROR ---\n{result['error']}\n")
+            close_log(log_file_id)
             
             # Update session status
-            if log_file_id in execution_sessions:
-                execution_sessions[log_file_id]["status"] = "completed"
-        
-        # Start background execution
-        thread = threading.Thread(target=run_execution)
-        thread.daemon = True
-        thread.start()
+            finish_session(log_file_id, "completed", {
+                "success": result["success"],
+                "error": result.get("error"),
+                "error_type": result.get("error_type"),
+                "execution_time": result.get("execution_time"),
+                "resources": result.get("resources")
+            })
         
-        # Store thread reference
-        execution_sessions[log_file_id]["thread_ref"] = thread
+        # Start background execution on the worker pool (or execution threads)
+        future = submit_python_function(
+            function_code=request.function_code,
+            input_value=request.input_value,
+            timeout=request.timeout,
+            log_file_id=log_file_id,  # Pass existing log file ID
+            node_type=request.node_type
+        )
+        session["future"] = future
+        future.add_done_callback(on_execution_done)
         
         # Return immediately with log file ID
         return {
             "success": True,
             "log_file_id": log_file_id,
-            "message": "Execution started, poll logs for updates"
+            "message": "Execution started, stream or poll logs for updates"
         }
     
     except Exception as e:
@@ -243,7 +348,7 @@ async def cancel_execution(log_file_id: str):
     Cancel a running execution by log file ID.
     """
     try:
-        session = execution_sessions.get(log_file_id)
+        session = get_session(log_file_id)
         
         if not session:
             raise HTTPException(status_code=404, detail="Execution session not found")
@@ -258,20 +363,18 @@ async def cancel_execution(log_file_id: str):
         # Mark session as cancelled
         session["status"] = "cancelled"
         
-        # Write cancellation marker to log file
-        log_path = session.get("log_path")
-        if log_path and os.path.exists(log_path):
-            with open(log_path, 'a') as log:
-                log.write("🚫 Cancellation requested...\n")
-                log.flush()
+        # Write cancellation marker to the log
+        append_log(log_file_id, "🚫 Cancellation requested...\n")
         
-        # TODO: Kill any subprocess references if we had them
-        # For now, the thread will check the cancelled status
+        # Kill the processes the execution started; a worker that doesn't
+        # stop within the grace period is killed along with its process tree
+        outcome = cancel_running_execution(log_file_id)
         
         return {
             "success": True,
             "message": "Execution cancelled",
-            "log_file_id": log_file_id
+            "log_file_id": log_file_id,
+            "processes_killed": outcome["processes_killed"]
         }
     
     except HTTPException:
@@ -282,6 +385,143 @@ async def cancel_execution(log_file_id: str):
             detail=f"Failed to cancel execution: {str(e)}"
         )
 
+@app.get("/api/executor/cache")
+async def get_executor_cache_stats():
+    """
+    Report hit/miss/eviction counters for the compiled code cache.
+    """
+    return {
+        "success": True,
+        "cache": get_code_cache_stats()
+    }
+
+@app.delete("/api/executor/cache")
+async def clear_executor_cache():
+    """
+    Drop all compiled functions from the code cache.
+    """
+    removed = clear_code_cache()
+    return {
+        "success": True,
+        "message": f"Cleared {removed} cached functions",
+        "removed": removed
+    }
+
+@app.get("/api/executor/output-cache")
+async def get_output_cache_endpoint():
+    """
+    Report size and hit/miss counters for the node output cache.
+    """
+    return {
+        "success": True,
+        "cache": get_output_cache_stats()
+    }
+
+@app.delete("/api/executor/output-cache")
+async def clear_output_cache_endpoint():
+    """
+    Drop all memoized node outputs.
+    """
+    removed = clear_output_cache()
+    return {
+        "success": True,
+        "message": f"Cleared {removed} cached outputs",
+        "removed": removed
+    }
+
+@app.get("/api/executor/pool")
+async def get_executor_pool_stats():
+    """
+    Report queue depth and per-worker state for the warm worker pool, or
+    busy and leaked execution threads when executions run in-process.
+    """
+    pool = get_worker_pool()
+    if pool is None:
+        return {
+            "success": True,
+            "enabled": False,
+            "message": "Worker pool disabled, executions run in the API process",
+            "threads": get_execution_thread_stats()
+        }
+    return {
+        "success": True,
+        "enabled": True,
+        "pool": pool.stats()
+    }
+
+@app.get("/api/executor/metrics")
+async def get_executor_metrics(node_type: Optional[str] = None):
+    """
+    Summarize resource usage of recent executions per node type
+    (wall and CPU seconds, peak RSS, bytes read/written, subprocesses).
+    """
+    return {
+        "success": True,
+        "metrics": get_execution_metrics(node_type),
+        "node_limits": NODE_LIMITS
+    }
+
+@app.delete("/api/executor/metrics")
+async def clear_executor_metrics():
+    """
+    Forget recorded execution metrics.
+    """
+    removed = clear_execution_metrics()
+    return {
+        "success": True,
+        "message": f"Cleared metrics of {removed} executions",
+        "removed": removed
+    }
+
+@app.get("/api/executor/models")
+async def get_model_registry_stats():
+    """
+    Report the shared models loaded in the API process, their memory use and
+    cache counters. With the worker pool enabled each worker has its own
+    registry. Chunked transcription pools hold their own model copies
+    outside the registry's budget and are reported separately.
+    """
+    return {
+        "success": True,
+        "registry": get_model_registry().stats(),
+        "transcription_pools": get_transcription_pool_stats()
+    }
+
+@app.delete("/api/executor/models")
+async def unload_models(kind: Optional[str] = None, name: Optional[str] = None):
+    """
+    Unload shared models that are not in use, optionally only one kind or name.
+    """
+    removed = get_model_registry().unload(kind, name)
+    return {
+        "success": True,
+        "message": f"Unloaded {removed} models",
+        "removed": removed
+    }
+
+@app.get("/api/executor/llm")
+async def get_llm_client_stats():
+    """
+    Report request, retry, throttling and response cache counters of the
+    shared Anthropic clients in the API process.
+    """
+    return {
+        "success": True,
+        "llm": get_llm_stats()
+    }
+
+@app.delete("/api/executor/llm/cache")
+async def clear_llm_cache():
+    """
+    Drop every cached LLM response.
+    """
+    removed = await run_in_threadpool(get_llm_cache().clear)
+    return {
+        "success": True,
+        "message": f"Cleared {removed} cached responses",
+        "removed": removed
+    }
+
 @app.post("/api/flows/save")
 async def save_flow_endpoint(request: SaveFlowRequest):
     """
@@ -306,14 +546,40 @@ async def save_flow_endpoint(request: SaveFlowRequest):
             detail=f"Failed to save flow: {str(e)}"
         )
 
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Check whether the client's If-None-Match header covers the given ETag"""
+    if etag is None:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or any(
+        (value[2:] if value.startswith("W/") else value) == etag for value in candidates
+    )
+
+def flow_response(content: Dict[str, Any], etag: Optional[str]) -> JSONResponse:
+    """JSON response that clients must revalidate against the flow's ETag"""
+    headers = {"Cache-Control": "no-cache"}
+    if etag:
+        headers["ETag"] = etag
+    return JSONResponse(content=content, headers=headers)
+
 @app.get("/api/flows/load/{flow_id}")
-async def load_flow_endpoint(flow_id: str = "default"):
+async def load_flow_endpoint(request: Request, flow_id: str = "default"):
     """
     Load a flow from persistent storage
+    
+    Responses carry an ETag; a request whose If-None-Match still matches the
+    stored flow gets an empty 304 instead of the full flow.
     """
     try:
+        etag = get_flow_etag(flow_id)
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        
         result = load_flow(flow_id)
-        return result
+        return flow_response(result, result.get("etag"))
     
     except Exception as e:
         raise HTTPException(
@@ -321,13 +587,91 @@ async def load_flow_endpoint(flow_id: str = "default"):
             detail=f"Failed to load flow: {str(e)}"
         )
 
+@app.post("/api/flows/{flow_id}/run")
+async def run_flow_endpoint(flow_id: str, request: Optional[RunFlowRequest] = None):
+    """
+    Run a saved flow on the server in dependency order.
+    
+    Independent branches execute concurrently; nodes with several inputs wait
+    for all upstream nodes. Pass start_node_ids to run only those nodes and
+    everything downstream of them. Updated outputs are saved back by default.
+    Nodes whose code and inputs are unchanged reuse their cached output unless
+    use_output_cache is false or the node sets data.memoize to false.
+    """
+    request = request or RunFlowRequest()
+    try:
+        flow_result = load_flow(flow_id)
+        if not flow_result["success"]:
+            raise HTTPException(status_code=404, detail=flow_result["message"])
+        
+        nodes = flow_result["nodes"]
+        edges = flow_result["edges"]
+        run_result = await run_in_threadpool(
+            run_flow,
+            nodes,
+            edges,
+            start_node_ids=request.start_node_ids,
+            max_parallel=request.max_parallel,
+            timeout=request.timeout,
+            use_output_cache=request.use_output_cache
+        )
+        
+        nodes_by_id = {node["id"]: node for node in nodes}
+        if request.save:
+            # Only write back the outputs that changed, leaving the rest of the flow untouched
+            update_node_data(flow_id, {
+                node_id: {"lastOutput": nodes_by_id[node_id]["data"].get("lastOutput")}
+                for node_id in run_result["executed"]
+            })
+        
+        return {
+            **run_result,
+            "flow_id": flow_id,
+            "outputs": {
+                node_id: nodes_by_id[node_id]["data"].get("lastOutput")
+                for node_id in run_result["executed"]
+            }
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to run flow: {str(e)}"
+        )
+
 @app.get("/api/flows/list")
-async def list_flows_endpoint():
+async def list_flows_endpoint(
+    offset: int = 0,
+    limit: Optional[int] = None,
+    sort: str = "saved_at",
+    order: str = "desc"
+):
     """
-    List all available flows
+    List available flows, most recently saved first by default
+    
+    Supports pagination with offset/limit and sorting by saved_at, flow_id,
+    node_count or edge_count in asc or desc order.
     """
+    if sort not in FLOW_SORT_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort field '{sort}'. Expected one of: {', '.join(FLOW_SORT_FIELDS)}"
+        )
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    if offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="offset and limit must not be negative")
+    
     try:
-        result = list_flows()
+        result = await run_in_threadpool(
+            list_flows,
+            sort_by=sort,
+            descending=order == "desc",
+            offset=offset,
+            limit=limit
+        )
         return result
     
     except Exception as e:
@@ -337,19 +681,25 @@ async def list_flows_endpoint():
         )
 
 @app.get("/api/flow-data")
-async def get_flow_data():
+async def get_flow_data(request: Request):
     """
     Get flow data in the format expected by the 3D neural visualization
+    
+    Supports If-None-Match revalidation like /api/flows/load.
     """
     try:
+        etag = get_flow_etag("default")
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        
         # Load the default flow
         result = load_flow("default")
         
         if result["success"]:
-            return {
+            return flow_response({
                 "nodes": result["nodes"],
                 "edges": result["edges"]
-            }
+            }, result.get("etag"))
         else:
             # Return empty structure if no flow found
             return {
@@ -363,159 +713,292 @@ async def get_flow_data():
             detail=f"Failed to get flow data: {str(e)}"
         )
 
+def _form_flag(value: Optional[str]) -> bool:
+    return (value or "").strip().lower() in ("1", "true", "yes", "on")
+
+def _require_fields(fields: Dict[str, str], names, complete: bool) -> bool:
+    """Whether the named form fields have arrived, raising for missing ones once the body is complete"""
+    missing = [name for name in names if name not in fields]
+    if missing and complete:
+        raise HTTPException(status_code=400, detail=f"Missing form field(s): {', '.join(missing)}")
+    return not missing
+
 @app.post("/api/upload-video")
-async def upload_video(
-    video: UploadFile = File(...),
-    directory: str = Form(...),
-    nodeId: str = Form(...)
-):
+async def upload_video(request: Request):
     """
     Upload and save video file to specified server directory
+
+    Multipart form with a "video" file and "directory", "nodeId" and
+    optional "checksum" (md5, sha1 or sha256) fields. The body is parsed as
+    it arrives; when the fields come before the file, the video is written
+    once, straight to its destination.
     """
-    try:
+    def resolve(fields, filename, content_type, complete):
         # Validate file type
-        if not video.content_type or not video.content_type.startswith('video/'):
+        if not content_type or not content_type.startswith('video/'):
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid file type: {video.content_type}. Expected video file."
+                detail=f"Invalid file type: {content_type}. Expected video file."
             )
+        if not _require_fields(fields, ("directory",), complete):
+            return None
+        directory = fields["directory"]
         
         # Ensure directory exists
         os.makedirs(directory, exist_ok=True)
         
-        # Generate safe filename
-        safe_filename = video.filename or f"video_{int(time.time())}.webm"
-        # Remove any path traversal attempts
-        safe_filename = os.path.basename(safe_filename)
-        
-        # Full file path
-        file_path = os.path.join(directory, safe_filename)
-        
-        # Save file to server
-        with open(file_path, "wb") as buffer:
-            content = await video.read()
-            buffer.write(content)
-        
-        # Get absolute path for return
-        abs_file_path = os.path.abspath(file_path)
+        # Generate safe filename, removing any path traversal attempts
+        safe_filename = os.path.basename(filename or f"video_{int(time.time())}.webm")
+        return os.path.join(directory, safe_filename), None
+
+    try:
+        saved = await save_multipart_upload(request, "video", resolve)
+        fields = saved["fields"]
+        _require_fields(fields, ("nodeId",), True)
         
         return {
             "success": True,
-            "filePath": abs_file_path,
-            "filename": safe_filename,
-            "directory": directory,
-            "nodeId": nodeId,
-            "fileSize": len(content),
-            "contentType": video.content_type
+            "filePath": os.path.abspath(saved["path"]),
+            "filename": saved["filename"],
+            "directory": fields["directory"],
+            "nodeId": fields["nodeId"],
+            "fileSize": saved["size"],
+            "checksum": saved["checksum"],
+            "contentType": saved["content_type"]
         }
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Video upload failed: {str(e)}"
         )
 
+# Form fields of /api/upload-file that decide where the file goes and how large it may be
+UPLOAD_FILE_FIELDS = ("directory", "allowedExtensions", "maxFileSize", "overwriteExisting")
+
 @app.post("/api/upload-file")
-async def upload_file(
-    file: UploadFile = File(...),
-    directory: str = Form(...),
-    nodeId: str = Form(...),
-    allowedExtensions: str = Form(default=""),
-    maxFileSize: int = Form(default=100),  # MB
-    overwriteExisting: bool = Form(default=False)
-):
+async def upload_file(request: Request):
     """
     Upload and save any file to specified server directory with validation
+
+    Multipart form with a "file" and "directory", "nodeId" and optional
+    "allowedExtensions", "maxFileSize" (MB, default 100),
+    "overwriteExisting" and "checksum" (md5, sha1 or sha256) fields. When
+    the fields in UPLOAD_FILE_FIELDS all come before the file, it is written
+    once, straight to its destination, and the upload is rejected as soon as
+    it exceeds maxFileSize.
     """
-    try:
-        # Validate file size (convert MB to bytes)
-        max_size_bytes = maxFileSize * 1024 * 1024
-        file_content = await file.read()
+    def resolve(fields, filename, content_type, complete):
+        # Options may still follow the file, so wait for all of them unless the body is complete
+        if not complete and not _require_fields(fields, UPLOAD_FILE_FIELDS, False):
+            return None
+        _require_fields(fields, ("directory",), True)
+        directory = fields["directory"]
         
-        if len(file_content) > max_size_bytes:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size {len(file_content)} bytes exceeds maximum allowed size of {max_size_bytes} bytes ({maxFileSize}MB)"
-            )
+        # Validate file size (convert MB to bytes)
+        try:
+            max_size_bytes = int(fields.get("maxFileSize") or 100) * 1024 * 1024
+        except ValueError:
+            raise HTTPException(status_code=400, detail="maxFileSize must be a whole number of MB")
         
         # Validate file extension if specified
-        if allowedExtensions:
-            allowed_exts = [ext.strip().lower() for ext in allowedExtensions.split(',') if ext.strip()]
-            if allowed_exts:
-                file_ext = os.path.splitext(file.filename or '')[1].lower()
-                if file_ext not in allowed_exts:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"File extension '{file_ext}' not allowed. Allowed extensions: {', '.join(allowed_exts)}"
-                    )
+        allowed_exts = [ext.strip().lower() for ext in fields.get("allowedExtensions", "").split(',') if ext.strip()]
+        if allowed_exts:
+            file_ext = os.path.splitext(filename or '')[1].lower()
+            if file_ext not in allowed_exts:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File extension '{file_ext}' not allowed. Allowed extensions: {', '.join(allowed_exts)}"
+                )
         
         # Ensure directory exists
         os.makedirs(directory, exist_ok=True)
         
-        # Generate safe filename
-        safe_filename = file.filename or f"file_{int(time.time())}"
-        # Remove any path traversal attempts
-        safe_filename = os.path.basename(safe_filename)
-        
-        # Full file path
-        file_path = os.path.join(directory, safe_filename)
+        # Generate safe filename, removing any path traversal attempts
+        safe_filename = os.path.basename(filename or f"file_{int(time.time())}")
         
-        # Check if file exists and handle overwrite setting
-        if os.path.exists(file_path) and not overwriteExisting:
-            # Generate unique filename
-            name, ext = os.path.splitext(safe_filename)
-            counter = 1
-            while os.path.exists(file_path):
-                safe_filename = f"{name}_{counter}{ext}"
-                file_path = os.path.join(directory, safe_filename)
-                counter += 1
-        
-        # Save file to server
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
-        
-        # Get absolute path for return
-        abs_file_path = os.path.abspath(file_path)
+        # Full file path, numbered if the file exists and overwriting is off
+        return unique_path(directory, safe_filename, _form_flag(fields.get("overwriteExisting"))), max_size_bytes
+
+    try:
+        try:
+            saved = await save_multipart_upload(request, "file", resolve)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        fields = saved["fields"]
+        _require_fields(fields, ("nodeId",), True)
         
         return {
             "success": True,
-            "filePath": abs_file_path,
-            "filename": safe_filename,
-            "directory": directory,
-            "nodeId": nodeId,
-            "fileSize": len(file_content),
-            "contentType": file.content_type or "application/octet-stream"
+            "filePath": os.path.abspath(saved["path"]),
+            "filename": saved["filename"],
+            "directory": fields["directory"],
+            "nodeId": fields["nodeId"],
+            "fileSize": saved["size"],
+            "checksum": saved["checksum"],
+            "contentType": saved["content_type"] or "application/octet-stream"
         }
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"File upload failed: {str(e)}"
         )
 
+class UploadSessionRequest(BaseModel):
+    directory: str
+    filename: str
+    size: Optional[int] = None  # total bytes, if known
+    maxFileSize: Optional[int] = None  # MB
+    checksum: Optional[str] = None  # md5, sha1 or sha256
+    overwriteExisting: bool = False
+
+def _upload_status(session: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "uploadId": session["upload_id"],
+        "filename": session["filename"],
+        "directory": session["directory"],
+        "offset": session["offset"],
+        "size": session["size"]
+    }
+
+@app.post("/api/uploads")
+async def create_upload_session(request: UploadSessionRequest):
+    """
+    Start a resumable upload.
+
+    Send the file with PUT /api/uploads/{uploadId}?offset=N, one chunk per
+    request with the raw bytes as the body, then POST .../complete. After a
+    dropped connection, GET the session for the offset to resume from.
+    """
+    try:
+        session = await run_in_threadpool(
+            get_upload_sessions().create,
+            request.directory,
+            request.filename,
+            request.size,
+            request.maxFileSize * 1024 * 1024 if request.maxFileSize else None,
+            request.checksum,
+            request.overwriteExisting
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "chunkSize": UPLOAD_CHUNK_SIZE, **_upload_status(session)}
+
+@app.get("/api/uploads")
+async def upload_session_stats():
+    """
+    Report active, completed and expired resumable uploads.
+    """
+    return {
+        "success": True,
+        "uploads": await run_in_threadpool(get_upload_sessions().stats)
+    }
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """
+    Report how many bytes of a resumable upload have been received.
+    """
+    try:
+        session = await run_in_threadpool(get_upload_sessions().get, upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload not found: {upload_id}")
+    return {"success": True, **_upload_status(session)}
+
+@app.put("/api/uploads/{upload_id}")
+async def append_upload_chunk(upload_id: str, offset: int, request: Request):
+    """
+    Append the request body to a resumable upload at offset.
+
+    offset must equal the bytes received so far; otherwise 409 is returned
+    with the offset to resume from.
+    """
+    try:
+        session = await get_upload_sessions().append(upload_id, offset, request.stream())
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload not found: {upload_id}")
+    except UploadOffsetMismatch as e:
+        return JSONResponse(status_code=409, content={"detail": str(e), "offset": e.expected})
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {"success": True, **_upload_status(session)}
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_upload_session(upload_id: str):
+    """
+    Finish a resumable upload and move the file into its directory.
+    """
+    try:
+        result = await run_in_threadpool(get_upload_sessions().complete, upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload not found: {upload_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "success": True,
+        "filePath": result["path"],
+        "filename": result["filename"],
+        "fileSize": result["size"],
+        "checksum": result["checksum"]
+    }
+
+@app.delete("/api/uploads/{upload_id}")
+async def abort_upload_session(upload_id: str):
+    """
+    Cancel a resumable upload and delete the data received so far.
+    """
+    if not await run_in_threadpool(get_upload_sessions().abort, upload_id):
+        raise HTTPException(status_code=404, detail=f"Upload not found: {upload_id}")
+    return {"success": True, "message": f"Upload {upload_id} aborted"}
+
 @app.get("/api/logs/{log_file_id}")
-async def read_execution_log(log_file_id: str, last_position: int = 0):
+async def read_execution_log(log_file_id: str, last_position: int = 0, wait: float = 0):
     """
-    Read execution log file from a specific position for polling updates.
+    Read an execution log from a specific position for polling updates.
+    
+    With wait > 0 this long-polls: the request is held for up to that many
+    seconds (capped at 30) until new log output arrives.
     """
     try:
-        import tempfile
-        log_path = os.path.join(tempfile.gettempdir(), f"smart_folder_log_{log_file_id}.txt")
+        buffer = get_log(log_file_id)
+        if buffer is not None:
+            if wait > 0:
+                await buffer.wait(last_position, min(wait, 30))
+            content, position = buffer.read(last_position)
+            return {
+                "content": content,
+                "position": position,
+                "exists": True,
+                "complete": buffer.closed
+            }
+        
+        # Fall back to a log spilled to disk. Its buffer is gone, so the log is
+        # finished and, as with a closed buffer, wait returns straight away
+        log_path = get_spill_path(log_file_id)
         
         if not os.path.exists(log_path):
             return {"content": "", "position": 0, "exists": False}
         
-        with open(log_path, 'r') as f:
-            f.seek(last_position)
-            new_content = f.read()
-            new_position = f.tell()
-            
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            content = f.read()
+        
+        # Positions count characters, like LogBuffer's
         return {
-            "content": new_content,
-            "position": new_position,
-            "exists": True
+            "content": content[last_position:],
+            "position": len(content),
+            "exists": True,
+            "complete": True
         }
         
     except Exception as e:
@@ -524,10 +1007,334 @@ async def read_execution_log(log_file_id: str, last_position: int = 0):
             detail=f"Failed to read log: {str(e)}"
         )
 
+@app.get("/api/logs/{log_file_id}/stream")
+async def stream_execution_log(log_file_id: str, request: Request, last_position: int = 0):
+    """
+    Push execution log output as Server-Sent Events.
+    
+    Each event carries the new content and the stream position it ends at
+    (also sent as the event id, so EventSource reconnects resume in place).
+    A final 'end' event is sent once the execution has finished.
+    """
+    buffer = get_log(log_file_id)
+    if buffer is None:
+        raise HTTPException(status_code=404, detail="Execution log not found")
+    
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        last_position = int(last_event_id)
+    
+    async def generate_events():
+        position = last_position
+        async for content, position in buffer.follow(last_position):
+            if content is None:
+                if await request.is_disconnected():
+                    return
+                # Keep intermediaries from timing out idle connections
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {position}\ndata: {json.dumps({'type': 'log', 'content': content, 'position': position})}\n\n"
+        
+        yield f"id: {position}\ndata: {json.dumps({'type': 'end', 'position': position})}\n\n"
+    
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/executor/sessions")
+async def execution_session_stats():
+    """
+    Report live, finished and reaped execution sessions and the retention policy.
+    """
+    return {
+        "success": True,
+        "sessions": get_session_stats()
+    }
+
+@app.post("/api/executor/sessions/reap")
+async def reap_execution_sessions():
+    """
+    Reap expired sessions and log files now instead of waiting for the next pass.
+    """
+    removed = await run_in_threadpool(reap)
+    return {
+        "success": True,
+        "message": f"Reaped {removed['sessions']} sessions and {removed['files']} log files",
+        "removed": removed
+    }
+
+@app.get("/api/executor/logs")
+async def log_buffer_stats():
+    """
+    Report how many execution logs are buffered in memory.
+    """
+    return {
+        "success": True,
+        "logs": get_log_stats()
+    }
+
+class CatalogQueryRequest(BaseModel):
+    path: str
+    extensions: Optional[List[str]] = None
+    older_than: Optional[float] = None  # seconds since last modification
+    newer_than: Optional[float] = None
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    max_depth: Optional[int] = None
+    sort_by: str = "path"
+    descending: bool = False
+    limit: Optional[int] = None
+    offset: int = 0
+
+@app.get("/api/catalog")
+async def file_catalog_stats():
+    """
+    Report watched roots, how many files each holds and how they are kept current.
+    """
+    return {
+        "success": True,
+        "catalog": await run_in_threadpool(get_file_catalog().stats)
+    }
+
+@app.post("/api/catalog/roots")
+async def add_catalog_root(request: dict):
+    """
+    Index and watch a directory so listings and queries under it use the catalog.
+    """
+    path = request.get("path", "").strip()
+    if not path:
+        raise HTTPException(status_code=400, detail="Path is required")
+    try:
+        root = await run_in_threadpool(get_file_catalog().add_root, path)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {
+        "success": True,
+        "message": f"Indexing {root}",
+        "root": root
+    }
+
+@app.delete("/api/catalog/roots")
+async def remove_catalog_root(path: str):
+    """
+    Stop watching a root and drop its files from the catalog.
+    """
+    if not await run_in_threadpool(get_file_catalog().remove_root, path):
+        raise HTTPException(status_code=404, detail=f"Not a catalog root: {path}")
+    return {
+        "success": True,
+        "message": f"Removed {path}"
+    }
+
+@app.post("/api/catalog/rescan")
+async def rescan_catalog(request: dict):
+    """
+    Queue a full rescan of one root, or of every root when no path is given.
+    """
+    path = (request.get("path") or "").strip() or None
+    get_file_catalog().rescan(path)
+    return {
+        "success": True,
+        "message": f"Rescan of {path or 'all roots'} queued"
+    }
+
+@app.post("/api/catalog/query")
+async def query_catalog(request: CatalogQueryRequest):
+    """
+    Find files under a directory by extension, age and size.
+
+    Answered from the catalog index when a watched root covers the path,
+    otherwise by walking the directory.
+    """
+    if request.sort_by not in QUERY_SORT_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort field '{request.sort_by}'. Expected one of: {', '.join(QUERY_SORT_FIELDS)}"
+        )
+    if not os.path.isdir(request.path):
+        raise HTTPException(status_code=404, detail=f"Directory not found: {request.path}")
+    catalog = get_file_catalog()
+    started = time.time()
+    filters = request.model_dump(exclude={"path"})
+    files = await run_in_threadpool(catalog.query, request.path, **filters)
+    return {
+        "success": True,
+        "files": files,
+        "count": len(files),
+        "indexed": await run_in_threadpool(catalog.covering_root, request.path) is not None,
+        "query_ms": round((time.time() - started) * 1000, 2)
+    }
+
+class OldFilesRequest(BaseModel):
+    directory: str
+    older_than: str = "30 days"  # seconds or text like "2 weeks"
+    pattern: str = "*"
+    recursive: bool = True
+    sort_by: Optional[str] = "mtime"  # None streams files in the order they are found
+    descending: bool = False
+    limit: Optional[int] = None
+    stream: bool = False
+
+class DeleteFilesRequest(BaseModel):
+    paths: List[str]
+    mode: str = "trash"  # "trash" or "delete"
+    dry_run: bool = False
+    batch_size: int = DELETE_BATCH_SIZE
+    stream: bool = False
+
+def _ndjson(item: Dict[str, Any]) -> str:
+    return json.dumps(item) + "\n"
+
+@app.post("/api/files/old")
+async def find_old_files_endpoint(request: OldFilesRequest):
+    """
+    Find files older than a given age, ordered by age or size.
+
+    With stream the files are sent as newline-delimited JSON batches of
+    {"files": [...]}, ending with {"done": true, "count": ..., "total_size": ...};
+    without a sort_by they are sent as they are found.
+    """
+    if not os.path.isdir(request.directory):
+        raise HTTPException(status_code=404, detail=f"Directory not found: {request.directory}")
+    if request.sort_by is not None and request.sort_by not in OLD_FILE_SORT_FIELDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort field '{request.sort_by}'. Expected one of: {', '.join(OLD_FILE_SORT_FIELDS)}"
+        )
+    try:
+        age = parse_age(request.older_than)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def matching_files():
+        if request.sort_by is None:
+            files = iter_old_files(request.directory, age, request.pattern, request.recursive)
+        else:
+            files = find_old_files(
+                request.directory, age, request.pattern, request.recursive,
+                request.sort_by, request.descending
+            )
+        return itertools.islice(files, request.limit)
+
+    if request.stream:
+        def generate_lines():
+            count = 0
+            total_size = 0
+            batch = []
+            for entry in matching_files():
+                batch.append(entry)
+                count += 1
+                total_size += entry["size"]
+                if len(batch) >= SCAN_STREAM_BATCH:
+                    yield _ndjson({"files": batch})
+                    batch = []
+            if batch:
+                yield _ndjson({"files": batch})
+            yield _ndjson({"done": True, "count": count, "total_size": total_size})
+
+        return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+    found = await run_in_threadpool(lambda: list(matching_files()))
+    return {
+        "success": True,
+        "files": found,
+        "count": len(found),
+        "total_size": sum(entry["size"] for entry in found)
+    }
+
+@app.post("/api/files/delete")
+async def delete_files_endpoint(request: DeleteFilesRequest):
+    """
+    Move files to the trash or delete them, in batches.
+
+    With stream, progress totals are sent as newline-delimited JSON after each
+    batch, followed by the full result.
+    """
+    if request.mode not in ("trash", "delete"):
+        raise HTTPException(status_code=400, detail="mode must be 'trash' or 'delete'")
+    if request.batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be at least 1")
+
+    if not request.stream:
+        results = await run_in_threadpool(
+            delete_files, request.paths, request.mode, request.dry_run, request.batch_size
+        )
+        return {"success": True, **results}
+
+    def generate_lines():
+        progress: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        outcome = {}
+
+        def run():
+            try:
+                outcome["results"] = delete_files(
+                    request.paths, request.mode, request.dry_run, request.batch_size,
+                    on_progress=progress.put
+                )
+            except Exception as e:
+                outcome["error"] = str(e)
+            finally:
+                progress.put(None)
+
+        threading.Thread(target=run, name="smart-folder-delete-files", daemon=True).start()
+        while True:
+            totals = progress.get()
+            if totals is None:
+                break
+            yield _ndjson({"progress": totals})
+        if "error" in outcome:
+            yield _ndjson({"success": False, "error": outcome["error"]})
+        else:
+            yield _ndjson({"success": True, "done": True, **outcome["results"]})
+
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+def _scan_options(request: dict) -> Dict[str, Any]:
+    """Depth limit, page size and cursor of a file listing request"""
+    options = {"max_depth": request.get("max_depth"), "limit": request.get("limit")}
+    for name, minimum in (("max_depth", 0), ("limit", 1)):
+        value = options[name]
+        if value is not None and (type(value) is not int or value < minimum):
+            raise HTTPException(status_code=400, detail=f"{name} must be an integer of at least {minimum}")
+    options["cursor"] = request.get("cursor") or None
+    return options
+
+async def _list_directory(request: dict, path: str, extensions, key: str):
+    """
+    List matching files under a directory in one pass
+
+    Directories inside a watched root are answered from the file catalog
+    instead of the filesystem.
+
+    With "stream": true the listing is sent as newline-delimited JSON, one
+    {key: [paths]} batch per line as the scan finds them, ending with
+    {"done": true, "next_cursor": ...}.
+    """
+    options = _scan_options(request)
+    catalog = get_file_catalog()
+    if await run_in_threadpool(catalog.covering_root, path) is not None:
+        options["source"] = catalog.iter_paths
+    if request.get("stream"):
+        def generate_lines():
+            for paths, next_cursor in iter_file_batches(path, extensions, **options):
+                if paths:
+                    yield json.dumps({key: paths}) + "\n"
+                else:
+                    yield json.dumps({"done": True, "next_cursor": next_cursor}) + "\n"
+
+        return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+    page = await run_in_threadpool(list_matching_files, path, extensions, **options)
+    return {key: page["files"], "next_cursor": page["next_cursor"]}
+
 @app.post("/api/list-videos")
 async def list_videos(request: dict):
     """
     List video files in the specified directory path
+
+    Optional max_depth, limit and cursor (the previous page's next_cursor)
+    page through large trees; stream sends results as they are found.
     """
     try:
         path = request.get("path", "").strip()
@@ -539,27 +1346,14 @@ async def list_videos(request: dict):
         # Handle both file and directory paths
         if os.path.isfile(path):
             # If it's a single file, check if it's a video
-            if path.lower().endswith(('.mp4', '.avi', '.mov', '.webm', '.mkv', '.wmv', '.flv')):
+            if path.lower().endswith(VIDEO_EXTENSIONS):
                 return {"videos": [path]}
             else:
                 return {"videos": []}
         
         elif os.path.isdir(path):
             # If it's a directory, find all video files
-            video_extensions = ['*.mp4', '*.avi', '*.mov', '*.webm', '*.mkv', '*.wmv', '*.flv']
-            video_files = []
-            
-            for extension in video_extensions:
-                pattern = os.path.join(path, '**', extension)
-                video_files.extend(glob.glob(pattern, recursive=True))
-                # Also check current directory
-                pattern = os.path.join(path, extension)
-                video_files.extend(glob.glob(pattern))
-            
-            # Remove duplicates and sort
-            video_files = sorted(list(set(video_files)))
-            
-            return {"videos": video_files}
+            return await _list_directory(request, path, VIDEO_EXTENSIONS, "videos")
         
         else:
             raise HTTPException(status_code=404, detail=f"Path not found: {path}")
@@ -573,28 +1367,26 @@ async def list_videos(request: dict):
         )
 
 @app.get("/api/serve-video")
-async def serve_video(path: str):
+async def serve_video(path: str, request: Request):
     """
     Serve a video file for playback
+
+    Supports Range requests for seeking and answers conditional requests
+    for unchanged files with 304.
     """
     try:
         if not path:
             raise HTTPException(status_code=400, detail="Path parameter is required")
         
         # Validate the file exists
-        if not os.path.exists(path):
+        if not os.path.isfile(path):
             raise HTTPException(status_code=404, detail=f"Video file not found: {path}")
         
         # Validate it's a video file
-        if not path.lower().endswith(('.mp4', '.avi', '.mov', '.webm', '.mkv', '.wmv', '.flv')):
+        if not path.lower().endswith(VIDEO_EXTENSIONS):
             raise HTTPException(status_code=400, detail="File is not a supported video format")
         
-        # Return the video file
-        return FileResponse(
-            path=path,
-            media_type='video/mp4',  # Browser will handle different formats
-            filename=os.path.basename(path)
-        )
+        return await run_in_threadpool(media_response, request, path)
     
     except HTTPException:
         raise
@@ -608,6 +1400,8 @@ async def serve_video(path: str):
 async def list_audios(request: dict):
     """
     List audio files in the specified directory path
+
+    Accepts the same max_depth, limit, cursor and stream options as /api/list-videos.
     """
     try:
         path = request.get("path", "").strip()
@@ -619,27 +1413,14 @@ async def list_audios(request: dict):
         # Handle both file and directory paths
         if os.path.isfile(path):
             # If it's a single file, check if it's an audio file
-            if path.lower().endswith(('.mp3', '.wav', '.ogg', '.m4a', '.aac', '.flac', '.wma', '.opus')):
+            if path.lower().endswith(AUDIO_EXTENSIONS):
                 return {"audios": [path]}
             else:
                 return {"audios": []}
         
         elif os.path.isdir(path):
             # If it's a directory, find all audio files
-            audio_extensions = ['*.mp3', '*.wav', '*.ogg', '*.m4a', '*.aac', '*.flac', '*.wma', '*.opus']
-            audio_files = []
-            
-            for extension in audio_extensions:
-                pattern = os.path.join(path, '**', extension)
-                audio_files.extend(glob.glob(pattern, recursive=True))
-                # Also check current directory
-                pattern = os.path.join(path, extension)
-                audio_files.extend(glob.glob(pattern))
-            
-            # Remove duplicates and sort
-            audio_files = sorted(list(set(audio_files)))
-            
-            return {"audios": audio_files}
+            return await _list_directory(request, path, AUDIO_EXTENSIONS, "audios")
         
         else:
             raise HTTPException(status_code=404, detail=f"Path not found: {path}")
@@ -653,45 +1434,30 @@ async def list_audios(request: dict):
         )
 
 @app.get("/api/serve-audio")
-async def serve_audio(path: str):
-    """Serve audio files from the server"""
-    if not os.path.exists(path):
+async def serve_audio(path: str, request: Request):
+    """Serve audio files from the server, with Range and conditional request support"""
+    if not os.path.isfile(path):
         raise HTTPException(status_code=404, detail="Audio file not found")
     
     # Validate it's an audio file
-    if not path.lower().endswith(('.mp3', '.wav', '.ogg', '.m4a', '.aac', '.flac', '.wma', '.opus')):
+    if not path.lower().endswith(AUDIO_EXTENSIONS):
         raise HTTPException(status_code=400, detail="File is not a supported audio format")
     
-    # Determine content type
-    if path.endswith('.mp3'):
-        media_type = 'audio/mpeg'
-    elif path.endswith('.wav'):
-        media_type = 'audio/wav'
-    elif path.endswith('.m4a'):
-        media_type = 'audio/mp4'
-    elif path.endswith('.aac'):
-        media_type = 'audio/aac'
-    elif path.endswith('.ogg'):
-        media_type = 'audio/ogg'
-    elif path.endswith('.flac'):
-        media_type = 'audio/flac'
-    else:
-        media_type = 'audio/mpeg'  # Default
-    
-    return FileResponse(
-        path=path,
-        media_type=media_type,
-        filename=os.path.basename(path)
-    )
+    try:
+        return await run_in_threadpool(media_response, request, path, True)
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to serve audio: {str(e)}")
 
 @app.post("/api/list-files")
 async def list_files(request: dict):
     """
     List text files in the specified directory path
+
+    Accepts the same max_depth, limit, cursor and stream options as /api/list-videos.
     """
     try:
         path = request.get("path", "").strip()
-        extensions = request.get("extensions", [".txt", ".md", ".text", ".log"])
+        extensions = request.get("extensions", list(TEXT_EXTENSIONS))
         node_id = request.get("nodeId", "")
         
         if not path:
@@ -707,21 +1473,7 @@ async def list_files(request: dict):
         
         elif os.path.isdir(path):
             # If it's a directory, find all matching files
-            file_patterns = [f'*{ext}' for ext in extensions]
-            text_files = []
-            
-            for pattern in file_patterns:
-                # Recursive search
-                full_pattern = os.path.join(path, '**', pattern)
-                text_files.extend(glob.glob(full_pattern, recursive=True))
-                # Also check current directory
-                current_pattern = os.path.join(path, pattern)
-                text_files.extend(glob.glob(current_pattern))
-            
-            # Remove duplicates and sort
-            text_files = sorted(list(set(text_files)))
-            
-            return {"files": text_files}
+            return await _list_directory(request, path, extensions, "files")
         
         else:
             raise HTTPException(status_code=404, detail=f"Path not found: {path}")
@@ -1133,127 +1885,258 @@ async def concatenate_recent_videos(request: dict):
             detail=f"Failed to concatenate videos: {str(e)}"
         )
 
+def find_webhook_node(nodes: List[Dict[str, Any]], inbox_name: str) -> Optional[Dict[str, Any]]:
+    """Find the webhook node listening on an inbox"""
+    for node in nodes:
+        if (node.get("type") == "webhook" and 
+            node.get("data", {}).get("customData", {}).get("inboxName") == inbox_name):
+            return node
+    return None
+
+def webhook_batch_policy(inbox_name: str) -> Optional[tuple]:
+    """
+    Micro-batching settings of an inbox's webhook node
+    
+    customData.batchSize and customData.batchWindow (seconds) coalesce
+    deliveries into lists; setting only one of them uses WEBHOOK_MAX_BATCH
+    or a one second window for the other.
+    """
+    # Only the node settings are needed, not the large outputs
+    flow_result = load_flow("default", resolve_blobs=False)
+    webhook_node = find_webhook_node(flow_result["nodes"], inbox_name) if flow_result["success"] else None
+    if not webhook_node:
+        return None
+    custom_data = webhook_node["data"].get("customData", {})
+    batch_size = int(custom_data.get("batchSize") or 0)
+    batch_window = float(custom_data.get("batchWindow") or 0)
+    if batch_size <= 1 and batch_window <= 0:
+        return None
+    return (batch_size if batch_size > 1 else WEBHOOK_MAX_BATCH, batch_window if batch_window > 0 else 1.0)
+
+def process_webhook(inbox_name: str, payload: Any) -> Dict[str, Any]:
+    """
+    Run the webhook node for an inbox and everything downstream of it.
+    Called from the webhook queue's worker threads; payload is a list when
+    several deliveries were batched together.
+    """
+    # Load the current flow to find the webhook node
+    flow_result = load_flow("default")
+    if not flow_result["success"]:
+        return {
+            "success": True,
+            "message": f"Data received for inbox: {inbox_name} (no flow to execute)",
+            "nodes_executed": 0
+        }
+    
+    nodes = flow_result["nodes"]
+    edges = flow_result["edges"]
+    
+    # Find the webhook node with matching inbox name
+    webhook_node = find_webhook_node(nodes, inbox_name)
+    if not webhook_node:
+        return {
+            "success": True,
+            "message": f"Data received for inbox: {inbox_name} (no matching webhook node found)",
+            "nodes_executed": 0
+        }
+    
+    # Feed the payload to the webhook node as its manual input
+    webhook_data_str = json.dumps(payload)
+    webhook_node["data"]["manualInput"] = webhook_data_str
+    
+    # Execute the webhook node and all downstream nodes
+    run_result = run_flow(nodes, edges, start_node_ids=[webhook_node["id"]])
+    
+    # Save the execution results of the nodes that ran
+    nodes_by_id = {node["id"]: node for node in nodes}
+    node_updates = {
+        node_id: {"lastOutput": nodes_by_id[node_id]["data"].get("lastOutput")}
+        for node_id in run_result["executed"]
+    }
+    node_updates.setdefault(webhook_node["id"], {})["manualInput"] = webhook_data_str
+    update_node_data("default", node_updates)
+    
+    return {
+        "success": run_result["success"],
+        "message": f"Webhook executed for inbox: {inbox_name}",
+        "webhook_output": webhook_node["data"].get("lastOutput", ""),
+        "nodes_executed": len(run_result["executed"]),
+        "payload_count": len(payload) if isinstance(payload, list) else 1,
+        "error": next(
+            (r["error"] for r in run_result["results"].values() if not r["success"]), None
+        )
+    }
+
 @app.post("/api/webhook/{inbox_name}")
-async def webhook_inbox(inbox_name: str, payload: Dict[str, Any]):
+async def webhook_inbox(inbox_name: str, payload: Dict[str, Any], request: Request, dedup_key: Optional[str] = None):
     """
     Global webhook inbox that routes data to named webhook nodes.
     Usage: POST to /api/webhook/jakes_inbox with JSON payload
+    
+    The delivery is queued durably and acknowledged with 202 right away; the
+    webhook flow runs in the background. Poll /api/webhooks/jobs/{job_id} for
+    its result. Repeating a dedup_key (query parameter or Idempotency-Key
+    header) for the same inbox returns the original job instead of queueing
+    the payload again.
     """
     try:
-        # Store the webhook data with timestamp
-        webhook_inbox_store[inbox_name] = {
-            "data": payload,
-            "timestamp": time.time(),
-            "received_at": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
+        dedup_key = dedup_key or request.headers.get("idempotency-key")
+        queue = start_webhook_queue(process_webhook, webhook_batch_policy)
+        job = await run_in_threadpool(queue.enqueue, inbox_name, payload, dedup_key)
         
-        # Load the current flow to find the webhook node
-        flow_result = load_flow("default")
-        if not flow_result["success"]:
-            return {
+        # Keep the payload in the inbox history for inspection and replay
+        if not job["duplicate"]:
+            record_payload(inbox_name, payload, entry_id=job["job_id"])
+        
+        return JSONResponse(
+            status_code=200 if job["duplicate"] else 202,
+            content={
                 "success": True,
-                "message": f"Data received for inbox: {inbox_name} (no flow to execute)",
-                "timestamp": webhook_inbox_store[inbox_name]["timestamp"]
+                "message": f"Webhook {'already queued' if job['duplicate'] else 'queued'} for inbox: {inbox_name}",
+                "timestamp": job["enqueued_at"],
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "duplicate": job["duplicate"],
+                "queue_position": job.get("queue_position"),
+                "status_url": f"/api/webhooks/jobs/{job['job_id']}"
             }
+        )
         
-        nodes = flow_result["nodes"]
-        edges = flow_result["edges"]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/webhook/{inbox_name}/batch")
+async def webhook_inbox_batch(inbox_name: str, payloads: List[Dict[str, Any]], request: Request, dedup_key: Optional[str] = None):
+    """
+    Queue an array of payloads for an inbox as a single delivery.
+    The webhook node receives them as one JSON list and downstream nodes run
+    once for the whole batch.
+    """
+    if not payloads:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one payload")
+    
+    try:
+        dedup_key = dedup_key or request.headers.get("idempotency-key")
+        queue = start_webhook_queue(process_webhook, webhook_batch_policy)
+        job = await run_in_threadpool(queue.enqueue, inbox_name, payloads, dedup_key)
         
-        # Find the webhook node with matching inbox name
-        webhook_node = None
-        for node in nodes:
-            if (node.get("type") == "webhook" and 
-                node.get("data", {}).get("customData", {}).get("inboxName") == inbox_name):
-                webhook_node = node
-                break
+        if not job["duplicate"]:
+            for index, payload in enumerate(payloads):
+                record_payload(inbox_name, payload, entry_id=f"{job['job_id']}:{index}")
         
-        if not webhook_node:
-            return {
+        return JSONResponse(
+            status_code=200 if job["duplicate"] else 202,
+            content={
                 "success": True,
-                "message": f"Data received for inbox: {inbox_name} (no matching webhook node found)",
-                "timestamp": webhook_inbox_store[inbox_name]["timestamp"]
+                "message": f"Batch of {len(payloads)} payloads {'already queued' if job['duplicate'] else 'queued'} for inbox: {inbox_name}",
+                "timestamp": job["enqueued_at"],
+                "job_id": job["job_id"],
+                "status": job["status"],
+                "duplicate": job["duplicate"],
+                "payload_count": len(payloads),
+                "status_url": f"/api/webhooks/jobs/{job['job_id']}"
             }
-        
-        # Execute the webhook node with the payload data
-        webhook_data_str = json.dumps(payload)
-        webhook_result = execute_python_function(
-            function_code=webhook_node["data"]["pythonFunction"],
-            input_value=json.dumps({"manual": webhook_data_str}),
-            timeout=600
         )
-        
-        # Update the webhook node's output in the flow
-        webhook_node["data"]["lastOutput"] = webhook_result.get("output", "")
-        webhook_node["data"]["manualInput"] = webhook_data_str
-        
-        # Find and execute downstream nodes
-        def get_downstream_nodes(node_id, edges, nodes):
-            """Get all nodes connected downstream from the given node"""
-            downstream_ids = []
-            for edge in edges:
-                if edge["source"] == node_id:
-                    downstream_ids.append(edge["target"])
-            
-            downstream_nodes = []
-            for node in nodes:
-                if node["id"] in downstream_ids:
-                    downstream_nodes.append(node)
-            return downstream_nodes
-        
-        def execute_node_chain(current_node, edges, nodes, executed_nodes=None):
-            """Recursively execute a node and all its downstream connections"""
-            if executed_nodes is None:
-                executed_nodes = set()
-            
-            if current_node["id"] in executed_nodes:
-                return
-            
-            executed_nodes.add(current_node["id"])
-            
-            # Get inputs from upstream nodes
-            inputs = {"manual": current_node["data"].get("manualInput", "")}
-            
-            # Add inputs from connected upstream nodes
-            for edge in edges:
-                if edge["target"] == current_node["id"]:
-                    source_node = next((n for n in nodes if n["id"] == edge["source"]), None)
-                    if source_node and source_node["data"].get("lastOutput"):
-                        inputs[source_node["data"].get("label", "input")] = source_node["data"]["lastOutput"]
-            
-            # Execute current node if it has a Python function
-            if current_node["data"].get("pythonFunction"):
-                result = execute_python_function(
-                    function_code=current_node["data"]["pythonFunction"],
-                    input_value=json.dumps(inputs),
-                    timeout=600
-                )
-                current_node["data"]["lastOutput"] = result.get("output", "")
-            
-            # Execute downstream nodes
-            downstream_nodes = get_downstream_nodes(current_node["id"], edges, nodes)
-            for downstream_node in downstream_nodes:
-                execute_node_chain(downstream_node, edges, nodes, executed_nodes)
-            
-            return executed_nodes
-        
-        # Execute the webhook node and all downstream nodes
-        executed_node_ids = execute_node_chain(webhook_node, edges, nodes)
-        
-        # Save the updated flow with execution results
-        updated_flow_data = {"nodes": nodes, "edges": edges}
-        save_flow(updated_flow_data, "default")
-        
-        return {
-            "success": True,
-            "message": f"Webhook executed for inbox: {inbox_name}",
-            "timestamp": webhook_inbox_store[inbox_name]["timestamp"],
-            "webhook_output": webhook_result.get("output", ""),
-            "nodes_executed": len(executed_node_ids) if executed_node_ids else 1
-        }
-        
+    
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/webhooks/queue")
+async def webhook_queue_stats():
+    """
+    Get queued/running/done/failed webhook delivery counts per inbox
+    """
+    queue = start_webhook_queue(process_webhook, webhook_batch_policy)
+    return await run_in_threadpool(queue.stats)
+
+@app.get("/api/webhooks/jobs")
+async def list_webhook_jobs(inbox: Optional[str] = None, status: Optional[str] = None, limit: int = 50):
+    """
+    List the most recent webhook deliveries, optionally filtered by inbox and status
+    """
+    if status is not None and status not in JOB_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status '{status}'. Expected one of: {', '.join(JOB_STATUSES)}"
+        )
+    queue = start_webhook_queue(process_webhook, webhook_batch_policy)
+    jobs = await run_in_threadpool(queue.list_jobs, inbox, status, max(1, min(limit, 1000)))
+    return {"jobs": jobs, "count": len(jobs)}
+
+@app.get("/api/webhooks/jobs/{job_id}")
+async def get_webhook_job(job_id: str):
+    """
+    Get the status of a webhook delivery, including the flow result once finished
+    """
+    queue = start_webhook_queue(process_webhook, webhook_batch_policy)
+    job = await run_in_threadpool(queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Webhook job not found: {job_id}")
+    return job
+
+@app.get("/api/webhooks/inbox")
+async def webhook_inbox_stats():
+    """
+    Get the inboxes with remembered payloads and the history's memory use
+    """
+    return get_inbox_stats()
+
+@app.get("/api/webhooks/inbox/{inbox_name}")
+async def webhook_inbox_history(
+    inbox_name: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: Optional[int] = None,
+    include_data: bool = True
+):
+    """
+    Get payloads an inbox received, oldest first
+    
+    since/until are Unix timestamps bounding the time range; limit keeps the
+    most recent entries of that range.
+    """
+    entries = get_history(inbox_name, since=since, until=until, limit=limit, include_data=include_data)
+    return {"inbox": inbox_name, "entries": entries, "count": len(entries)}
+
+@app.post("/api/webhooks/inbox/{inbox_name}/replay")
+async def replay_webhook_inbox(
+    inbox_name: str,
+    entry_id: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: Optional[int] = None
+):
+    """
+    Queue remembered payloads of an inbox again, either one entry by entry_id
+    or every entry in a time range, in their original order
+    """
+    if entry_id is not None:
+        entry = get_entry(inbox_name, entry_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"Inbox entry not found: {entry_id}")
+        entries = [entry]
+    else:
+        entries = get_history(inbox_name, since=since, until=until, limit=limit)
+    
+    queue = start_webhook_queue(process_webhook, webhook_batch_policy)
+    jobs = []
+    for entry in entries:
+        job = await run_in_threadpool(queue.enqueue, inbox_name, entry["data"])
+        jobs.append({"entry_id": entry["entry_id"], "job_id": job["job_id"], "status": job["status"]})
+    
+    return {
+        "success": True,
+        "message": f"Replayed {len(jobs)} payloads for inbox: {inbox_name}",
+        "jobs": jobs
+    }
+
+@app.delete("/api/webhooks/inbox/{inbox_name}")
+async def clear_webhook_inbox(inbox_name: str):
+    """
+    Forget the remembered payloads of an inbox
+    """
+    return {"success": True, "removed": clear_inbox(inbox_name)}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Serving recorded video and audio to the browser's media elements.
+
+Players seek by requesting byte ranges, and revisit files they have already
+loaded. media_response() replies 304 to conditional requests for unchanged
+files and otherwise hands the file to FileResponse, which answers Range
+requests with 206 and just the requested bytes, so scrubbing through a long
+recording fetches only what is played. FileResponse also uses zero-copy
+pathsend where the server supports it.
+
+The content type comes from the file's container signature, falling back to
+its extension, so e.g. a WebM recording saved as .mp4 still plays.
+"""
+import collections
+import hashlib
+import mimetypes
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+MEDIA_TYPES = {
+    '.mp4': 'video/mp4',
+    '.m4v': 'video/mp4',
+    '.mov': 'video/quicktime',
+    '.webm': 'video/webm',
+    '.mkv': 'video/x-matroska',
+    '.avi': 'video/x-msvideo',
+    '.wmv': 'video/x-ms-wmv',
+    '.flv': 'video/x-flv',
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav',
+    '.ogg': 'audio/ogg',
+    '.opus': 'audio/ogg',
+    '.m4a': 'audio/mp4',
+    '.aac': 'audio/aac',
+    '.flac': 'audio/flac',
+    '.wma': 'audio/x-ms-wma'
+}
+
+# Sniffed types by (path, size, mtime); sniffing costs a small read per file
+_SNIFF_CACHE_SIZE = 1024
+_sniffed: "collections.OrderedDict[Tuple[str, int, float], Optional[str]]" = collections.OrderedDict()
+_sniffed_lock = threading.Lock()
+
+def _sniff(header: bytes, audio: bool) -> Optional[str]:
+    """Media type from a container's leading bytes, None if unrecognised"""
+    if header[4:8] == b'ftyp':
+        brand = header[8:12]
+        if brand == b'qt  ':
+            return 'video/quicktime'
+        if audio or brand in (b'M4A ', b'M4B '):
+            return 'audio/mp4'
+        return 'video/mp4'
+    if header.startswith(b'\x1a\x45\xdf\xa3'):
+        # EBML; WebM declares its doctype early in the header
+        if b'webm' in header:
+            return 'audio/webm' if audio else 'video/webm'
+        return 'audio/x-matroska' if audio else 'video/x-matroska'
+    if header.startswith(b'RIFF'):
+        if header[8:12] == b'WAVE':
+            return 'audio/wav'
+        if header[8:12] == b'AVI ':
+            return 'video/x-msvideo'
+    if header.startswith(b'OggS'):
+        return 'audio/ogg' if audio else 'video/ogg'
+    if header.startswith(b'fLaC'):
+        return 'audio/flac'
+    if header.startswith(b'ID3') or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        # ADTS AAC frames share the MP3 sync word but set layer bits to 0
+        if header[0] == 0xFF and header[1] & 0x06 == 0:
+            return 'audio/aac'
+        return 'audio/mpeg'
+    if header.startswith(b'FLV'):
+        return 'video/x-flv'
+    if header.startswith(b'\x30\x26\xb2\x75\x8e\x66\xcf\x11'):
+        return 'audio/x-ms-wma' if audio else 'video/x-ms-wmv'
+    return None
+
+def detect_media_type(path: str, stat: Optional[os.stat_result] = None, audio: bool = False) -> str:
+    """Content type of a media file from its signature, else its extension"""
+    stat = stat or os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime)
+    with _sniffed_lock:
+        if key in _sniffed:
+            _sniffed.move_to_end(key)
+            sniffed = _sniffed[key]
+        else:
+            sniffed = False
+    if sniffed is False:
+        try:
+            with open(path, 'rb') as f:
+                sniffed = _sniff(f.read(64), audio)
+        except OSError:
+            sniffed = None
+        with _sniffed_lock:
+            _sniffed[key] = sniffed
+            while len(_sniffed) > _SNIFF_CACHE_SIZE:
+                _sniffed.popitem(last=False)
+    if sniffed:
+        return sniffed
+    ext = os.path.splitext(path)[1].lower()
+    return MEDIA_TYPES.get(ext) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+def make_etag(stat: os.stat_result) -> str:
+    """Validator that changes whenever the file is rewritten, the same one FileResponse sends"""
+    return '"' + hashlib.md5(f"{stat.st_mtime}-{stat.st_size}".encode()).hexdigest() + '"'
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison, as If-None-Match requires
+    candidates = [tag.strip() for tag in header.split(',')]
+    return '*' in candidates or etag in (tag[2:] if tag.startswith('W/') else tag for tag in candidates)
+
+def is_not_modified(headers, etag: str, mtime: float) -> bool:
+    """Whether a conditional GET can be answered with 304"""
+    if_none_match = headers.get('if-none-match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def media_response(request: Request, path: str, audio: bool = False) -> Response:
+    """
+    Respond to a media request with the whole file, a byte range, or 304
+
+    Raises OSError if the file can't be read.
+    """
+    stat = os.stat(path)
+    etag = make_etag(stat)
+    headers: Dict[str, str] = {
+        'etag': etag,
+        'last-modified': formatdate(stat.st_mtime, usegmt=True),
+        'accept-ranges': 'bytes',
+        # Cache, but revalidate so rewritten recordings are picked up
+        'cache-control': 'no-cache'
+    }
+    if is_not_modified(request.headers, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    # FileResponse answers Range and If-Range itself: 206 for single or
+    # multiple ranges, 416 for unsatisfiable ones, the whole file otherwise
+    return FileResponse(
+        path,
+        media_type=detect_media_type(path, stat, audio),
+        headers=headers,
+        stat_result=stat,
+        filename=os.path.basename(path),
+        content_disposition_type='inline'
+    )
@@ -0,0 +1,112 @@
+"""
+Local stand-in for the Anthropic Messages API, for testing LLM flows.
+
+Answers POST /v1/messages with a reply echoing the last user message after a
+configurable latency, and can reject a share of requests with 429 or 529
+responses to exercise rate limiting and retries. Point the executor at it
+with SMART_FOLDER_ANTHROPIC_BASE_URL:
+
+    python mock_anthropic.py --port 8765 --latency 0.5 --fail-rate 0.2
+    SMART_FOLDER_ANTHROPIC_BASE_URL=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_counts = {"requests": 0, "rejected": 0, "max_concurrent": 0}
+_in_flight = 0
+_lock = threading.Lock()
+
+def _text_of(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+class MockHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    fail_rate = 0.0
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with _lock:
+                self._send_json(200, dict(_counts, in_flight=_in_flight))
+            return
+        self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+
+    def do_POST(self):
+        global _in_flight
+        if self.path.split("?")[0] != "/v1/messages":
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with _lock:
+            _counts["requests"] += 1
+            _in_flight += 1
+            _counts["max_concurrent"] = max(_counts["max_concurrent"], _in_flight)
+        try:
+            if random.random() < self.fail_rate:
+                with _lock:
+                    _counts["rejected"] += 1
+                status, error_type = random.choice([(429, "rate_limit_error"), (529, "overloaded_error")])
+                self._send_json(
+                    status,
+                    {"type": "error", "error": {"type": error_type, "message": "Mock rejection"}},
+                    {"retry-after": "0"}
+                )
+                return
+            time.sleep(self.latency)
+            messages = request.get("messages") or [{"content": ""}]
+            prompt = _text_of(messages[-1].get("content", ""))
+            reply = f"Mock reply to: {prompt}"
+            self._send_json(200, {
+                "id": f"msg_mock_{uuid.uuid4().hex[:24]}",
+                "type": "message",
+                "role": "assistant",
+                "model": request.get("model", "mock"),
+                "content": [{"type": "text", "text": reply}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {"input_tokens": len(prompt.split()), "output_tokens": len(reply.split())}
+            })
+        finally:
+            with _lock:
+                _in_flight -= 1
+
+    def log_message(self, format, *args):
+        # Keep test output quiet
+        pass
+
+def serve(port: int = 8765, latency: float = 0.0, fail_rate: float = 0.0, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Start the mock server on a background thread and return it"""
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"latency": latency, "fail_rate": fail_rate})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="mock-anthropic", daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each reply")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests rejected with 429/529")
+    args = parser.parse_args()
+    server = serve(args.port, args.latency, args.fail_rate, args.host)
+    print(f"Mock Anthropic API listening on http://{args.host}:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,267 @@
+"""
+Process-wide registry of loaded ML models shared between executions.
+
+Node code asks for a model by kind and name (e.g. whisper "base") instead of
+loading it itself, so repeated executions reuse the weights already in
+memory. Models are kept in LRU order under a memory budget; models in use are
+never evicted. Loading is single-flight: concurrent requests for a model that
+is still loading wait for that load instead of starting another. The most
+recently used model is never evicted just to get under the budget, so a
+model larger than the whole budget still stays loaded between executions
+until a different model is used. Each model
+has a lock, held by use_model() for the duration of inference, since models
+such as Whisper keep per-call state on the module and are not safe to run
+concurrently; different models run in parallel.
+
+Preloading (SMART_FOLDER_PRELOAD_MODELS="whisper:base,whisper:small") loads
+models in the background when the API or a worker process starts.
+"""
+import collections
+import contextlib
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, Callable, Tuple
+
+# Memory budget for loaded models in MB per process (0 for no limit). Chunked
+# transcription pools load one more model per pool process outside this budget
+# (see SMART_FOLDER_TRANSCRIBE_WORKERS and SMART_FOLDER_TRANSCRIBE_IDLE_POOLS)
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("SMART_FOLDER_MODEL_MEMORY_MB", "4096"))
+
+# Comma-separated kind:name pairs loaded at startup
+PRELOAD_MODELS = os.getenv("SMART_FOLDER_PRELOAD_MODELS", "")
+
+# Approximate in-memory size of Whisper checkpoints in MB, used when the
+# model can't be measured
+WHISPER_SIZES_MB = {
+    "tiny": 150, "tiny.en": 150,
+    "base": 290, "base.en": 290,
+    "small": 970, "small.en": 970,
+    "medium": 3060, "medium.en": 3060,
+    "large": 6170, "large-v1": 6170, "large-v2": 6170, "large-v3": 6170, "turbo": 3240
+}
+
+def _load_whisper(name: str, **options):
+    import whisper
+    return whisper.load_model(name, **options)
+
+def _measure_bytes(model: Any) -> Optional[int]:
+    """Size of a torch module's parameters and buffers, None if it isn't one"""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+    except AttributeError:
+        return None
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+class ModelRegistry:
+    """LRU cache of loaded models under a memory budget"""
+
+    def __init__(self, memory_budget_mb: float = MODEL_MEMORY_BUDGET_MB):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._loaders: Dict[str, Tuple[Callable[..., Any], Dict[str, int]]] = {}
+        self._models = collections.OrderedDict()
+        self._loading: Dict[tuple, threading.Event] = {}
+        # Entries pinned through hold(), by holder (an execution id)
+        self._held: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "load_failures": 0, "evictions": 0, "load_seconds": 0.0}
+
+    def register_loader(self, kind: str, loader: Callable[..., Any], sizes_mb: Optional[Dict[str, int]] = None):
+        """Register loader(name, **options) for a kind of model, with size estimates by name"""
+        self._loaders[kind] = (loader, {name: mb * 1024 * 1024 for name, mb in (sizes_mb or {}).items()})
+
+    def _key(self, kind: str, name: str, options: Dict[str, Any]) -> tuple:
+        return (kind, name, tuple(sorted(options.items())))
+
+    def _acquire(self, kind: str, name: str, **options) -> Dict[str, Any]:
+        """Return a loaded model's entry with its pin count raised, loading it if needed"""
+        if kind not in self._loaders:
+            raise KeyError(f"No loader registered for model kind '{kind}'")
+        key = self._key(kind, name, options)
+        while True:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    entry["pins"] += 1
+                    entry["last_used"] = time.time()
+                    self._stats["hits"] += 1
+                    return entry
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = threading.Event()
+                    self._loading[key] = loading
+                    self._stats["misses"] += 1
+                    break
+            # Another thread is loading this model; wait for it and look again
+            loading.wait()
+
+        loader, sizes = self._loaders[kind]
+        started = time.time()
+        try:
+            model = loader(name, **options)
+        except BaseException:
+            with self._lock:
+                self._stats["load_failures"] += 1
+                del self._loading[key]
+            loading.set()
+            raise
+        size = _measure_bytes(model) or sizes.get(name, 0)
+        entry = {
+            "key": key,
+            "model": model,
+            "size": size,
+            "pins": 1,
+            "lock": threading.RLock(),
+            "loaded_at": time.time(),
+            "last_used": time.time(),
+            "load_seconds": time.time() - started
+        }
+        with self._lock:
+            self._stats["loads"] += 1
+            self._stats["load_seconds"] += entry["load_seconds"]
+            self._models[key] = entry
+            del self._loading[key]
+            self._evict_locked()
+        loading.set()
+        return entry
+
+    def _release(self, entry: Dict[str, Any]):
+        with self._lock:
+            entry["pins"] -= 1
+            self._evict_locked()
+
+    def _evict_locked(self):
+        """Drop least recently used models not in use until within the budget, keeping the most recent"""
+        if self.memory_budget <= 0:
+            return
+        total = sum(entry["size"] for entry in self._models.values())
+        for key in list(self._models)[:-1]:
+            if total <= self.memory_budget:
+                break
+            entry = self._models[key]
+            if entry["pins"] > 0:
+                continue
+            del self._models[key]
+            total -= entry["size"]
+            self._stats["evictions"] += 1
+
+    def get_model(self, kind: str, name: str, **options) -> Any:
+        """
+        Return a shared model, loading it on first use
+
+        The model may be evicted once no execution holds it through
+        use_model(); callers running inference concurrently should use
+        use_model() instead.
+        """
+        entry = self._acquire(kind, name, **options)
+        self._release(entry)
+        return entry["model"]
+
+    def hold(self, holder: str, kind: str, name: str, **options) -> Any:
+        """Return a shared model pinned against eviction until release_held(holder)"""
+        entry = self._acquire(kind, name, **options)
+        with self._lock:
+            self._held.setdefault(holder, []).append(entry)
+        return entry["model"]
+
+    def release_held(self, holder: str) -> int:
+        """Unpin every model held by holder and return how many pins were dropped"""
+        with self._lock:
+            entries = self._held.pop(holder, [])
+        for entry in entries:
+            self._release(entry)
+        return len(entries)
+
+    @contextlib.contextmanager
+    def use_model(self, kind: str, name: str, **options):
+        """
+        Hold a shared model for inference
+
+        The model is pinned against eviction and its lock is held, so
+        concurrent executions using the same model take turns.
+        """
+        entry = self._acquire(kind, name, **options)
+        try:
+            with entry["lock"]:
+                yield entry["model"]
+        finally:
+            self._release(entry)
+
+    def preload(self, specs: str) -> int:
+        """Load models given as "kind:name,kind:name" and return how many were loaded"""
+        loaded = 0
+        for spec in filter(None, (part.strip() for part in specs.split(","))):
+            kind, _, name = spec.partition(":")
+            try:
+                self.get_model(kind, name)
+                loaded += 1
+            except Exception as e:
+                print(f"⚠️  Failed to preload model {spec}: {e}")
+        return loaded
+
+    def unload(self, kind: Optional[str] = None, name: Optional[str] = None) -> int:
+        """Drop idle models (optionally of one kind/name) and return how many were removed"""
+        with self._lock:
+            removed = 0
+            for key, entry in list(self._models.items()):
+                if entry["pins"] > 0 or (kind is not None and key[0] != kind) or (name is not None and key[1] != name):
+                    continue
+                del self._models[key]
+                removed += 1
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = [
+                {
+                    "kind": entry["key"][0],
+                    "name": entry["key"][1],
+                    "options": dict(entry["key"][2]),
+                    "size_bytes": entry["size"],
+                    "in_use": entry["pins"],
+                    "loaded_at": entry["loaded_at"],
+                    "last_used": entry["last_used"],
+                    "load_seconds": round(entry["load_seconds"], 3)
+                }
+                for entry in self._models.values()
+            ]
+            return {
+                "models": models,
+                "loading": [f"{kind}:{name}" for kind, name, _ in self._loading],
+                "total_bytes": sum(model["size_bytes"] for model in models),
+                "memory_budget_bytes": self.memory_budget,
+                **self._stats,
+                "load_seconds": round(self._stats["load_seconds"], 3)
+            }
+
+# Process-wide registry
+_registry = ModelRegistry()
+_registry.register_loader("whisper", _load_whisper, WHISPER_SIZES_MB)
+
+def get_model_registry() -> ModelRegistry:
+    return _registry
+
+def get_model(kind: str, name: str, **options) -> Any:
+    """Return a shared model from the process-wide registry"""
+    return _registry.get_model(kind, name, **options)
+
+def hold_model(holder: str, kind: str, name: str, **options) -> Any:
+    """Return a shared model from the process-wide registry, pinned until release_models(holder)"""
+    return _registry.hold(holder, kind, name, **options)
+
+def release_models(holder: str) -> int:
+    """Unpin the models holder took with hold_model()"""
+    return _registry.release_held(holder)
+
+def use_model(kind: str, name: str, **options):
+    """Context manager holding a shared model from the process-wide registry for inference"""
+    return _registry.use_model(kind, name, **options)
+
+def start_preloading(specs: str = PRELOAD_MODELS) -> Optional[threading.Thread]:
+    """Preload configured models on a background thread"""
+    if not specs.strip():
+        return None
+    thread = threading.Thread(target=_registry.preload, args=(specs,), name="smart-folder-model-preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,126 @@
+"""
+Content-addressed store of node outputs for incremental flow re-execution.
+
+Outputs are keyed by a hash of the node's code and its resolved inputs, so a
+node whose code and inputs are unchanged can reuse its previous output
+instead of running again. Entries are evicted by age and total size.
+"""
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+# Total characters of cached output kept in memory (0 disables the cache)
+OUTPUT_CACHE_MAX_CHARS = int(os.getenv("SMART_FOLDER_OUTPUT_CACHE_CHARS", str(64 * 1024 * 1024)))
+
+# Seconds before a cached output is considered stale
+OUTPUT_CACHE_TTL = float(os.getenv("SMART_FOLDER_OUTPUT_CACHE_TTL", "3600"))
+
+# Node types that depend on the clock or filesystem, or exist for their side effects
+NON_MEMOIZED_NODE_TYPES = frozenset({
+    "audioExtractor",
+    "directory",
+    "fileDeleter",
+    "fileUploader",
+    "ipWebcam",
+    "loadAudio",
+    "loadVideo",
+    "oldFileDeleter",
+    "oldFileFinder",
+    "scheduler",
+    "textFileLoader",
+    "textFileWriter",
+    "timer",
+    "videoConcatenator",
+    "videoRecorder",
+    "webhookMaker",
+    "webmToMp4",
+})
+
+_entries = collections.OrderedDict()
+_lock = threading.Lock()
+_size = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+def is_memoizable(node: Dict[str, Any]) -> bool:
+    """
+    Whether a node's output may be reused
+
+    A node's data["memoize"] flag wins when set; otherwise nodes of the types
+    in NON_MEMOIZED_NODE_TYPES opt out.
+    """
+    if OUTPUT_CACHE_MAX_CHARS <= 0:
+        return False
+    memoize = node.get("data", {}).get("memoize")
+    if memoize is not None:
+        return bool(memoize)
+    node_type = node.get("type") or node.get("data", {}).get("nodeType")
+    return node_type not in NON_MEMOIZED_NODE_TYPES
+
+def compute_output_key(function_code: str, inputs: Dict[str, Any]) -> str:
+    """Hash a node's code together with its resolved inputs"""
+    canonical = json.dumps(
+        {"code": function_code, "inputs": inputs},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _remove_locked(key: str):
+    global _size
+    output, _ = _entries.pop(key)
+    _size -= len(output)
+
+def get_cached_output(key: str) -> Optional[str]:
+    """Return the cached output for a key, or None on a miss or expired entry"""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and time.time() - entry[1] > OUTPUT_CACHE_TTL:
+            _remove_locked(key)
+            _stats["expirations"] += 1
+            entry = None
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return entry[0]
+
+def store_output(key: str, output: str):
+    """Cache an output, evicting least recently used entries over the size budget"""
+    global _size
+    if output is None or len(output) > OUTPUT_CACHE_MAX_CHARS:
+        return
+    with _lock:
+        if key in _entries:
+            _remove_locked(key)
+        _entries[key] = (output, time.time())
+        _size += len(output)
+        while _size > OUTPUT_CACHE_MAX_CHARS:
+            oldest = next(iter(_entries))
+            _remove_locked(oldest)
+            _stats["evictions"] += 1
+
+def get_output_cache_stats() -> Dict[str, Any]:
+    """Return size and hit/miss counters for the output cache"""
+    with _lock:
+        return {
+            "entries": len(_entries),
+            "size_chars": _size,
+            "max_chars": OUTPUT_CACHE_MAX_CHARS,
+            "ttl_seconds": OUTPUT_CACHE_TTL,
+            **_stats
+        }
+
+def clear_output_cache() -> int:
+    """Drop every cached output and return how many were removed"""
+    global _size
+    with _lock:
+        removed = len(_entries)
+        _entries.clear()
+        _size = 0
+        return removed
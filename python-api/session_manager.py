@@ -0,0 +1,210 @@
+"""
+Lifecycle of execution sessions and their log files.
+
+Sessions are created when an execution is tracked (for cancellation, log
+streaming and its final result) and marked finished when it ends. A
+background reaper forgets finished sessions after a TTL, drops their log
+buffers, and deletes spilled log files and cancellation markers in the temp
+dir once they are older than the retention period. The number of sessions is
+capped; past the cap the oldest finished sessions are reaped first.
+"""
+import collections
+import glob
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, Any, Optional
+
+import log_buffer
+
+# Seconds a finished session is kept for late readers
+SESSION_TTL = float(os.getenv("SMART_FOLDER_SESSION_TTL", "3600"))
+
+# Sessions tracked at once, running and finished
+SESSION_MAX_ENTRIES = int(os.getenv("SMART_FOLDER_SESSION_MAX", "10000"))
+
+# Seconds spilled log files and cancellation markers are kept in the temp dir
+LOG_FILE_RETENTION = float(os.getenv("SMART_FOLDER_LOG_FILE_RETENTION", "86400"))
+
+# Seconds between reaper passes
+REAP_INTERVAL = float(os.getenv("SMART_FOLDER_SESSION_REAP_INTERVAL", "60"))
+
+TEMP_FILE_PATTERNS = ("smart_folder_log_*.txt", "smart_folder_cancel_*")
+
+# Session id -> session dict, in creation order
+_sessions = collections.OrderedDict()
+# Finished session ids in the order they finished
+_finished = collections.OrderedDict()
+_lock = threading.Lock()
+_stats = {"created": 0, "ended": 0, "reaped": 0, "evicted": 0, "files_deleted": 0, "bytes_deleted": 0}
+_last_reap = {"at": None, "sessions": 0, "files": 0}
+
+_reaper = None
+_reaper_stop = threading.Event()
+
+def create_session(log_file_id: str, **fields) -> Dict[str, Any]:
+    """
+    Start tracking an execution session
+
+    Returns:
+        The session dict; callers may update it in place
+    """
+    session = {"status": "running", "start_time": time.time(), **fields}
+    with _lock:
+        existing = _sessions.get(log_file_id)
+        if existing is not None:
+            existing.update(fields)
+            return existing
+        _sessions[log_file_id] = session
+        _stats["created"] += 1
+        evicted = _evict_locked()
+    for session_id in evicted:
+        _release(session_id)
+    return session
+
+def track_session(log_file_id: str, session: Dict[str, Any]):
+    """Track a session dict created elsewhere"""
+    with _lock:
+        if _sessions.get(log_file_id) is session:
+            return
+        session.setdefault("status", "running")
+        session.setdefault("start_time", time.time())
+        _sessions[log_file_id] = session
+        _stats["created"] += 1
+        evicted = _evict_locked()
+    for session_id in evicted:
+        _release(session_id)
+
+def get_session(log_file_id: str) -> Optional[Dict[str, Any]]:
+    return _sessions.get(log_file_id)
+
+def finish_session(log_file_id: str, status: Optional[str] = None, result: Optional[Dict[str, Any]] = None):
+    """
+    Mark a session finished, starting its TTL
+
+    A cancelled session keeps its status. The reference to the execution's
+    future is dropped so finished sessions hold no thread state.
+    """
+    with _lock:
+        session = _sessions.get(log_file_id)
+        if session is None or log_file_id in _finished:
+            return
+        if status is not None and session.get("status") != "cancelled":
+            session["status"] = status
+        if result is not None:
+            session["result"] = result
+        session["future"] = None
+        session["finished_at"] = time.time()
+        _finished[log_file_id] = session["finished_at"]
+        _stats["ended"] += 1
+
+def _evict_locked() -> list:
+    """Drop the oldest finished sessions while over the cap"""
+    evicted = []
+    while len(_sessions) > SESSION_MAX_ENTRIES and _finished:
+        session_id, _ = _finished.popitem(last=False)
+        _sessions.pop(session_id, None)
+        _stats["evicted"] += 1
+        evicted.append(session_id)
+    return evicted
+
+def _release(log_file_id: str):
+    log_buffer.discard_log(log_file_id)
+
+def reap_sessions(now: Optional[float] = None) -> int:
+    """Forget sessions finished more than SESSION_TTL ago and return how many were removed"""
+    now = now if now is not None else time.time()
+    cutoff = now - SESSION_TTL
+    reaped = []
+    with _lock:
+        while _finished:
+            session_id, finished_at = next(iter(_finished.items()))
+            if finished_at > cutoff:
+                break
+            del _finished[session_id]
+            _sessions.pop(session_id, None)
+            reaped.append(session_id)
+        _stats["reaped"] += len(reaped)
+    for session_id in reaped:
+        _release(session_id)
+    return len(reaped)
+
+def reap_log_files(now: Optional[float] = None) -> int:
+    """Delete expired log files and cancellation markers of executions no longer running"""
+    if LOG_FILE_RETENTION <= 0:
+        return 0
+    now = now if now is not None else time.time()
+    cutoff = now - LOG_FILE_RETENTION
+    with _lock:
+        running = {session_id for session_id in _sessions if session_id not in _finished}
+    deleted = 0
+    temp_dir = tempfile.gettempdir()
+    for pattern in TEMP_FILE_PATTERNS:
+        prefix, suffix = pattern.split("*")
+        for path in glob.glob(os.path.join(temp_dir, pattern)):
+            session_id = os.path.basename(path)[len(prefix):len(os.path.basename(path)) - len(suffix)]
+            if session_id in running:
+                continue
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime > cutoff:
+                    continue
+                os.remove(path)
+            except OSError:
+                continue
+            deleted += 1
+            _stats["bytes_deleted"] += stat.st_size
+    _stats["files_deleted"] += deleted
+    return deleted
+
+def reap(now: Optional[float] = None) -> Dict[str, int]:
+    """Run one reaper pass over sessions and temp files"""
+    sessions = reap_sessions(now)
+    files = reap_log_files(now)
+    _last_reap.update({"at": time.time(), "sessions": sessions, "files": files})
+    return {"sessions": sessions, "files": files}
+
+def _reap_loop():
+    while not _reaper_stop.wait(REAP_INTERVAL):
+        try:
+            reap()
+        except Exception as e:
+            print(f"⚠️  Session reaper pass failed: {e}")
+
+def start_session_reaper():
+    """Start the background reaper thread (idempotent)"""
+    global _reaper
+    if _reaper is not None or REAP_INTERVAL <= 0:
+        return
+    _reaper_stop.clear()
+    _reaper = threading.Thread(target=_reap_loop, name="smart-folder-session-reaper", daemon=True)
+    _reaper.start()
+
+def stop_session_reaper():
+    global _reaper
+    if _reaper is None:
+        return
+    _reaper_stop.set()
+    _reaper.join(5)
+    _reaper = None
+
+def get_session_stats() -> Dict[str, Any]:
+    """Return live/finished session counts, reaping totals and the retention policy"""
+    with _lock:
+        total = len(_sessions)
+        finished = len(_finished)
+        statuses = collections.Counter(session.get("status") for session in _sessions.values())
+    return {
+        "live": total - finished,
+        "finished": finished,
+        "tracked": total,
+        "by_status": dict(statuses),
+        **_stats,
+        "last_reap": dict(_last_reap),
+        "ttl_seconds": SESSION_TTL,
+        "max_sessions": SESSION_MAX_ENTRIES,
+        "log_file_retention_seconds": LOG_FILE_RETENTION,
+        "reap_interval_seconds": REAP_INTERVAL,
+        "logs": log_buffer.get_log_stats()
+    }
@@ -1,51 +1,564 @@
+import collections
+import hashlib
 import json
 import os
-from typing import Dict, Any, Optional
+import sqlite3
+import threading
+from typing import Dict, Any, Optional, List
 from datetime import datetime
 
+from flow_format import (
+    BlobStore,
+    BLOB_REF_KEY,
+    decode_flow,
+    detect_format,
+    encode_flow,
+    is_blob_ref,
+    iter_blob_refs,
+    resolve_format
+)
+
 # Directory to store flow data
 FLOWS_DIR = "flows_data"
 
+# Storage backend: "json" (one file per flow) or "sqlite" (rows in flows.db)
+STORAGE_BACKEND = os.getenv("SMART_FOLDER_STORAGE", "json").lower()
+
+# Number of parsed flows kept in memory
+FLOW_CACHE_SIZE = int(os.getenv("SMART_FOLDER_FLOW_CACHE_SIZE", "32"))
+
+# Sidecar file holding list metadata for every JSON flow
+FLOW_INDEX_FILE = ".flow_index.json"
+
+# On-disk encoding of JSON-backend flows: json (indented), compact, gzip or zstd
+FLOW_FORMAT = resolve_format(os.getenv("SMART_FOLDER_FLOW_FORMAT", "json"))
+
+# Node data strings at least this long are stored in flows_data/blobs (0 keeps them inline)
+FLOW_BLOB_MIN_CHARS = int(os.getenv(
+    "SMART_FOLDER_FLOW_BLOB_CHARS", "0" if FLOW_FORMAT == "json" else str(64 * 1024)
+))
+
+# Directory of out-of-line node data shared by all flows
+BLOBS_DIR = os.path.join(FLOWS_DIR, "blobs")
+
+# Fields list_flows can sort by
+FLOW_SORT_FIELDS = ("saved_at", "flow_id", "node_count", "edge_count")
+
 def ensure_flows_directory():
     """Ensure the flows directory exists"""
     if not os.path.exists(FLOWS_DIR):
         os.makedirs(FLOWS_DIR)
 
+def _page_flows(flows: List[Dict[str, Any]], sort_by: str, descending: bool, offset: int, limit: Optional[int]) -> List[Dict[str, Any]]:
+    """Sort flow metadata and cut out one page"""
+    flows = sorted(flows, key=lambda x: (x.get(sort_by) is not None, x.get(sort_by) or 0, x["flow_id"]), reverse=descending)
+    return flows[offset:offset + limit] if limit is not None else flows[offset:]
+
+class JsonFlowStore:
+    """
+    Stores each flow as flows_data/<flow_id>.json
+    
+    The file is written in FLOW_FORMAT (whatever format a file is in is
+    detected on load) with large node data strings moved to the blob
+    directory. List metadata (saved_at, node/edge counts and the blobs the
+    flow refers to) is kept in a sidecar index keyed by each file's mtime and
+    size, so listing flows only re-parses files that changed since the index
+    was last written. A write deletes the blobs the previous version referred
+    to once no flow in the index uses them any more.
+    """
+
+    def __init__(self, flow_format: str = FLOW_FORMAT, blob_min_chars: int = FLOW_BLOB_MIN_CHARS):
+        self.flow_format = flow_format
+        self.blob_min_chars = blob_min_chars
+        self.blobs = BlobStore(BLOBS_DIR, flow_format)
+        # Serializes read-modify-write updates of a flow file
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._index_lock = threading.Lock()
+
+    def location(self, flow_id: str) -> str:
+        return os.path.join(FLOWS_DIR, f"{flow_id}.json")
+
+    def _write(self, flow_id: str, data: Dict[str, Any]) -> str:
+        # Write to a temp file and rename so readers never see a partial flow
+        file_path = self.location(flow_id)
+        temp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        previous_blobs = self._stored_blob_refs(flow_id)
+        stored = {**data, "nodes": self.blobs.externalize_nodes(data.get("nodes", []), self.blob_min_chars)}
+        with open(temp_path, 'wb') as f:
+            f.write(encode_flow(stored, self.flow_format))
+        os.replace(temp_path, file_path)
+        blobs = set(iter_blob_refs(stored["nodes"]))
+        self._index_flow(flow_id, data, os.stat(file_path), blobs)
+        if previous_blobs - blobs:
+            self._release_blobs(previous_blobs - blobs)
+        return file_path
+
+    def _stored_blob_refs(self, flow_id: str) -> set:
+        """Blob ids the flow's current file refers to"""
+        file_path = self.location(flow_id)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return set()
+        with self._index_lock:
+            cached = self._read_index_locked().get(flow_id)
+        if cached and "blobs" in cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+            return set(cached["blobs"])
+        try:
+            with open(file_path, 'rb') as f:
+                return set(iter_blob_refs(decode_flow(f.read()).get("nodes", [])))
+        except (OSError, ValueError, RuntimeError):
+            return set()
+
+    def _release_blobs(self, blob_ids: set):
+        """Delete blobs a write stopped referring to, unless another flow still uses them"""
+        in_use = set()
+        for meta in self._refresh_index().values():
+            in_use.update(meta["blobs"])
+        self.blobs.discard(blob_ids - in_use)
+
+    def _index_path(self) -> str:
+        return os.path.join(FLOWS_DIR, FLOW_INDEX_FILE)
+
+    def _read_index_locked(self) -> Dict[str, Dict[str, Any]]:
+        if self._index is None:
+            try:
+                with open(self._index_path(), 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                # Missing or corrupted index, rebuilt by the next listing
+                self._index = {}
+        return self._index
+
+    def _write_index_locked(self):
+        index_path = self._index_path()
+        temp_path = f"{index_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(temp_path, index_path)
+
+    def _index_flow(self, flow_id: str, data: Dict[str, Any], stat: os.stat_result, blobs: set):
+        with self._index_lock:
+            self._read_index_locked()[flow_id] = {
+                "saved_at": data.get("saved_at"),
+                "node_count": len(data.get("nodes", [])),
+                "edge_count": len(data.get("edges", [])),
+                "blobs": sorted(blobs),
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size
+            }
+            self._write_index_locked()
+
+    def _refresh_index(self) -> Dict[str, Dict[str, Any]]:
+        """Bring the index in line with the directory, re-parsing only changed files"""
+        with self._index_lock:
+            index = self._read_index_locked()
+            seen = set()
+            changed = False
+            with os.scandir(FLOWS_DIR) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.json') or entry.name.startswith('.'):
+                        continue
+                    flow_id = entry.name[:-5]  # Remove .json extension
+                    seen.add(flow_id)
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    cached = index.get(flow_id)
+                    if (cached and "blobs" in cached
+                            and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size):
+                        continue
+                    try:
+                        with open(entry.path, 'rb') as f:
+                            data = decode_flow(f.read())
+                    except (OSError, ValueError, RuntimeError):
+                        # Skip corrupted files
+                        if index.pop(flow_id, None) is not None:
+                            changed = True
+                        continue
+                    index[flow_id] = {
+                        "saved_at": data.get("saved_at"),
+                        "node_count": len(data.get("nodes", [])),
+                        "edge_count": len(data.get("edges", [])),
+                        "blobs": sorted(set(iter_blob_refs(data.get("nodes", [])))),
+                        "mtime_ns": stat.st_mtime_ns,
+                        "size": stat.st_size
+                    }
+                    changed = True
+            for flow_id in [flow_id for flow_id in index if flow_id not in seen]:
+                del index[flow_id]
+                changed = True
+            if changed:
+                self._write_index_locked()
+            return dict(index)
+
+    def save_flow(self, flow_id: str, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], saved_at: str) -> str:
+        save_data = {
+            "flow_id": flow_id,
+            "saved_at": saved_at,
+            "nodes": nodes,
+            "edges": edges
+        }
+        with self._lock:
+            return self._write(flow_id, save_data)
+
+    def signature(self, flow_id: str) -> Optional[tuple]:
+        """Cheap fingerprint of the stored flow that changes whenever the file does"""
+        try:
+            stat = os.stat(self.location(flow_id))
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def load_flow(self, flow_id: str) -> Optional[Dict[str, Any]]:
+        """Load a flow as stored, with large values left as blob references"""
+        file_path = self.location(flow_id)
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, 'rb') as f:
+            return decode_flow(f.read())
+
+    def list_flows(self, sort_by: str, descending: bool, offset: int, limit: Optional[int]) -> Dict[str, Any]:
+        flows = [
+            {
+                "flow_id": flow_id,
+                "saved_at": meta["saved_at"],
+                "node_count": meta["node_count"],
+                "edge_count": meta["edge_count"]
+            }
+            for flow_id, meta in self._refresh_index().items()
+        ]
+        return {
+            "flows": _page_flows(flows, sort_by, descending, offset, limit),
+            "total": len(flows)
+        }
+
+    def update_node_data(self, flow_id: str, updates: Dict[str, Dict[str, Any]], saved_at: str) -> int:
+        with self._lock:
+            data = self.load_flow(flow_id)
+            if data is None:
+                return 0
+            updated = 0
+            for node in data.get("nodes", []):
+                fields = updates.get(node.get("id"))
+                if fields:
+                    node.setdefault("data", {}).update(fields)
+                    updated += 1
+            data["saved_at"] = saved_at
+            self._write(flow_id, data)
+        return updated
+
+class SqliteFlowStore:
+    """
+    Stores flows in flows_data/flows.db with one row per node and edge.
+    
+    Runs in WAL mode so readers don't block the writer, and node data can be
+    updated in place without rewriting the rest of the flow.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS flows (
+            flow_id TEXT PRIMARY KEY,
+            saved_at TEXT,
+            node_count INTEGER NOT NULL DEFAULT 0,
+            edge_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS nodes (
+            flow_id TEXT NOT NULL,
+            node_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            node TEXT NOT NULL,
+            PRIMARY KEY (flow_id, node_id)
+        );
+        CREATE TABLE IF NOT EXISTS edges (
+            flow_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            edge TEXT NOT NULL,
+            PRIMARY KEY (flow_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS flows_saved_at ON flows (saved_at);
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(FLOWS_DIR, "flows.db")
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(self.SCHEMA)
+                    self._schema_ready = True
+        return conn
+
+    def location(self, flow_id: str) -> str:
+        return self.db_path
+
+    def save_flow(self, flow_id: str, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], saved_at: str) -> str:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM nodes WHERE flow_id = ?", (flow_id,))
+            conn.execute("DELETE FROM edges WHERE flow_id = ?", (flow_id,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO nodes (flow_id, node_id, position, node) VALUES (?, ?, ?, ?)",
+                [
+                    (flow_id, str(node.get("id", index)), index, json.dumps(node, ensure_ascii=False))
+                    for index, node in enumerate(nodes)
+                ]
+            )
+            conn.executemany(
+                "INSERT INTO edges (flow_id, position, edge) VALUES (?, ?, ?)",
+                [
+                    (flow_id, index, json.dumps(edge, ensure_ascii=False))
+                    for index, edge in enumerate(edges)
+                ]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO flows (flow_id, saved_at, node_count, edge_count) VALUES (?, ?, ?, ?)",
+                (flow_id, saved_at, len(nodes), len(edges))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.db_path
+
+    def signature(self, flow_id: str) -> Optional[tuple]:
+        """Cheap fingerprint of the stored flow that changes on every save or node update"""
+        row = self._connect().execute(
+            "SELECT saved_at, node_count, edge_count FROM flows WHERE flow_id = ?", (flow_id,)
+        ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def load_flow(self, flow_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        # Read flow metadata, nodes and edges from one snapshot
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT saved_at FROM flows WHERE flow_id = ?", (flow_id,)).fetchone()
+            if row is not None:
+                nodes = [
+                    json.loads(node) for (node,) in conn.execute(
+                        "SELECT node FROM nodes WHERE flow_id = ? ORDER BY position", (flow_id,)
+                    )
+                ]
+                edges = [
+                    json.loads(edge) for (edge,) in conn.execute(
+                        "SELECT edge FROM edges WHERE flow_id = ? ORDER BY position", (flow_id,)
+                    )
+                ]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return self._import_json_flow(flow_id)
+        return {
+            "flow_id": flow_id,
+            "saved_at": row[0],
+            "nodes": nodes,
+            "edges": edges
+        }
+
+    def _import_json_flow(self, flow_id: str) -> Optional[Dict[str, Any]]:
+        """Migrate a flow saved by the JSON backend the first time it is loaded"""
+        data = JsonFlowStore().load_flow(flow_id)
+        if data is None:
+            return None
+        self.save_flow(
+            flow_id,
+            data.get("nodes", []),
+            data.get("edges", []),
+            data.get("saved_at") or datetime.now().isoformat()
+        )
+        return data
+
+    def list_flows(self, sort_by: str, descending: bool, offset: int, limit: Optional[int]) -> Dict[str, Any]:
+        conn = self._connect()
+        # sort_by is checked against FLOW_SORT_FIELDS before it reaches the query
+        direction = "DESC" if descending else "ASC"
+        rows = conn.execute(
+            f"SELECT flow_id, saved_at, node_count, edge_count FROM flows "
+            f"ORDER BY {sort_by} IS NOT NULL {direction}, {sort_by} {direction}, flow_id {direction} "
+            f"LIMIT ? OFFSET ?",
+            (limit if limit is not None else -1, offset)
+        )
+        flows = [
+            {
+                "flow_id": flow_id,
+                "saved_at": saved_at,
+                "node_count": node_count,
+                "edge_count": edge_count
+            }
+            for flow_id, saved_at, node_count, edge_count in rows
+        ]
+        total = conn.execute("SELECT COUNT(*) FROM flows").fetchone()[0]
+        return {"flows": flows, "total": total}
+
+    def update_node_data(self, flow_id: str, updates: Dict[str, Dict[str, Any]], saved_at: str) -> int:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            updated = 0
+            for node_id, fields in updates.items():
+                row = conn.execute(
+                    "SELECT node FROM nodes WHERE flow_id = ? AND node_id = ?", (flow_id, node_id)
+                ).fetchone()
+                if row is None:
+                    continue
+                node = json.loads(row[0])
+                node.setdefault("data", {}).update(fields)
+                conn.execute(
+                    "UPDATE nodes SET node = ? WHERE flow_id = ? AND node_id = ?",
+                    (json.dumps(node, ensure_ascii=False), flow_id, node_id)
+                )
+                updated += 1
+            if updated:
+                conn.execute("UPDATE flows SET saved_at = ? WHERE flow_id = ?", (saved_at, flow_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return updated
+
+_flow_store = None
+_flow_store_lock = threading.Lock()
+
+def get_flow_store():
+    """Return the configured storage backend"""
+    global _flow_store
+    if _flow_store is None:
+        with _flow_store_lock:
+            if _flow_store is None:
+                ensure_flows_directory()
+                _flow_store = SqliteFlowStore() if STORAGE_BACKEND == "sqlite" else JsonFlowStore()
+    return _flow_store
+
+# Parsed flows served from memory until the stored flow's signature changes
+_flow_cache = collections.OrderedDict()
+_flow_versions: Dict[str, int] = {}
+_flow_cache_lock = threading.Lock()
+
+def _make_etag(flow_id: str, signature: tuple) -> str:
+    return '"' + hashlib.sha1(f"{flow_id}:{signature}".encode("utf-8")).hexdigest()[:20] + '"'
+
+def _copy_flow(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a cached flow deep enough that callers can update node data freely"""
+    return {
+        **data,
+        "nodes": [{**node, "data": dict(node.get("data", {}))} for node in data.get("nodes", [])],
+        "edges": [dict(edge) for edge in data.get("edges", [])]
+    }
+
+def invalidate_flow_cache(flow_id: Optional[str] = None):
+    """Drop one cached flow, or all of them"""
+    with _flow_cache_lock:
+        if flow_id is None:
+            _flow_cache.clear()
+        else:
+            _flow_cache.pop(flow_id, None)
+
+def get_flow_etag(flow_id: str = "default") -> Optional[str]:
+    """
+    Return the ETag of the currently stored version of a flow without loading it
+    
+    Returns:
+        Quoted ETag string, or None if the flow does not exist
+    """
+    signature = get_flow_store().signature(flow_id)
+    return _make_etag(flow_id, signature) if signature is not None else None
+
+def _load_cached_flow(flow_id: str) -> Optional[Dict[str, Any]]:
+    store = get_flow_store()
+    signature = store.signature(flow_id)
+    
+    with _flow_cache_lock:
+        entry = _flow_cache.get(flow_id)
+        if entry is not None and signature is not None and entry["signature"] == signature:
+            _flow_cache.move_to_end(flow_id)
+            return entry
+    
+    data = store.load_flow(flow_id)
+    if data is None:
+        invalidate_flow_cache(flow_id)
+        return None
+    if signature is None:
+        # The backend may have just created the flow (e.g. an imported JSON flow)
+        signature = store.signature(flow_id)
+    
+    with _flow_cache_lock:
+        version = _flow_versions.get(flow_id, 0) + 1
+        _flow_versions[flow_id] = version
+        entry = {
+            # Nodes keep their blob references; texts are read on first use
+            "data": data,
+            "blobs": {},
+            "signature": signature,
+            "version": version,
+            "etag": _make_etag(flow_id, signature)
+        }
+        if signature is not None and FLOW_CACHE_SIZE > 0:
+            _flow_cache[flow_id] = entry
+            _flow_cache.move_to_end(flow_id)
+            while len(_flow_cache) > FLOW_CACHE_SIZE:
+                _flow_cache.popitem(last=False)
+    return entry
+
+def _resolve_blobs(entry: Dict[str, Any], nodes: List[Dict[str, Any]]):
+    """Replace blob references in copied nodes with their text, reading each blob once per cache entry"""
+    blobs = BlobStore(BLOBS_DIR)
+    texts = entry["blobs"]
+    for node in nodes:
+        data = node["data"]
+        for key, value in data.items():
+            if is_blob_ref(value):
+                blob_id = value[BLOB_REF_KEY]
+                if blob_id not in texts:
+                    texts[blob_id] = blobs.get(value)
+                data[key] = texts[blob_id]
+
 def save_flow(flow_data: Dict[str, Any], flow_id: str = "default") -> Dict[str, Any]:
     """
-    Save flow data to a JSON file
+    Save flow data to the configured storage backend
     
     Args:
         flow_data: Dictionary containing nodes and edges
         flow_id: ID for the flow (defaults to "default")
-        
+    
     Returns:
         Dictionary with save result
     """
     try:
         ensure_flows_directory()
         
-        # Add metadata
-        save_data = {
-            "flow_id": flow_id,
-            "saved_at": datetime.now().isoformat(),
-            "nodes": flow_data.get("nodes", []),
-            "edges": flow_data.get("edges", [])
-        }
-        
-        file_path = os.path.join(FLOWS_DIR, f"{flow_id}.json")
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(save_data, f, indent=2, ensure_ascii=False)
+        saved_at = datetime.now().isoformat()
+        file_path = get_flow_store().save_flow(
+            flow_id,
+            flow_data.get("nodes", []),
+            flow_data.get("edges", []),
+            saved_at
+        )
+        invalidate_flow_cache(flow_id)
         
         return {
             "success": True,
             "message": f"Flow '{flow_id}' saved successfully",
             "flow_id": flow_id,
-            "saved_at": save_data["saved_at"],
+            "saved_at": saved_at,
             "file_path": file_path
         }
-        
+    
     except Exception as e:
         return {
             "success": False,
@@ -54,21 +567,34 @@ def save_flow(flow_data: Dict[str, Any], flow_id: str = "default") -> Dict[str,
             "error": str(e)
         }
 
-def load_flow(flow_id: str = "default") -> Dict[str, Any]:
+def load_flow(flow_id: str = "default", resolve_blobs: bool = True) -> Dict[str, Any]:
     """
-    Load flow data from a JSON file
+    Load flow data, serving it from memory while the stored flow is unchanged
     
     Args:
         flow_id: ID for the flow to load
-        
+        resolve_blobs: Replace out-of-line values with their text; callers
+            that only need node settings can pass False and skip reading blobs
+    
     Returns:
-        Dictionary with flow data or error
+        Dictionary with flow data (plus its version and ETag) or error
     """
     try:
         ensure_flows_directory()
-        file_path = os.path.join(FLOWS_DIR, f"{flow_id}.json")
+        entry = _load_cached_flow(flow_id)
+        data = _copy_flow(entry["data"]) if entry is not None else None
+        if data is not None and resolve_blobs:
+            try:
+                _resolve_blobs(entry, data["nodes"])
+            except FileNotFoundError:
+                # The flow was rewritten and its old blobs collected since it was cached
+                invalidate_flow_cache(flow_id)
+                entry = _load_cached_flow(flow_id)
+                data = _copy_flow(entry["data"]) if entry is not None else None
+                if data is not None:
+                    _resolve_blobs(entry, data["nodes"])
         
-        if not os.path.exists(file_path):
+        if entry is None:
             return {
                 "success": False,
                 "message": f"Flow '{flow_id}' not found",
@@ -77,18 +603,17 @@ def load_flow(flow_id: str = "default") -> Dict[str, Any]:
                 "edges": []
             }
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
         return {
             "success": True,
             "message": f"Flow '{flow_id}' loaded successfully",
             "flow_id": data.get("flow_id", flow_id),
             "saved_at": data.get("saved_at"),
+            "version": entry["version"],
+            "etag": entry["etag"],
             "nodes": data.get("nodes", []),
             "edges": data.get("edges", [])
         }
-        
+    
     except Exception as e:
         return {
             "success": False,
@@ -99,49 +624,167 @@ def load_flow(flow_id: str = "default") -> Dict[str, Any]:
             "edges": []
         }
 
-def list_flows() -> Dict[str, Any]:
+def update_node_data(flow_id: str, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
     """
-    List all available flows
+    Atomically update data fields of individual nodes without resaving the flow
+    
+    Args:
+        flow_id: ID of the flow containing the nodes
+        updates: Mapping of node id to the data fields to set, e.g.
+            {"node-1": {"lastOutput": "..."}}
     
     Returns:
-        Dictionary with list of flows
+        Dictionary with the number of nodes updated
     """
     try:
         ensure_flows_directory()
+        saved_at = datetime.now().isoformat()
+        updated = get_flow_store().update_node_data(flow_id, updates, saved_at)
+        invalidate_flow_cache(flow_id)
         
-        flows = []
-        for filename in os.listdir(FLOWS_DIR):
-            if filename.endswith('.json'):
-                flow_id = filename[:-5]  # Remove .json extension
-                file_path = os.path.join(FLOWS_DIR, filename)
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    flows.append({
-                        "flow_id": flow_id,
-                        "saved_at": data.get("saved_at"),
-                        "node_count": len(data.get("nodes", [])),
-                        "edge_count": len(data.get("edges", []))
-                    })
-                except:
-                    # Skip corrupted files
-                    continue
+        return {
+            "success": True,
+            "message": f"Updated {updated} nodes in flow '{flow_id}'",
+            "flow_id": flow_id,
+            "saved_at": saved_at,
+            "updated": updated
+        }
+    
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Failed to update nodes: {str(e)}",
+            "flow_id": flow_id,
+            "error": str(e),
+            "updated": 0
+        }
+
+def list_flows(
+    sort_by: str = "saved_at",
+    descending: bool = True,
+    offset: int = 0,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    List available flows from the backend's metadata index
+    
+    Args:
+        sort_by: One of FLOW_SORT_FIELDS (defaults to most recently saved first)
+        descending: Sort direction
+        offset: Number of flows to skip
+        limit: Maximum flows to return (None for all)
+    
+    Returns:
+        Dictionary with one page of flows and the total number of flows
+    """
+    try:
+        if sort_by not in FLOW_SORT_FIELDS:
+            raise ValueError(f"Cannot sort by '{sort_by}', expected one of {', '.join(FLOW_SORT_FIELDS)}")
+        if offset < 0 or (limit is not None and limit < 0):
+            raise ValueError("offset and limit must not be negative")
+        
+        ensure_flows_directory()
         
-        # Sort by saved_at descending
-        flows.sort(key=lambda x: x.get("saved_at", ""), reverse=True)
+        page = get_flow_store().list_flows(sort_by, descending, offset, limit)
         
         return {
             "success": True,
-            "flows": flows,
-            "count": len(flows)
+            "flows": page["flows"],
+            "count": len(page["flows"]),
+            "total": page["total"],
+            "offset": offset,
+            "limit": limit
         }
-        
+    
     except Exception as e:
         return {
             "success": False,
             "message": f"Failed to list flows: {str(e)}",
             "flows": [],
-            "count": 0
-        } 
\ No newline at end of file
+            "count": 0,
+            "total": 0
+        }
+
+def migrate_flows(flow_format: Optional[str] = None, blob_min_chars: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Rewrite every JSON-backend flow in a new on-disk format and drop unused blobs
+    
+    Run this while the API is not saving flows, since blobs written concurrently
+    by a save could be collected before the flow referencing them lands.
+    
+    Args:
+        flow_format: Target format (defaults to FLOW_FORMAT)
+        blob_min_chars: Externalization threshold (defaults to the format's default)
+    
+    Returns:
+        Dictionary with per-format counts and total bytes before and after
+    """
+    try:
+        ensure_flows_directory()
+        flow_format = resolve_format(flow_format or FLOW_FORMAT)
+        if blob_min_chars is None:
+            blob_min_chars = 0 if flow_format == "json" else 64 * 1024
+        source = JsonFlowStore()
+        target = JsonFlowStore(flow_format, blob_min_chars)
+        
+        migrated = []
+        formats_before: Dict[str, int] = {}
+        bytes_before = 0
+        bytes_after = 0
+        referenced = set()
+        for filename in sorted(os.listdir(FLOWS_DIR)):
+            if not filename.endswith('.json') or filename.startswith('.'):
+                continue
+            flow_id = filename[:-5]  # Remove .json extension
+            file_path = source.location(flow_id)
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            detected = detect_format(raw)
+            formats_before[detected] = formats_before.get(detected, 0) + 1
+            bytes_before += len(raw)
+            
+            data = decode_flow(raw)
+            data["nodes"] = source.blobs.resolve_nodes(data.get("nodes", []))
+            with target._lock:
+                target._write(flow_id, data)
+            
+            stored = target.load_flow(flow_id)
+            referenced.update(iter_blob_refs(stored.get("nodes", [])))
+            bytes_after += os.path.getsize(file_path)
+            migrated.append(flow_id)
+        
+        removed_blobs = target.blobs.collect_garbage(referenced)
+        invalidate_flow_cache()
+        
+        return {
+            "success": True,
+            "message": f"Migrated {len(migrated)} flows to '{flow_format}'",
+            "format": flow_format,
+            "migrated": migrated,
+            "formats_before": formats_before,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "blobs_removed": removed_blobs
+        }
+    
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Failed to migrate flows: {str(e)}",
+            "error": str(e)
+        }
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Smart Folder flow storage tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subcommands.add_parser("migrate", help="Rewrite saved flows in another on-disk format")
+    migrate_parser.add_argument("--format", choices=["json", "compact", "gzip", "zstd"], default=None)
+    migrate_parser.add_argument("--blob-chars", type=int, default=None,
+                                help="Store node values at least this long out of line (0 keeps them inline)")
+    args = parser.parse_args()
+    
+    if args.command == "migrate":
+        result = migrate_flows(args.format, args.blob_chars)
+        print(json.dumps(result, indent=2))
@@ -0,0 +1,361 @@
+"""
+Process supervision for node executions.
+
+Tracks the subprocesses each execution starts (ffmpeg, whisper and anything
+else launched through the subprocess module), kills whole process trees, and
+runs a watchdog thread that meters each execution's resource use and stops
+executions exceeding their wall-clock, CPU-time or memory limit.
+"""
+import ctypes
+import os
+import resource
+import signal
+import subprocess
+import threading
+import time
+from typing import Dict, Any, Optional, Callable, List
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def _child_pids(pid: int) -> List[int]:
+    """Direct children of a process"""
+    children = []
+    task_dir = f"/proc/{pid}/task"
+    if os.path.isdir(task_dir):
+        try:
+            for tid in os.listdir(task_dir):
+                try:
+                    with open(f"{task_dir}/{tid}/children") as f:
+                        children.extend(int(child) for child in f.read().split())
+                except OSError:
+                    continue
+            return children
+        except OSError:
+            return children
+    # No procfs (macOS): ask ps
+    try:
+        output = subprocess.run(
+            ["ps", "-A", "-o", "pid=,ppid="], capture_output=True, text=True, timeout=5
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return children
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[1] == str(pid):
+            children.append(int(parts[0]))
+    return children
+
+def descendant_pids(pid: int) -> List[int]:
+    """All descendants of a process, parents before children"""
+    found = []
+    pending = [pid]
+    while pending:
+        for child in _child_pids(pending.pop()):
+            if child not in found:
+                found.append(child)
+                pending.append(child)
+    return found
+
+def kill_process_tree(pid: int, include_root: bool = True, sig: int = signal.SIGKILL) -> int:
+    """
+    Kill a process and everything it started
+
+    The tree is collected first and the parent killed before its children,
+    so nothing gets a chance to spawn replacements.
+
+    Returns:
+        Number of processes signalled
+    """
+    targets = ([pid] if include_root else []) + descendant_pids(pid)
+    killed = 0
+    for target in targets:
+        try:
+            os.kill(target, sig)
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            pass
+    return killed
+
+def kill_process_group(pgid: int, sig: int = signal.SIGKILL):
+    """Signal a whole process group, ignoring groups that are already gone"""
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def interrupt_thread(thread_id: int, exception: type) -> bool:
+    """
+    Raise exception in another thread of this process
+
+    The exception is raised at the thread's next Python instruction, so this
+    stops pure-Python loops but not a thread blocked inside a C call until
+    that call returns.
+
+    Returns:
+        Whether a thread with that id was found
+    """
+    found = ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), ctypes.py_object(exception))
+    if found > 1:
+        # More than one thread state matched; undo rather than interrupt the wrong one
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), None)
+        return False
+    return found == 1
+
+def _process_cpu_seconds(pid: int) -> float:
+    """CPU time of a live process and its reaped children, 0 if unavailable"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Fields after the parenthesised command name; utime, stime, cutime, cstime are 14-17
+            fields = f.read().rsplit(")", 1)[1].split()
+        return sum(int(value) for value in fields[11:15]) / _CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+def _process_rss_bytes(pid: int) -> int:
+    """Current resident set size of a process, 0 if unavailable"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        if pid == os.getpid():
+            # No procfs: fall back to the peak, reported in bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if os.uname().sysname == "Darwin" else peak * 1024
+        return 0
+
+def _io_bytes(path: str) -> tuple:
+    """(bytes read, bytes written) through read/write calls, from a /proc io file"""
+    try:
+        with open(path) as f:
+            fields = dict(line.split(": ", 1) for line in f.read().splitlines() if ": " in line)
+        return int(fields.get("rchar", 0)), int(fields.get("wchar", 0))
+    except (OSError, ValueError):
+        return 0, 0
+
+# Subprocesses started by each execution in this process
+_children: Dict[str, List[subprocess.Popen]] = {}
+_child_counts: Dict[str, int] = {}
+_child_limits: Dict[str, Dict[str, Any]] = {}
+_children_lock = threading.Lock()
+_tracking_installed = False
+
+def set_child_limits(execution_id: str, memory_mb: Optional[float] = None, cpu_seconds: Optional[float] = None):
+    """Apply address-space and CPU rlimits to every process an execution starts"""
+    with _children_lock:
+        if memory_mb or cpu_seconds:
+            _child_limits[execution_id] = {"memory_mb": memory_mb, "cpu_seconds": cpu_seconds}
+
+def _apply_child_limits(pid: int, limits: Dict[str, Any]):
+    if not hasattr(resource, "prlimit"):
+        return
+    try:
+        if limits.get("memory_mb"):
+            size = int(limits["memory_mb"] * 1024 * 1024)
+            resource.prlimit(pid, resource.RLIMIT_AS, (size, size))
+        if limits.get("cpu_seconds"):
+            seconds = max(1, int(limits["cpu_seconds"]))
+            resource.prlimit(pid, resource.RLIMIT_CPU, (seconds, seconds))
+    except (OSError, ValueError):
+        # The process already exited
+        pass
+
+def track_child(execution_id: str, process: subprocess.Popen):
+    with _children_lock:
+        live = [p for p in _children.get(execution_id, []) if p.poll() is None]
+        live.append(process)
+        _children[execution_id] = live
+        _child_counts[execution_id] = _child_counts.get(execution_id, 0) + 1
+        limits = _child_limits.get(execution_id)
+    if limits is not None:
+        _apply_child_limits(process.pid, limits)
+
+def get_children(execution_id: str) -> List[subprocess.Popen]:
+    """Subprocesses an execution started that are still running"""
+    with _children_lock:
+        return [p for p in _children.get(execution_id, []) if p.poll() is None]
+
+def forget_children(execution_id: str):
+    with _children_lock:
+        _children.pop(execution_id, None)
+        _child_counts.pop(execution_id, None)
+        _child_limits.pop(execution_id, None)
+
+def kill_children(execution_id: str) -> int:
+    """Kill every process tree an execution started and return how many processes were signalled"""
+    killed = 0
+    for process in get_children(execution_id):
+        killed += kill_process_tree(process.pid)
+    return killed
+
+def install_subprocess_tracking(current_execution: Callable[[], Optional[str]]):
+    """
+    Make subprocess.Popen (and so run, call, check_output and os.popen)
+    register processes started on an execution thread with that execution
+    """
+    global _tracking_installed
+    if _tracking_installed:
+        return
+    with _children_lock:
+        if _tracking_installed:
+            return
+        base = subprocess.Popen
+
+        class TrackedPopen(base):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                execution_id = current_execution()
+                if execution_id is not None:
+                    track_child(execution_id, self)
+
+        subprocess.Popen = TrackedPopen
+        _tracking_installed = True
+
+class ExecutionWatchdog:
+    """
+    Background thread that meters running executions and checks their limits
+
+    Wall-clock time is measured from when an execution is watched. CPU time
+    and I/O are the executing thread's own plus those of its subprocesses,
+    which are sampled while they run;
+    peak RSS is sampled across this process and the execution's live
+    subprocesses. The memory limit applies to this process's growth since
+    the execution started plus its subprocesses, so concurrent executions
+    sharing a process are not charged for memory already in use.
+    """
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self._watched: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(
+        self,
+        execution_id: str,
+        thread_id: int,
+        timeout: Optional[float],
+        cpu_limit: Optional[float],
+        on_violation: Callable[[str, str, str], None],
+        memory_limit_mb: Optional[float] = None,
+        native_thread_id: Optional[int] = None
+    ):
+        """Start metering an execution; on_violation(execution_id, reason, message) is called once"""
+        clock_id = None
+        if hasattr(time, "pthread_getcpuclockid"):
+            try:
+                clock_id = time.pthread_getcpuclockid(thread_id)
+            except OSError:
+                clock_id = None
+        io_path = f"/proc/self/task/{native_thread_id}/io" if native_thread_id else None
+        entry = {
+            "started_at": time.time(),
+            "deadline": time.time() + timeout if timeout else None,
+            "timeout": timeout,
+            "cpu_limit": cpu_limit,
+            "memory_limit": memory_limit_mb * 1024 * 1024 if memory_limit_mb else None,
+            "clock_id": clock_id,
+            "cpu_start": time.clock_gettime(clock_id) if clock_id is not None else 0.0,
+            "thread_cpu": 0.0,
+            "io_path": io_path,
+            "io_start": _io_bytes(io_path) if io_path else (0, 0),
+            "thread_io": (0, 0),
+            "rss_start": _process_rss_bytes(os.getpid()),
+            "peak_rss": 0,
+            "peak_growth": 0,
+            "child_cpu": {},
+            "child_io": {},
+            "on_violation": on_violation,
+            "violated": False
+        }
+        self._sample(execution_id, entry)
+        with self._lock:
+            self._watched[execution_id] = entry
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="smart-folder-watchdog", daemon=True)
+                self._thread.start()
+
+    def unwatch(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Stop metering an execution
+
+        Returns:
+            Resource usage: wall and CPU seconds, peak RSS, bytes read and
+            written, and the number of child processes started
+        """
+        with self._lock:
+            entry = self._watched.pop(execution_id, None)
+        if entry is None:
+            return None
+        self._sample(execution_id, entry)
+        return self._usage(execution_id, entry)
+
+    def usage(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        """Resource usage so far of a running execution"""
+        with self._lock:
+            entry = self._watched.get(execution_id)
+        return self._usage(execution_id, entry) if entry is not None else None
+
+    @staticmethod
+    def _sample(execution_id: str, entry: Dict[str, Any]):
+        # Must run on the watchdog or executing thread while the execution is alive
+        if entry["clock_id"] is not None:
+            try:
+                entry["thread_cpu"] = time.clock_gettime(entry["clock_id"]) - entry["cpu_start"]
+            except OSError:
+                # The thread has exited, keep the last reading
+                pass
+        if entry["io_path"]:
+            read, written = _io_bytes(entry["io_path"])
+            if read or written:
+                entry["thread_io"] = (read - entry["io_start"][0], written - entry["io_start"][1])
+        own_rss = _process_rss_bytes(os.getpid())
+        child_rss = 0
+        for process in get_children(execution_id):
+            child_rss += _process_rss_bytes(process.pid)
+            cpu = _process_cpu_seconds(process.pid)
+            if cpu:
+                entry["child_cpu"][process.pid] = cpu
+            io = _io_bytes(f"/proc/{process.pid}/io")
+            if io != (0, 0):
+                entry["child_io"][process.pid] = io
+        entry["peak_rss"] = max(entry["peak_rss"], own_rss + child_rss)
+        entry["peak_growth"] = max(entry["peak_growth"], own_rss - entry["rss_start"] + child_rss)
+
+    @staticmethod
+    def _usage(execution_id: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        with _children_lock:
+            child_count = _child_counts.get(execution_id, 0)
+        return {
+            "wall_seconds": round(time.time() - entry["started_at"], 3),
+            "cpu_seconds": round(entry["thread_cpu"] + sum(entry["child_cpu"].values()), 3),
+            "peak_rss_bytes": entry["peak_rss"],
+            "read_bytes": entry["thread_io"][0] + sum(io[0] for io in entry["child_io"].values()),
+            "write_bytes": entry["thread_io"][1] + sum(io[1] for io in entry["child_io"].values()),
+            "child_processes": child_count
+        }
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.time()
+            with self._lock:
+                watched = list(self._watched.items())
+            for execution_id, entry in watched:
+                self._sample(execution_id, entry)
+                if entry["violated"]:
+                    continue
+                violation = None
+                if entry["deadline"] is not None and now > entry["deadline"]:
+                    violation = ("timeout", f"Execution exceeded its {entry['timeout']:g}s timeout")
+                elif entry["cpu_limit"] and entry["thread_cpu"] + sum(entry["child_cpu"].values()) > entry["cpu_limit"]:
+                    violation = ("cpu_limit", f"Execution exceeded its {entry['cpu_limit']:g}s CPU time limit")
+                elif entry["memory_limit"] and entry["peak_growth"] > entry["memory_limit"]:
+                    violation = ("memory_limit", f"Execution exceeded its {entry['memory_limit'] / (1024 * 1024):g} MB memory limit")
+                if violation is None:
+                    continue
+                entry["violated"] = True
+                try:
+                    entry["on_violation"](execution_id, *violation)
+                except Exception:
+                    pass
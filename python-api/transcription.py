@@ -0,0 +1,276 @@
+"""
+Chunked, parallel Whisper transcription for long recordings.
+
+A single model.transcribe() call decodes an hour of audio one 30 second
+window after another on one core. transcribe_chunked() instead cuts the
+audio into chunks, preferring quiet points near each chunk boundary so words
+aren't split, and transcribes the chunks in parallel on a pool of processes
+that each keep their own copy of the model. Segment timestamps are shifted
+back onto the recording's timeline and partial transcripts are reported as
+chunks finish.
+
+Each pool process loads the model once. A pool belongs to one execution
+while it transcribes, so cancelling an execution kills only its own
+processes; afterwards the pool is kept idle for the next execution with the
+same model size (up to SMART_FOLDER_TRANSCRIBE_IDLE_POOLS of them).
+Concurrent executions each get a pool of their own.
+
+Memory use is one model per pool process, loaded outside the model
+registry's SMART_FOLDER_MODEL_MEMORY_MB budget; get_transcription_pool_stats()
+reports the estimate.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional, Callable, List, Tuple
+
+SAMPLE_RATE = 16000
+
+# Processes transcribing chunks in parallel per model size
+TRANSCRIBE_WORKERS = int(os.getenv("SMART_FOLDER_TRANSCRIBE_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+
+# Target chunk length in seconds
+TRANSCRIBE_CHUNK_SECONDS = float(os.getenv("SMART_FOLDER_TRANSCRIBE_CHUNK_SECONDS", "120"))
+
+# Seconds around a chunk boundary searched for the quietest point
+SILENCE_SEARCH_SECONDS = 5.0
+
+# Frame length in seconds for the energy used to find quiet points
+_FRAME_SECONDS = 0.05
+
+# Idle process pools kept for reuse per model size and worker count
+TRANSCRIBE_IDLE_POOLS = int(os.getenv("SMART_FOLDER_TRANSCRIBE_IDLE_POOLS", "1"))
+
+# Idle pools by (model size, workers), and pools in use by an execution
+_idle_pools: Dict[Tuple[str, int], List[ProcessPoolExecutor]] = {}
+_busy_pools: Dict[ProcessPoolExecutor, Tuple[str, int]] = {}
+_pools_lock = threading.Lock()
+
+# Model loaded by a pool process
+_worker_model = None
+
+def _init_worker(model_size: str, torch_threads: int):
+    """Pool process initializer: load the model once for every chunk it handles"""
+    global _worker_model
+    import torch
+    import whisper
+    torch.set_num_threads(torch_threads)
+    _worker_model = whisper.load_model(model_size)
+
+def _transcribe_chunk(audio, options: Dict[str, Any]) -> Dict[str, Any]:
+    result = _worker_model.transcribe(audio, **options)
+    return {
+        "text": result["text"].strip(),
+        "language": result.get("language"),
+        "segments": [
+            {"start": segment["start"], "end": segment["end"], "text": segment["text"].strip()}
+            for segment in result.get("segments", [])
+        ]
+    }
+
+def _detect_language(audio) -> str:
+    import whisper
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), _worker_model.dims.n_mels)
+    _, probs = _worker_model.detect_language(mel.to(_worker_model.device))
+    return max(probs, key=probs.get)
+
+def _checkout_pool(model_size: str, workers: int) -> ProcessPoolExecutor:
+    """Take an idle pool for this model size and worker count, or start one"""
+    key = (model_size, workers)
+    with _pools_lock:
+        idle = _idle_pools.get(key)
+        pool = idle.pop() if idle else None
+        if pool is None:
+            # Split the cores between the pool processes instead of each using all of them
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_size, torch_threads)
+            )
+        _busy_pools[pool] = key
+        return pool
+
+def _return_pool(pool: ProcessPoolExecutor):
+    """Keep a pool for the next execution, or shut it down if enough are idle"""
+    with _pools_lock:
+        key = _busy_pools.pop(pool, None)
+        idle = _idle_pools.setdefault(key, []) if key is not None else None
+        if idle is not None and len(idle) < TRANSCRIBE_IDLE_POOLS:
+            idle.append(pool)
+            return
+    pool.shutdown(wait=False)
+
+def _kill_pool(pool: ProcessPoolExecutor):
+    """Kill an execution's pool processes, abandoning the chunks they are decoding"""
+    with _pools_lock:
+        _busy_pools.pop(pool, None)
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_transcription_pools():
+    """Stop every transcription pool process"""
+    with _pools_lock:
+        pools = [pool for idle in _idle_pools.values() for pool in idle] + list(_busy_pools)
+        _idle_pools.clear()
+        _busy_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def get_transcription_pool_stats() -> Dict[str, Any]:
+    """Pools and the model copies their processes hold, with an estimate of their memory"""
+    from model_registry import WHISPER_SIZES_MB
+    with _pools_lock:
+        pools = [
+            {"model_size": key[0], "workers": key[1], "state": "idle"}
+            for key, idle in _idle_pools.items() for _ in idle
+        ] + [
+            {"model_size": key[0], "workers": key[1], "state": "busy"}
+            for key in _busy_pools.values()
+        ]
+    return {
+        "pools": pools,
+        "processes": sum(pool["workers"] for pool in pools),
+        "estimated_model_bytes": sum(
+            pool["workers"] * WHISPER_SIZES_MB.get(pool["model_size"], 0) * 1024 * 1024 for pool in pools
+        ),
+        "idle_pools_kept": TRANSCRIBE_IDLE_POOLS
+    }
+
+def split_audio(audio, chunk_seconds: float, split: str = "silence") -> List[Tuple[int, int]]:
+    """
+    Choose chunk boundaries as (start, end) sample offsets
+
+    With split="silence" each boundary moves to the quietest frame within
+    SILENCE_SEARCH_SECONDS of the fixed window edge.
+    """
+    import numpy as np
+    total = len(audio)
+    window = max(1, int(chunk_seconds * SAMPLE_RATE))
+    if total <= window:
+        return [(0, total)]
+
+    energy = None
+    frame = int(_FRAME_SECONDS * SAMPLE_RATE)
+    if split == "silence":
+        frames = total // frame
+        energy = np.sqrt(np.mean(np.square(audio[:frames * frame].reshape(frames, frame)), axis=1))
+
+    bounds = []
+    start = 0
+    search = int(SILENCE_SEARCH_SECONDS * SAMPLE_RATE)
+    while total - start > window:
+        cut = start + window
+        if energy is not None:
+            low = max(start + window // 2, cut - search) // frame
+            high = min(total, cut + search) // frame
+            if high > low:
+                cut = (low + int(np.argmin(energy[low:high]))) * frame
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, total))
+    return bounds
+
+def _format_time(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+def transcribe_chunked(
+    audio_path: str,
+    model_size: str = "base",
+    chunk_seconds: float = TRANSCRIBE_CHUNK_SECONDS,
+    workers: int = TRANSCRIBE_WORKERS,
+    split: str = "silence",
+    language: Optional[str] = None,
+    temperature: float = 0.0,
+    on_chunk: Optional[Callable[[str], None]] = None,
+    should_stop: Optional[Callable[[], None]] = None
+) -> Dict[str, Any]:
+    """
+    Transcribe a recording in parallel chunks
+
+    Args:
+        audio_path: Audio or video file readable by ffmpeg
+        model_size: Whisper model name
+        chunk_seconds: Target chunk length
+        workers: Processes transcribing in parallel
+        split: "silence" to cut at quiet points, "fixed" for exact windows
+        language: Spoken language, detected once from the first chunk if omitted
+        temperature: Decoding temperature
+        on_chunk: Called with a partial transcript line as each chunk finishes
+        should_stop: Called between chunks; raising from it cancels the rest
+
+    Returns:
+        text, segments (with timestamps on the recording's timeline),
+        language, chunks and processing_time
+    """
+    import whisper
+    started = time.time()
+    audio = whisper.load_audio(audio_path)
+    bounds = split_audio(audio, chunk_seconds, split)
+    workers = max(1, min(workers, len(bounds)))
+    options = {"temperature": float(temperature), "verbose": None}
+    pool = _checkout_pool(model_size, workers)
+
+    def submit(index: int):
+        start, end = bounds[index]
+        return pool.submit(_transcribe_chunk, audio[start:end], options)
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(bounds)
+    pending = {}
+    try:
+        if language is None and len(bounds) > 1:
+            # Detect the language once from the opening 30 seconds so every chunk decodes the same way
+            language = pool.submit(_detect_language, audio[:30 * SAMPLE_RATE]).result()
+        if language:
+            options["language"] = language
+        for index in range(len(bounds)):
+            pending[submit(index)] = index
+        while pending:
+            done, _ = wait(list(pending), timeout=1.0, return_when=FIRST_COMPLETED)
+            if should_stop is not None:
+                should_stop()
+            for future in done:
+                index = pending.pop(future)
+                results[index] = future.result()
+                if on_chunk is not None:
+                    start, end = bounds[index]
+                    on_chunk(
+                        f"[{_format_time(start / SAMPLE_RATE)}-{_format_time(end / SAMPLE_RATE)}] "
+                        f"{results[index]['text']}"
+                    )
+    except BaseException as e:
+        for future in pending:
+            future.cancel()
+        if isinstance(e, BrokenProcessPool) or any(future.running() for future in pending):
+            # Chunks already being decoded can't be cancelled; the pool is only
+            # this execution's, so killing it stops them without affecting others
+            _kill_pool(pool)
+        else:
+            _return_pool(pool)
+        raise
+    _return_pool(pool)
+
+    segments = []
+    for (start, _), result in zip(bounds, results):
+        offset = start / SAMPLE_RATE
+        for segment in result["segments"]:
+            segments.append({
+                "start": round(segment["start"] + offset, 3),
+                "end": round(segment["end"] + offset, 3),
+                "text": segment["text"]
+            })
+    return {
+        "text": " ".join(result["text"] for result in results if result["text"]),
+        "segments": segments,
+        "language": language or results[0]["language"],
+        "chunks": len(bounds),
+        "duration": round(len(audio) / SAMPLE_RATE, 3),
+        "processing_time": round(time.time() - started, 3)
+    }
@@ -0,0 +1,509 @@
+"""
+Streaming file uploads and resumable chunked upload sessions.
+
+Multipart uploads are parsed straight from the request stream rather than
+through UploadFile, which spools the whole body to a temp file before the
+endpoint runs. When the form fields precede the file part, the file is
+written once, in fixed-size chunks, to a hidden .part file next to its
+destination that is renamed into place once complete, so partial uploads
+never show up in listings. The size limit is enforced as bytes arrive and a
+checksum can be computed on the way through. Memory per upload stays
+constant however large the file.
+
+Resumable sessions let clients send a large file as a series of chunks and
+pick up after a dropped connection: create a session, PUT chunks at the
+offset the server reports, then complete it. Session metadata lives in the
+temp dir so sessions survive an API restart; sessions idle for longer than
+SMART_FOLDER_UPLOAD_SESSION_TTL are discarded along with their data.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, Any, Optional, AsyncIterator, Callable, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    # python-multipart before 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Bytes read from the request and written to disk at a time
+UPLOAD_CHUNK_SIZE = int(os.getenv("SMART_FOLDER_UPLOAD_CHUNK_KB", "1024")) * 1024
+
+# Seconds an idle upload session is kept before its data is discarded
+UPLOAD_SESSION_TTL = float(os.getenv("SMART_FOLDER_UPLOAD_SESSION_TTL", "86400"))
+
+# Where upload session metadata is kept
+UPLOAD_SESSIONS_DIR = os.path.join(tempfile.gettempdir(), "smart_folder_uploads")
+
+CHECKSUM_ALGORITHMS = ("md5", "sha1", "sha256")
+
+# Largest non-file form field accepted in a multipart upload
+MAX_FORM_FIELD_BYTES = 64 * 1024
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds its size limit"""
+
+class UploadOffsetMismatch(ValueError):
+    """Raised when a chunk doesn't start where the upload left off"""
+
+    def __init__(self, expected: int, received: int):
+        super().__init__(f"Chunk starts at byte {received} but the upload is at byte {expected}")
+        self.expected = expected
+
+def new_hasher(algorithm: Optional[str]):
+    if not algorithm:
+        return None
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError(f"Unsupported checksum '{algorithm}'. Expected one of: {', '.join(CHECKSUM_ALGORITHMS)}")
+    return hashlib.new(algorithm)
+
+def unique_path(directory: str, filename: str, overwrite: bool = False) -> str:
+    """Destination for filename in directory, numbered name_1.ext, name_2.ext... unless overwriting"""
+    path = os.path.join(directory, filename)
+    if overwrite:
+        return path
+    name, ext = os.path.splitext(filename)
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{name}_{counter}{ext}")
+        counter += 1
+    return path
+
+def _part_path(path: str, upload_id: str) -> str:
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{upload_id}.part")
+
+class _ChunkWriter:
+    """Buffers incoming bytes into full chunks for an open file, enforcing max_bytes"""
+
+    def __init__(self, handle, written: int = 0, max_bytes: Optional[int] = None, hasher=None):
+        self.handle = handle
+        self.written = written
+        self.max_bytes = max_bytes
+        self.hasher = hasher
+        self._buffer = bytearray()
+
+    async def write(self, chunk: bytes):
+        self.written += len(chunk)
+        if self.max_bytes is not None and self.written > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the maximum allowed size of {self.max_bytes} bytes")
+        if self.hasher is not None:
+            self.hasher.update(chunk)
+        self._buffer += chunk
+        # Request bodies arrive in small pieces; write them out in full chunks
+        if len(self._buffer) >= UPLOAD_CHUNK_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        if self._buffer:
+            await run_in_threadpool(self.handle.write, bytes(self._buffer))
+            self._buffer.clear()
+
+async def write_chunks(
+    chunks: AsyncIterator[bytes],
+    handle,
+    written: int = 0,
+    max_bytes: Optional[int] = None,
+    hasher=None
+) -> int:
+    """Append chunks to an open file, enforcing max_bytes as they arrive; returns the new size"""
+    writer = _ChunkWriter(handle, written, max_bytes, hasher)
+    async for chunk in chunks:
+        if chunk:
+            await writer.write(chunk)
+    await writer.flush()
+    return writer.written
+
+def _hash_file(path: str, algorithm: str) -> str:
+    hasher = new_hasher(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def _multipart_parser(content_type: str, events: list) -> MultipartParser:
+    """Parser appending ("start", name, filename, content_type), ("data", bytes) and ("end",) to events"""
+    kind, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if kind != b"multipart/form-data" or not boundary:
+        raise ValueError("Expected a multipart/form-data request body")
+    part = {"headers": {}, "field": b"", "value": b""}
+
+    def on_part_begin():
+        part["headers"] = {}
+
+    def on_header_field(data: bytes, start: int, end: int):
+        part["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"] = part["value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        filename = disposition.get(b"filename")
+        events.append((
+            "start",
+            disposition.get(b"name", b"").decode("utf-8", "replace"),
+            filename.decode("utf-8", "replace") if filename is not None else None,
+            part["headers"].get(b"content-type", b"").decode("latin-1") or None
+        ))
+
+    def on_part_data(data: bytes, start: int, end: int):
+        events.append(("data", data[start:end]))
+
+    def on_part_end():
+        events.append(("end",))
+
+    return MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end
+    })
+
+# Returns (destination path, size limit), or None while fields it needs haven't arrived yet
+UploadResolver = Callable[[Dict[str, str], Optional[str], Optional[str], bool], Optional[Tuple[str, Optional[int]]]]
+
+async def save_multipart_upload(
+    request,
+    file_field: str,
+    resolve: UploadResolver,
+    checksum_field: str = "checksum"
+) -> Dict[str, Any]:
+    """
+    Stream the file part of a multipart/form-data request to disk as it arrives
+
+    resolve(fields, filename, content_type, complete) picks the destination
+    and size limit for the file from the form fields. It is called when the
+    file part starts with the fields received so far; if it returns None the
+    file is spooled to the temp dir and resolve is called again with
+    complete=True once the whole body is in (it must then return or raise).
+    Clients should send the fields first so the file is written once,
+    straight to its destination, with the size limit applied as bytes arrive.
+
+    Returns:
+        fields, filename, content_type, path, size and checksum (None
+        unless the checksum_field form field names an algorithm)
+
+    Raises:
+        UploadTooLarge: the file exceeds the size limit
+        ValueError: the body isn't multipart or the file part is missing
+    """
+    events: list = []
+    parser = _multipart_parser(request.headers.get("content-type", ""), events)
+    fields: Dict[str, str] = {}
+    upload: Optional[Dict[str, Any]] = None
+    # Name of the form field being received, or None inside the file part
+    field_name: Optional[str] = None
+    field_value = bytearray()
+    in_file = False
+
+    def start_file(filename: str, content_type: Optional[str]) -> Dict[str, Any]:
+        target = resolve(fields, filename, content_type, False)
+        if target is not None:
+            path, max_bytes = target
+            part = _part_path(path, uuid.uuid4().hex[:12])
+        else:
+            path, max_bytes = None, None
+            part = os.path.join(tempfile.gettempdir(), f".smart_folder_upload.{uuid.uuid4().hex}.part")
+        hasher = new_hasher(fields.get(checksum_field) or None)
+        handle = open(part, "wb")
+        return {
+            "filename": filename,
+            "content_type": content_type,
+            "path": path,
+            "part": part,
+            "handle": handle,
+            "writer": _ChunkWriter(handle, max_bytes=max_bytes, hasher=hasher)
+        }
+
+    async def handle_events():
+        nonlocal upload, field_name, in_file
+        for event in events:
+            if event[0] == "start":
+                _, name, filename, content_type = event
+                in_file = name == file_field and filename is not None and upload is None
+                if in_file:
+                    upload = start_file(filename, content_type)
+                field_name = None if in_file else name
+            elif event[0] == "data":
+                if in_file:
+                    await upload["writer"].write(event[1])
+                else:
+                    field_value.extend(event[1])
+                    if len(field_value) > MAX_FORM_FIELD_BYTES:
+                        raise ValueError(f"Form field '{field_name}' is too large")
+            elif in_file:
+                await upload["writer"].flush()
+                upload["handle"].close()
+                in_file = False
+            else:
+                fields[field_name] = field_value.decode("utf-8", "replace")
+                field_value.clear()
+        events.clear()
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await handle_events()
+        parser.finalize()
+        await handle_events()
+        if upload is None:
+            raise ValueError(f"Missing file field '{file_field}'")
+
+        size = upload["writer"].written
+        hasher = upload["writer"].hasher
+        checksum = hasher.hexdigest() if hasher is not None else None
+        if upload["path"] is None:
+            # The file came before the fields saying where it goes
+            upload["path"], max_bytes = resolve(fields, upload["filename"], upload["content_type"], True)
+            if max_bytes is not None and size > max_bytes:
+                raise UploadTooLarge(f"File size {size} bytes exceeds maximum allowed size of {max_bytes} bytes")
+        if hasher is None and fields.get(checksum_field):
+            # The checksum was asked for after the file; hash what was written
+            checksum = await run_in_threadpool(_hash_file, upload["part"], fields[checksum_field])
+        await run_in_threadpool(shutil.move, upload["part"], upload["path"])
+    except BaseException:
+        if upload is not None:
+            upload["handle"].close()
+            if os.path.exists(upload["part"]):
+                os.remove(upload["part"])
+        raise
+    return {
+        "fields": fields,
+        "filename": os.path.basename(upload["path"]),
+        "content_type": upload["content_type"],
+        "path": upload["path"],
+        "size": size,
+        "checksum": checksum
+    }
+
+class UploadSessions:
+    """Resumable uploads tracked by id, with metadata kept in the temp dir"""
+
+    def __init__(self, sessions_dir: str = UPLOAD_SESSIONS_DIR, ttl: float = UPLOAD_SESSION_TTL):
+        self.sessions_dir = sessions_dir
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._session_locks: Dict[str, threading.Lock] = {}
+        # Running checksums by upload id, valid while they cover the whole part file
+        self._hashers: Dict[str, Any] = {}
+        self._stats = {"created": 0, "completed": 0, "aborted": 0, "expired": 0, "bytes_received": 0}
+
+    def _meta_path(self, upload_id: str) -> str:
+        if not upload_id.isalnum():
+            raise KeyError(upload_id)
+        return os.path.join(self.sessions_dir, f"{upload_id}.json")
+
+    def _save(self, session: Dict[str, Any]):
+        path = self._meta_path(session["upload_id"])
+        with open(path + ".tmp", "w") as f:
+            json.dump(session, f)
+        os.replace(path + ".tmp", path)
+
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        """Session metadata with the current offset; raises KeyError if unknown"""
+        try:
+            with open(self._meta_path(upload_id)) as f:
+                session = json.load(f)
+        except (FileNotFoundError, ValueError):
+            raise KeyError(upload_id)
+        try:
+            session["offset"] = os.path.getsize(session["part_path"])
+        except OSError:
+            session["offset"] = 0
+        return session
+
+    def _session_lock(self, upload_id: str) -> threading.Lock:
+        with self._lock:
+            return self._session_locks.setdefault(upload_id, threading.Lock())
+
+    def create(
+        self,
+        directory: str,
+        filename: str,
+        size: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        checksum: Optional[str] = None,
+        overwrite: bool = False
+    ) -> Dict[str, Any]:
+        """Start a resumable upload of filename into directory"""
+        new_hasher(checksum)
+        if size is not None and max_bytes is not None and size > max_bytes:
+            raise UploadTooLarge(f"File size {size} bytes exceeds maximum allowed size of {max_bytes} bytes")
+        self.reap()
+        os.makedirs(directory, exist_ok=True)
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        filename = os.path.basename(filename) or f"file_{int(time.time())}"
+        path = os.path.join(directory, filename)
+        session = {
+            "upload_id": upload_id,
+            "directory": directory,
+            "filename": filename,
+            "path": path,
+            "part_path": _part_path(path, upload_id),
+            "size": size,
+            "max_bytes": max_bytes,
+            "checksum": checksum,
+            "overwrite": overwrite,
+            "created_at": time.time(),
+            "updated_at": time.time()
+        }
+        open(session["part_path"], "wb").close()
+        self._save(session)
+        self._hashers[upload_id] = (new_hasher(checksum), 0)
+        self._stats["created"] += 1
+        session["offset"] = 0
+        return session
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """
+        Append a chunk's bytes at offset, which must be the current end of the upload
+
+        A chunk running past the declared size or the size limit is rejected
+        as soon as it does and discarded; earlier chunks are kept. If the
+        connection drops mid-chunk, the bytes that arrived are kept and the
+        client resumes from the offset reported by get().
+        """
+        lock = self._session_lock(upload_id)
+        if not lock.acquire(blocking=False):
+            raise UploadOffsetMismatch(self.get(upload_id)["offset"], offset)
+        try:
+            session = self.get(upload_id)
+            if offset != session["offset"]:
+                raise UploadOffsetMismatch(session["offset"], offset)
+            limit = min(
+                (value for value in (session["size"], session["max_bytes"]) if value is not None),
+                default=None
+            )
+            # The running checksum is only put back once the chunk is written,
+            # so a rejected or interrupted chunk can't leave its bytes in it;
+            # without one (after a restart or a failed chunk) the checksum is
+            # recomputed from the part file on completion
+            hasher, hashed = self._hashers.pop(upload_id, (None, 0))
+            if hashed != offset:
+                hasher = None
+            with open(session["part_path"], "ab") as handle:
+                try:
+                    written = await write_chunks(chunks, handle, offset, limit, hasher)
+                except UploadTooLarge:
+                    handle.truncate(offset)
+                    raise
+            self._stats["bytes_received"] += written - offset
+            if hasher is not None:
+                self._hashers[upload_id] = (hasher, written)
+            session["updated_at"] = time.time()
+            session.pop("offset")
+            self._save(session)
+            session["offset"] = written
+            return session
+        finally:
+            lock.release()
+
+    def complete(self, upload_id: str) -> Dict[str, Any]:
+        """Move a finished upload into place and return its path, size and checksum"""
+        lock = self._session_lock(upload_id)
+        with lock:
+            session = self.get(upload_id)
+            if session["size"] is not None and session["offset"] != session["size"]:
+                raise ValueError(f"Upload incomplete: {session['offset']} of {session['size']} bytes received")
+            digest = None
+            if session["checksum"]:
+                hasher, hashed = self._hashers.get(upload_id, (None, 0))
+                if hasher is None or hashed != session["offset"]:
+                    hasher = new_hasher(session["checksum"])
+                    with open(session["part_path"], "rb") as f:
+                        for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+                            hasher.update(block)
+                digest = hasher.hexdigest()
+            path = unique_path(session["directory"], session["filename"], session["overwrite"])
+            os.replace(session["part_path"], path)
+            self._forget(upload_id)
+            self._stats["completed"] += 1
+        return {
+            "path": os.path.abspath(path),
+            "filename": os.path.basename(path),
+            "size": session["offset"],
+            "checksum": digest
+        }
+
+    def _discard(self, upload_id: str) -> bool:
+        try:
+            session = self.get(upload_id)
+        except KeyError:
+            return False
+        with self._session_lock(upload_id):
+            if os.path.exists(session["part_path"]):
+                os.remove(session["part_path"])
+            self._forget(upload_id)
+        return True
+
+    def abort(self, upload_id: str) -> bool:
+        """Cancel an upload and delete the data received so far"""
+        if not self._discard(upload_id):
+            return False
+        self._stats["aborted"] += 1
+        return True
+
+    def _forget(self, upload_id: str):
+        try:
+            os.remove(self._meta_path(upload_id))
+        except FileNotFoundError:
+            pass
+        self._hashers.pop(upload_id, None)
+        with self._lock:
+            self._session_locks.pop(upload_id, None)
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """Discard sessions idle for longer than the TTL"""
+        now = now or time.time()
+        expired = 0
+        try:
+            names = os.listdir(self.sessions_dir)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            upload_id = name[:-5]
+            try:
+                session = self.get(upload_id)
+            except KeyError:
+                continue
+            if now - session["updated_at"] > self.ttl and self._discard(upload_id):
+                expired += 1
+        self._stats["expired"] += expired
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            active = sum(1 for name in os.listdir(self.sessions_dir) if name.endswith(".json"))
+        except FileNotFoundError:
+            active = 0
+        return {
+            "active": active,
+            "chunk_size": UPLOAD_CHUNK_SIZE,
+            "ttl_seconds": self.ttl,
+            **self._stats
+        }
+
+# Process-wide upload sessions
+_sessions = UploadSessions()
+
+def get_upload_sessions() -> UploadSessions:
+    return _sessions
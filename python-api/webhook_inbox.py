@@ -0,0 +1,182 @@
+"""
+Bounded history of payloads received by webhook inboxes.
+
+Each inbox keeps a ring buffer of its most recent payloads in arrival order,
+so recent traffic can be inspected or replayed by time range without the
+sender resending it. Memory stays flat regardless of how many inbox names
+appear: entries expire after a TTL, each inbox holds at most a fixed number
+of entries, and the total payload size and number of inboxes are capped,
+evicting from the least recently active inbox first.
+"""
+import collections
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, Optional, List
+
+# Payloads remembered per inbox
+INBOX_HISTORY_SIZE = int(os.getenv("SMART_FOLDER_INBOX_HISTORY", "100"))
+
+# Total bytes of payload JSON kept across all inboxes
+INBOX_MAX_BYTES = int(os.getenv("SMART_FOLDER_INBOX_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Distinct inboxes tracked at once
+INBOX_MAX_INBOXES = int(os.getenv("SMART_FOLDER_INBOX_MAX_INBOXES", "1000"))
+
+# Seconds a payload is kept
+INBOX_TTL = float(os.getenv("SMART_FOLDER_INBOX_TTL", "86400"))
+
+# Inbox name -> deque of entries, least recently active inbox first
+_inboxes = collections.OrderedDict()
+_lock = threading.Lock()
+_size = 0
+_stats = {"recorded": 0, "evicted": 0, "expired": 0}
+
+def _drop_oldest_locked(inbox_name: str, counter: str):
+    global _size
+    entries = _inboxes[inbox_name]
+    entry = entries.popleft()
+    _size -= entry["size"]
+    _stats[counter] += 1
+    if not entries:
+        del _inboxes[inbox_name]
+
+def _expire_locked(now: float):
+    if INBOX_TTL <= 0:
+        return
+    cutoff = now - INBOX_TTL
+    for inbox_name in list(_inboxes):
+        entries = _inboxes[inbox_name]
+        while inbox_name in _inboxes and entries[0]["timestamp"] < cutoff:
+            _drop_oldest_locked(inbox_name, "expired")
+
+def _first_at_or_after(entries, timestamp: float) -> int:
+    """Binary search for the first entry received at or after timestamp"""
+    low, high = 0, len(entries)
+    while low < high:
+        middle = (low + high) // 2
+        if entries[middle]["timestamp"] < timestamp:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def record_payload(inbox_name: str, payload: Dict[str, Any], entry_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Remember a payload received by an inbox
+
+    Args:
+        inbox_name: Inbox the payload was posted to
+        payload: Webhook JSON body
+        entry_id: Identifier for the entry (e.g. the webhook job id)
+
+    Returns:
+        Entry metadata without the payload
+    """
+    global _size
+    now = time.time()
+    size = len(json.dumps(payload, default=str).encode("utf-8"))
+    entry = {
+        "entry_id": entry_id or f"{inbox_name}-{now:.6f}",
+        "timestamp": now,
+        "received_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)),
+        "size": size,
+        "data": payload
+    }
+    with _lock:
+        _expire_locked(now)
+        if size > INBOX_MAX_BYTES:
+            # Too large to keep; report it without storing the payload
+            return {key: value for key, value in entry.items() if key != "data"}
+        entries = _inboxes.get(inbox_name)
+        if entries is None:
+            entries = collections.deque()
+            _inboxes[inbox_name] = entries
+        _inboxes.move_to_end(inbox_name)
+        entries.append(entry)
+        _size += size
+        _stats["recorded"] += 1
+
+        if len(entries) > INBOX_HISTORY_SIZE:
+            _drop_oldest_locked(inbox_name, "evicted")
+        while len(_inboxes) > INBOX_MAX_INBOXES:
+            oldest_inbox = next(iter(_inboxes))
+            while oldest_inbox in _inboxes:
+                _drop_oldest_locked(oldest_inbox, "evicted")
+        while _size > INBOX_MAX_BYTES:
+            _drop_oldest_locked(next(iter(_inboxes)), "evicted")
+    return {key: value for key, value in entry.items() if key != "data"}
+
+def get_history(
+    inbox_name: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: Optional[int] = None,
+    include_data: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Return payloads an inbox received within a time range, oldest first
+
+    Args:
+        inbox_name: Inbox to look up
+        since: Only entries received at or after this Unix timestamp
+        until: Only entries received before this Unix timestamp
+        limit: Keep only the most recent entries of the range
+        include_data: Include the payloads themselves
+    """
+    with _lock:
+        _expire_locked(time.time())
+        entries = _inboxes.get(inbox_name)
+        if not entries:
+            return []
+        start = _first_at_or_after(entries, since) if since is not None else 0
+        end = _first_at_or_after(entries, until) if until is not None else len(entries)
+        selected = [entries[i] for i in range(start, end)]
+    if limit is not None:
+        selected = selected[-limit:] if limit > 0 else []
+    if include_data:
+        return [dict(entry) for entry in selected]
+    return [{key: value for key, value in entry.items() if key != "data"} for entry in selected]
+
+def get_entry(inbox_name: str, entry_id: str) -> Optional[Dict[str, Any]]:
+    """Return one remembered entry of an inbox, including its payload"""
+    with _lock:
+        for entry in _inboxes.get(inbox_name, ()):
+            if entry["entry_id"] == entry_id:
+                return dict(entry)
+    return None
+
+def get_inbox_stats() -> Dict[str, Any]:
+    """Return per-inbox entry counts and overall memory use"""
+    with _lock:
+        _expire_locked(time.time())
+        return {
+            "inboxes": {
+                inbox_name: {
+                    "entries": len(entries),
+                    "bytes": sum(entry["size"] for entry in entries),
+                    "last_received": entries[-1]["timestamp"]
+                }
+                for inbox_name, entries in _inboxes.items()
+            },
+            "total_bytes": _size,
+            "max_bytes": INBOX_MAX_BYTES,
+            "history_per_inbox": INBOX_HISTORY_SIZE,
+            "max_inboxes": INBOX_MAX_INBOXES,
+            "ttl_seconds": INBOX_TTL,
+            **_stats
+        }
+
+def clear_inbox(inbox_name: Optional[str] = None) -> int:
+    """Forget one inbox's history, or every inbox's, returning entries removed"""
+    global _size
+    with _lock:
+        names = [inbox_name] if inbox_name is not None else list(_inboxes)
+        removed = 0
+        for name in names:
+            entries = _inboxes.pop(name, None)
+            if entries:
+                removed += len(entries)
+                _size -= sum(entry["size"] for entry in entries)
+        return removed
@@ -0,0 +1,383 @@
+"""
+Durable queue of incoming webhook deliveries.
+
+Webhook requests are committed to a SQLite table and acknowledged right away;
+a dispatcher thread hands queued deliveries to a small thread pool that runs
+the matching webhook flow. Deliveries to the same inbox start in arrival
+order with at most SMART_FOLDER_WEBHOOK_CONCURRENCY running at once (the
+default of 1 processes each inbox strictly in order), while different inboxes
+proceed independently. Deliveries that were running when the API stopped are
+queued again on the next start.
+
+Inboxes can opt into micro-batching: queued deliveries are then coalesced
+until either the batch size is reached or the oldest one has waited for the
+batch window, and the handler receives all of their payloads as one list.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable, Tuple, Union
+
+from storage import FLOWS_DIR, ensure_flows_directory
+
+# Threads executing webhook flows across all inboxes
+WEBHOOK_WORKERS = int(os.getenv("SMART_FOLDER_WEBHOOK_WORKERS", "4"))
+
+# Deliveries of one inbox running at the same time
+WEBHOOK_INBOX_CONCURRENCY = int(os.getenv("SMART_FOLDER_WEBHOOK_CONCURRENCY", "1"))
+
+# Seconds finished deliveries stay queryable
+WEBHOOK_JOB_RETENTION = float(os.getenv("SMART_FOLDER_WEBHOOK_RETENTION", "86400"))
+
+# Largest micro-batch when an inbox only sets a batch window
+WEBHOOK_MAX_BATCH = int(os.getenv("SMART_FOLDER_WEBHOOK_MAX_BATCH", "1000"))
+
+# Seconds an inbox's batching settings are reused before being looked up again
+BATCH_POLICY_REFRESH = 5.0
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+def combine_payloads(payloads: List[Union[Dict[str, Any], List[Any]]]) -> List[Any]:
+    """Flatten single payloads and batch payloads (lists) into one list"""
+    combined = []
+    for payload in payloads:
+        if isinstance(payload, list):
+            combined.extend(payload)
+        else:
+            combined.append(payload)
+    return combined
+
+class WebhookQueue:
+    """SQLite-backed FIFO of webhook deliveries with per-inbox concurrency limits"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS webhook_jobs (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL UNIQUE,
+            inbox TEXT NOT NULL,
+            dedup_key TEXT,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            enqueued_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            result TEXT,
+            error TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS webhook_jobs_dedup ON webhook_jobs (inbox, dedup_key)
+            WHERE dedup_key IS NOT NULL;
+        CREATE INDEX IF NOT EXISTS webhook_jobs_status ON webhook_jobs (status, inbox, seq);
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, Any], Dict[str, Any]],
+        batch_policy: Optional[Callable[[str], Optional[Tuple[int, float]]]] = None,
+        db_path: Optional[str] = None,
+        workers: int = WEBHOOK_WORKERS,
+        inbox_concurrency: int = WEBHOOK_INBOX_CONCURRENCY,
+        retention: float = WEBHOOK_JOB_RETENTION
+    ):
+        self.handler = handler
+        # Returns (max batch size, window seconds) for inboxes that coalesce deliveries
+        self.batch_policy = batch_policy
+        self._policies: Dict[str, tuple] = {}
+        self.db_path = db_path or os.path.join(FLOWS_DIR, "webhook_queue.db")
+        self.workers = max(1, workers)
+        self.inbox_concurrency = max(1, inbox_concurrency)
+        self.retention = retention
+        self._conn = None
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._running: Dict[str, int] = {}
+        self._in_flight = 0
+        self._next_deadline = None
+        self._closed = False
+        self._threads = None
+        self._dispatcher = None
+
+    def start(self):
+        """Open the queue, requeue interrupted deliveries and start dispatching"""
+        ensure_flows_directory()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Every acknowledged delivery must survive a crash
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(self.SCHEMA)
+        with self._db_lock:
+            self._conn.execute(
+                "UPDATE webhook_jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            )
+        self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="smart-folder-webhook")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="smart-folder-webhook-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop dispatching; running deliveries finish, queued ones wait for the next start"""
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify_all()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout)
+        if self._threads is not None:
+            self._threads.shutdown(wait=False)
+
+    def enqueue(self, inbox: str, payload: Union[Dict[str, Any], List[Any]], dedup_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Durably queue a delivery; a list payload is delivered as a batch
+
+        Returns:
+            The queued job, or the existing job when dedup_key was already used
+            for this inbox (with "duplicate" set)
+        """
+        job_id = uuid.uuid4().hex
+        with self._db_lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO webhook_jobs (job_id, inbox, dedup_key, payload, status, enqueued_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?)",
+                    (job_id, inbox, dedup_key, json.dumps(payload), time.time())
+                )
+            except sqlite3.IntegrityError:
+                row = self._conn.execute(
+                    "SELECT job_id FROM webhook_jobs WHERE inbox = ? AND dedup_key = ?", (inbox, dedup_key)
+                ).fetchone()
+                duplicate_of = row[0]
+            else:
+                duplicate_of = None
+        if duplicate_of is not None:
+            return {**self.get_job(duplicate_of), "duplicate": True}
+        with self._wakeup:
+            self._wakeup.notify_all()
+        return {**self.get_job(job_id), "duplicate": False}
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a delivery's status and, once finished, its result"""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT job_id, inbox, dedup_key, status, attempts, enqueued_at, started_at, finished_at, result, error, "
+                "(SELECT COUNT(*) FROM webhook_jobs AS ahead WHERE ahead.inbox = webhook_jobs.inbox "
+                "AND ahead.status = 'queued' AND ahead.seq < webhook_jobs.seq) "
+                "FROM webhook_jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def list_jobs(self, inbox: Optional[str] = None, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Return the most recent deliveries, optionally filtered by inbox and status"""
+        conditions, params = [], []
+        if inbox is not None:
+            conditions.append("inbox = ?")
+            params.append(inbox)
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT job_id, inbox, dedup_key, status, attempts, enqueued_at, started_at, finished_at, result, error, NULL "
+                f"FROM webhook_jobs {where} ORDER BY seq DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return delivery counts by inbox and status"""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT inbox, status, COUNT(*) FROM webhook_jobs GROUP BY inbox, status"
+            ).fetchall()
+        inboxes: Dict[str, Dict[str, int]] = {}
+        totals = {status: 0 for status in JOB_STATUSES}
+        for inbox, status, count in rows:
+            inboxes.setdefault(inbox, {s: 0 for s in JOB_STATUSES})[status] = count
+            totals[status] += count
+        return {
+            "workers": self.workers,
+            "inbox_concurrency": self.inbox_concurrency,
+            "retention_seconds": self.retention,
+            **totals,
+            "inboxes": inboxes
+        }
+
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        job_id, inbox, dedup_key, status, attempts, enqueued_at, started_at, finished_at, result, error, ahead = row
+        job = {
+            "job_id": job_id,
+            "inbox": inbox,
+            "dedup_key": dedup_key,
+            "status": status,
+            "attempts": attempts,
+            "enqueued_at": enqueued_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "result": json.loads(result) if result else None,
+            "error": error
+        }
+        if ahead is not None and status == "queued":
+            job["queue_position"] = ahead
+        return job
+
+    def _get_batch_policy(self, inbox: str) -> Optional[Tuple[int, float]]:
+        if self.batch_policy is None:
+            return None
+        now = time.time()
+        cached = self._policies.get(inbox)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        try:
+            policy = self.batch_policy(inbox)
+        except Exception:
+            policy = None
+        self._policies[inbox] = (now + BATCH_POLICY_REFRESH, policy)
+        return policy
+
+    def _claim_ready(self) -> List[tuple]:
+        """
+        Mark the next startable deliveries of every inbox as running
+
+        Returns:
+            (job_ids, inbox, payload) groups; a coalesced group's payload is
+            the list of its deliveries' payloads
+        """
+        claimed = []
+        self._next_deadline = None
+        with self._db_lock:
+            inboxes = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT inbox FROM webhook_jobs WHERE status = 'queued'"
+            )]
+        # Looked up outside the database lock, the policy may load the flow
+        policies = {inbox: self._get_batch_policy(inbox) for inbox in inboxes}
+
+        with self._db_lock:
+            now = time.time()
+            for inbox in inboxes:
+                free = min(
+                    self.inbox_concurrency - self._running.get(inbox, 0),
+                    self.workers - self._in_flight
+                )
+                if free <= 0:
+                    continue
+                policy = policies[inbox]
+                if policy is None:
+                    rows = self._conn.execute(
+                        "SELECT job_id, payload, enqueued_at FROM webhook_jobs WHERE status = 'queued' AND inbox = ? "
+                        "ORDER BY seq LIMIT ?",
+                        (inbox, free)
+                    ).fetchall()
+                    groups = [[row] for row in rows]
+                else:
+                    max_batch, window = policy
+                    rows = self._conn.execute(
+                        "SELECT job_id, payload, enqueued_at FROM webhook_jobs WHERE status = 'queued' AND inbox = ? "
+                        "ORDER BY seq LIMIT ?",
+                        (inbox, max_batch)
+                    ).fetchall()
+                    deadline = rows[0][2] + window
+                    if len(rows) < max_batch and now < deadline:
+                        # Keep collecting until the batch fills up or the window closes
+                        if self._next_deadline is None or deadline < self._next_deadline:
+                            self._next_deadline = deadline
+                        continue
+                    groups = [rows]
+
+                for group in groups:
+                    job_ids = [job_id for job_id, _, _ in group]
+                    self._conn.executemany(
+                        "UPDATE webhook_jobs SET status = 'running', started_at = ?, attempts = attempts + 1 "
+                        "WHERE job_id = ?",
+                        [(now, job_id) for job_id in job_ids]
+                    )
+                    self._running[inbox] = self._running.get(inbox, 0) + 1
+                    self._in_flight += 1
+                    payloads = [json.loads(payload) for _, payload, _ in group]
+                    payload = payloads[0] if policy is None else combine_payloads(payloads)
+                    claimed.append((job_ids, inbox, payload))
+        return claimed
+
+    def _prune(self):
+        if self.retention <= 0:
+            return
+        with self._db_lock:
+            self._conn.execute(
+                "DELETE FROM webhook_jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                (time.time() - self.retention,)
+            )
+
+    def _dispatch_loop(self):
+        last_prune = 0.0
+        while True:
+            with self._wakeup:
+                if self._closed:
+                    return
+            if time.time() - last_prune > 60:
+                self._prune()
+                last_prune = time.time()
+            claimed = self._claim_ready()
+            for job_ids, inbox, payload in claimed:
+                self._threads.submit(self._run_job, job_ids, inbox, payload)
+            with self._wakeup:
+                if not claimed and not self._closed:
+                    timeout = 30.0
+                    if self._next_deadline is not None:
+                        timeout = min(timeout, max(0.0, self._next_deadline - time.time()))
+                    self._wakeup.wait(timeout=timeout)
+
+    def _run_job(self, job_ids: List[str], inbox: str, payload: Any):
+        try:
+            result = self.handler(inbox, payload)
+            status = "done" if result.get("success", True) else "failed"
+            error = result.get("error") if status == "failed" else None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+        # Every delivery of a micro-batch shares the batch's result
+        result_json = json.dumps(result, default=str) if result is not None else None
+        finished_at = time.time()
+        with self._db_lock:
+            self._conn.executemany(
+                "UPDATE webhook_jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE job_id = ?",
+                [(status, finished_at, result_json, error, job_id) for job_id in job_ids]
+            )
+            self._running[inbox] -= 1
+            self._in_flight -= 1
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+# Process-wide queue, started with the API
+_queue: Optional[WebhookQueue] = None
+
+def start_webhook_queue(
+    handler: Callable[[str, Any], Dict[str, Any]],
+    batch_policy: Optional[Callable[[str], Optional[Tuple[int, float]]]] = None
+) -> WebhookQueue:
+    """
+    Start the process-wide webhook queue
+
+    Environment:
+        SMART_FOLDER_WEBHOOK_WORKERS: threads running webhook flows (default 4)
+        SMART_FOLDER_WEBHOOK_CONCURRENCY: deliveries per inbox running at once (default 1)
+        SMART_FOLDER_WEBHOOK_RETENTION: seconds finished deliveries are kept (default 86400)
+        SMART_FOLDER_WEBHOOK_MAX_BATCH: largest micro-batch for window-only batching (default 1000)
+    """
+    global _queue
+    if _queue is None:
+        _queue = WebhookQueue(handler, batch_policy)
+        _queue.start()
+    return _queue
+
+def get_webhook_queue() -> Optional[WebhookQueue]:
+    """Return the running webhook queue, if any"""
+    return _queue
+
+def stop_webhook_queue():
+    """Stop dispatching webhook deliveries"""
+    global _queue
+    queue, _queue = _queue, None
+    if queue is not None:
+        queue.shutdown()
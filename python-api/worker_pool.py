@@ -0,0 +1,518 @@
+"""
+Persistent pool of warm worker processes for node execution.
+
+Each worker imports the executor (and with it everything in AVAILABLE_MODULES)
+once at startup and then serves executions over a pipe, so CPU-bound nodes run
+in parallel across cores instead of serializing on the API process GIL.
+Workers are recycled after a number of executions or once their peak RSS
+crosses a high-water mark.
+
+Each worker runs in its own process group. An execution that is cancelled or
+runs past its timeout is first asked to stop; if it is still running after
+SMART_FOLDER_CANCEL_GRACE seconds the worker's whole process tree is killed
+and a replacement worker is started.
+"""
+import atexit
+import collections
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+from log_buffer import append_log
+from execution_metrics import record_execution
+import supervisor
+
+# Seconds a stopped execution gets to wind down before its worker is killed
+CANCEL_GRACE_SECONDS = float(os.getenv("SMART_FOLDER_CANCEL_GRACE", "5"))
+
+def _peak_rss_bytes() -> int:
+    """Peak resident set size of the current process in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _worker_main(conn, concurrency: int):
+    """Entry point of a worker process: run executions received over the pipe"""
+    # Lead a process group so the pool can kill this worker with everything it started
+    if hasattr(os, "setsid"):
+        try:
+            os.setsid()
+        except OSError:
+            pass
+
+    # Importing the executor pre-loads every module user code may reference
+    import executor
+    import model_registry
+    model_registry.start_preloading()
+
+    send_lock = threading.Lock()
+
+    def forward_log(log_file_id: str, text: str):
+        with send_lock:
+            conn.send(("log", log_file_id, text))
+
+    def report_limit(log_file_id: str, reason: str, message: str):
+        with send_lock:
+            conn.send(("limit", log_file_id, reason, message))
+
+    executor.set_log_sink(forward_log)
+    executor.set_limit_hook(report_limit)
+
+    def run(task_id: str, payload: Dict[str, Any]):
+        start_time = time.time()
+        try:
+            result = executor.run_python_function(**payload)
+        except BaseException as e:
+            # SystemExit and friends from user code must not take the worker down
+            result = executor.build_error_result(
+                f"RuntimeError: {str(e)}", "RuntimeError", start_time, payload.get("log_file_id")
+            )
+        with send_lock:
+            conn.send(("result", task_id, result, _peak_rss_bytes()))
+
+    threads = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="smart-folder-worker")
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        if message[0] == "cancel":
+            _, log_file_id, reason, text = message
+            executor.stop_execution_locally(log_file_id, reason, text)
+            continue
+        _, task_id, payload = message
+        threads.submit(run, task_id, payload)
+
+    threads.shutdown(wait=True)
+    from transcription import shutdown_transcription_pools
+    shutdown_transcription_pools()
+    conn.close()
+
+class WorkerPool:
+    """
+    Pool of long-lived worker processes with per-worker concurrency limits,
+    a shared pending queue and recycling by execution count or peak memory.
+    """
+
+    def __init__(self, size: int, concurrency: int = 1, max_tasks: int = 500, max_rss_mb: int = 2048):
+        self.size = size
+        self.concurrency = max(1, concurrency)
+        self.max_tasks = max_tasks
+        self.max_rss_mb = max_rss_mb
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._workers = []
+        self._pending = collections.deque()
+        self._futures: Dict[str, Any] = {}
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "recycled": 0,
+            "crashed": 0,
+            "cancelled": 0,
+            "timed_out": 0,
+            "killed": 0
+        }
+        self._closed = False
+
+    def start(self):
+        """Spawn the initial set of workers and the timeout monitor"""
+        with self._lock:
+            for _ in range(self.size):
+                self._spawn_worker_locked()
+        monitor = threading.Thread(target=self._monitor, name="smart-folder-pool-monitor", daemon=True)
+        monitor.start()
+
+    def cancel(self, log_file_id: str, reason: str = "cancelled", message: str = "Execution cancelled by user") -> bool:
+        """
+        Stop an execution queued or running in the pool
+
+        Returns:
+            False if the pool doesn't know the execution
+        """
+        to_resolve = None
+        with self._lock:
+            for index, (task_id, payload, future) in enumerate(self._pending):
+                if payload.get("log_file_id") == log_file_id:
+                    del self._pending[index]
+                    to_resolve = (future, payload)
+                    break
+            else:
+                task = self._find_task_locked(log_file_id)
+                if task is None:
+                    return False
+                self._request_stop_locked(task, reason, message)
+                # Release the caller now; the worker is killed later if it doesn't stop
+                to_resolve = (task["future"], task["payload"])
+        from executor import build_stopped_result
+        self._resolve(to_resolve[0], build_stopped_result(reason, message, time.time(), log_file_id))
+        return True
+
+    def submit(self, payload: Dict[str, Any]) -> Future:
+        """Queue an execution and return a future resolving to its result dict"""
+        future = Future()
+        task_id = uuid.uuid4().hex
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Worker pool is shut down")
+            self._pending.append((task_id, payload, future))
+            self._stats["submitted"] += 1
+            self._dispatch_locked()
+        return future
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop all workers, failing anything still queued"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+            pending = list(self._pending)
+            self._pending.clear()
+
+        for task_id, payload, future in pending:
+            self._resolve(future, self._error_result(payload, "Worker pool shut down before execution started"))
+
+        for worker in workers:
+            try:
+                worker["conn"].send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in workers:
+            worker["process"].join(timeout)
+            if worker["process"].is_alive():
+                worker["process"].terminate()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, throughput counters and per-worker state"""
+        now = time.time()
+        with self._lock:
+            return {
+                "size": self.size,
+                "concurrency": self.concurrency,
+                "max_tasks_per_worker": self.max_tasks,
+                "max_rss_mb": self.max_rss_mb,
+                "queue_depth": len(self._pending),
+                "in_flight": sum(w["in_flight"] for w in self._workers),
+                "cancel_grace_seconds": CANCEL_GRACE_SECONDS,
+                **self._stats,
+                "workers": [
+                    {
+                        "pid": w["pid"],
+                        "in_flight": w["in_flight"],
+                        "executed": w["executed"],
+                        "peak_rss_mb": round(w["peak_rss"] / (1024 * 1024), 1),
+                        "retiring": w["retiring"],
+                        "uptime": now - w["started_at"]
+                    }
+                    for w in self._workers
+                ]
+            }
+
+    def _spawn_worker_locked(self) -> Dict[str, Any]:
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.concurrency),
+            name="smart-folder-worker"
+        )
+        process.start()
+        child_conn.close()
+
+        worker = {
+            "process": process,
+            "conn": parent_conn,
+            "pid": process.pid,
+            "in_flight": 0,
+            "executed": 0,
+            "peak_rss": 0,
+            "retiring": False,
+            "dead": False,
+            "killed": False,
+            "started_at": time.time()
+        }
+        self._workers.append(worker)
+
+        reader = threading.Thread(target=self._read_results, args=(worker,), daemon=True)
+        reader.start()
+        return worker
+
+    def _pick_worker_locked(self) -> Optional[Dict[str, Any]]:
+        candidates = [
+            w for w in self._workers
+            if not w["retiring"] and not w["dead"] and w["in_flight"] < self.concurrency
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda w: w["in_flight"])
+
+    def _dispatch_locked(self):
+        while self._pending:
+            worker = self._pick_worker_locked()
+            if worker is None:
+                return
+            task_id, payload, future = self._pending.popleft()
+            if future.cancelled():
+                continue
+            try:
+                worker["conn"].send(("run", task_id, payload))
+            except (OSError, ValueError):
+                # The reader thread will notice the dead worker and replace it
+                worker["dead"] = True
+                self._pending.appendleft((task_id, payload, future))
+                continue
+            future.set_running_or_notify_cancel()
+            worker["in_flight"] += 1
+            now = time.time()
+            timeout = payload.get("timeout")
+            self._futures[task_id] = {
+                "future": future,
+                "worker": worker,
+                "payload": payload,
+                "log_file_id": payload.get("log_file_id"),
+                "started_at": now,
+                "deadline": now + timeout if timeout else None,
+                "stop": None
+            }
+
+    def _find_task_locked(self, log_file_id: str) -> Optional[Dict[str, Any]]:
+        for task in self._futures.values():
+            if task["log_file_id"] == log_file_id:
+                return task
+        return None
+
+    def _request_stop_locked(self, task: Dict[str, Any], reason: str, message: str, notify_worker: bool = True):
+        """Ask a worker to stop an execution and schedule the kill if it doesn't"""
+        if task["stop"] is not None:
+            return
+        task["stop"] = {
+            "reason": reason,
+            "message": message,
+            "kill_at": time.time() + CANCEL_GRACE_SECONDS
+        }
+        self._stats["cancelled" if reason == "cancelled" else "timed_out"] += 1
+        if notify_worker:
+            try:
+                task["worker"]["conn"].send(("cancel", task["log_file_id"], reason, message))
+            except (OSError, ValueError):
+                pass
+
+    def _kill_worker_locked(self, worker: Dict[str, Any]) -> list:
+        """
+        Kill a worker's process tree, start its replacement and return the
+        (future, result) pairs of the executions that were running on it
+        """
+        from executor import build_error_result, build_stopped_result
+        worker["killed"] = True
+        worker["dead"] = True
+        supervisor.kill_process_group(worker["pid"])
+        supervisor.kill_process_tree(worker["pid"])
+        self._stats["killed"] += 1
+
+        resolved = []
+        for task_id, task in list(self._futures.items()):
+            if task["worker"] is not worker:
+                continue
+            del self._futures[task_id]
+            if task["stop"] is not None:
+                if task["log_file_id"]:
+                    append_log(task["log_file_id"], "💀 Execution did not stop in time, its worker process was killed\n")
+                result = build_stopped_result(
+                    task["stop"]["reason"], task["stop"]["message"], task["started_at"], task["log_file_id"]
+                )
+            else:
+                result = build_error_result(
+                    "Worker process was killed while stopping another execution",
+                    "WorkerError", task["started_at"], task["log_file_id"]
+                )
+            record_execution(task["payload"].get("node_type"), result)
+            resolved.append((task["future"], result))
+        worker["in_flight"] = 0
+        if worker in self._workers:
+            self._workers.remove(worker)
+        if not self._closed:
+            # Reclaim the slot right away instead of waiting for the reader to notice
+            self._spawn_worker_locked()
+            self._dispatch_locked()
+        return resolved
+
+    def _monitor(self):
+        """Enforce execution timeouts and kill workers that ignore a stop request"""
+        while True:
+            time.sleep(0.25)
+            resolved = []
+            with self._lock:
+                if self._closed:
+                    return
+                now = time.time()
+                for task in list(self._futures.values()):
+                    if task["worker"]["killed"]:
+                        continue
+                    if task["stop"] is None and task["deadline"] is not None and now > task["deadline"]:
+                        timeout = task["payload"].get("timeout")
+                        self._request_stop_locked(task, "timeout", f"Execution exceeded its {timeout:g}s timeout")
+                        resolved.append((task["future"], None, task))
+                    elif task["stop"] is not None and now >= task["stop"]["kill_at"] and not task["worker"]["killed"]:
+                        resolved.extend((future, result, None) for future, result in self._kill_worker_locked(task["worker"]))
+            for future, result, task in resolved:
+                if result is None:
+                    from executor import build_stopped_result
+                    result = build_stopped_result(
+                        task["stop"]["reason"], task["stop"]["message"], task["started_at"], task["log_file_id"]
+                    )
+                self._resolve(future, result)
+
+    def _should_recycle(self, worker: Dict[str, Any]) -> bool:
+        if self.max_tasks > 0 and worker["executed"] >= self.max_tasks:
+            return True
+        if self.max_rss_mb > 0 and worker["peak_rss"] >= self.max_rss_mb * 1024 * 1024:
+            return True
+        return False
+
+    def _read_results(self, worker: Dict[str, Any]):
+        conn = worker["conn"]
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+
+            if message[0] == "log":
+                _, log_file_id, text = message
+                append_log(log_file_id, text)
+                continue
+
+            if message[0] == "limit":
+                _, log_file_id, reason, text = message
+                with self._lock:
+                    task = self._find_task_locked(log_file_id)
+                    if task is not None:
+                        # The worker already stopped it locally; start the kill timer
+                        self._request_stop_locked(task, reason, text, notify_worker=False)
+                if task is not None:
+                    from executor import build_stopped_result
+                    self._resolve(task["future"], build_stopped_result(reason, text, task["started_at"], log_file_id))
+                continue
+
+            _, task_id, result, peak_rss = message
+            with self._lock:
+                if worker["killed"]:
+                    # Its executions were already resolved when it was killed
+                    continue
+                task = self._futures.pop(task_id, None)
+                future = task["future"] if task is not None else None
+                if task is not None:
+                    record_execution(task["payload"].get("node_type"), result)
+                worker["in_flight"] -= 1
+                worker["executed"] += 1
+                worker["peak_rss"] = peak_rss
+                self._stats["completed" if result.get("success") else "failed"] += 1
+
+                if not worker["retiring"] and not self._closed and self._should_recycle(worker):
+                    worker["retiring"] = True
+                    self._stats["recycled"] += 1
+                    self._spawn_worker_locked()
+
+                if worker["retiring"] and worker["in_flight"] == 0:
+                    try:
+                        conn.send(None)
+                    except (OSError, ValueError):
+                        pass
+
+                self._dispatch_locked()
+
+            if future is not None:
+                self._resolve(future, result)
+
+        # The worker exited, either because it was retired, killed or because it crashed
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            orphaned = [
+                (task_id, task["future"]) for task_id, task in self._futures.items()
+                if task["worker"] is worker
+            ]
+            for task_id, _ in orphaned:
+                del self._futures[task_id]
+            if not worker["retiring"] and not worker["killed"] and not self._closed:
+                self._stats["crashed"] += 1
+                self._spawn_worker_locked()
+            self._dispatch_locked()
+
+        for task_id, future in orphaned:
+            self._resolve(future, self._error_result({}, "Worker process exited unexpectedly"))
+
+        worker["process"].join(5)
+
+    @staticmethod
+    def _resolve(future: Future, result: Dict[str, Any]):
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _error_result(payload: Dict[str, Any], message: str) -> Dict[str, Any]:
+        from executor import build_error_result
+        return build_error_result(message, "WorkerError", time.time(), payload.get("log_file_id"))
+
+# Process-wide pool, only created when SMART_FOLDER_WORKERS is set
+_pool: Optional[WorkerPool] = None
+
+def _pool_size_from_env() -> int:
+    value = os.getenv("SMART_FOLDER_WORKERS", "0").strip().lower()
+    if value == "auto":
+        return os.cpu_count() or 1
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+def start_worker_pool() -> Optional[WorkerPool]:
+    """
+    Start the process-wide worker pool if SMART_FOLDER_WORKERS is configured
+
+    Environment:
+        SMART_FOLDER_WORKERS: number of worker processes, or "auto" for one per core
+        SMART_FOLDER_WORKER_CONCURRENCY: concurrent executions per worker (default 1)
+        SMART_FOLDER_WORKER_MAX_TASKS: executions before a worker is recycled (default 500)
+        SMART_FOLDER_WORKER_MAX_RSS_MB: peak RSS before a worker is recycled (default 2048)
+
+    Returns:
+        The running pool, or None when execution stays in-process
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    size = _pool_size_from_env()
+    if size <= 0:
+        return None
+
+    _pool = WorkerPool(
+        size=size,
+        concurrency=int(os.getenv("SMART_FOLDER_WORKER_CONCURRENCY", "1")),
+        max_tasks=int(os.getenv("SMART_FOLDER_WORKER_MAX_TASKS", "500")),
+        max_rss_mb=int(os.getenv("SMART_FOLDER_WORKER_MAX_RSS_MB", "2048"))
+    )
+    _pool.start()
+    atexit.register(stop_worker_pool)
+    return _pool
+
+def get_worker_pool() -> Optional[WorkerPool]:
+    """Return the running worker pool, if any"""
+    return _pool
+
+def stop_worker_pool():
+    """Shut down the process-wide worker pool"""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
@@ -84,6 +84,10 @@ const AnthropicAdvancedNode: React.FC<NodeProps> = ({ id, data }) => {
             inputObj.stop_sequences = customData.stop_sequences.split(',').map((s: string) => s.trim()).filter((s: string) => s);
         }
 
+        if (customData.cache_responses !== undefined) {
+            inputObj.cache_responses = customData.cache_responses;
+        }
+
         // Execute with the prepared inputs
         executeSmartFolder(id, inputObj);
     };
@@ -457,6 +461,33 @@ const AnthropicAdvancedNode: React.FC<NodeProps> = ({ id, data }) => {
                                 }}
                             />
                         </div>
+
+                        {/* Response Cache */}
+                        <div style={{ marginBottom: '6px' }}>
+                            <label style={{ display: 'block', marginBottom: '2px' }}>
+                                Reuse cached responses for identical requests:
+                            </label>
+                            {/* Unset follows the server's SMART_FOLDER_LLM_CACHE setting */}
+                            <select
+                                value={customData.cache_responses === undefined ? 'default' : customData.cache_responses ? 'on' : 'off'}
+                                onChange={(e) => updateCustomData({
+                                    cache_responses: e.target.value === 'default' ? undefined : e.target.value === 'on'
+                                })}
+                                style={{
+                                    width: '100%',
+                                    background: 'rgba(255,255,255,0.1)',
+                                    color: 'white',
+                                    border: '1px solid rgba(255,255,255,0.3)',
+                                    borderRadius: '4px',
+                                    padding: '4px',
+                                    fontSize: '10px'
+                                }}
+                            >
+                                <option value="default">Server default</option>
+                                <option value="on">Always</option>
+                                <option value="off">Never</option>
+                            </select>
+                        </div>
                     </div>
                 )}
 
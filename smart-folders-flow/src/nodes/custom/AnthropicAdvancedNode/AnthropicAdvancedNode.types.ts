@@ -10,5 +10,6 @@ export interface AnthropicAdvancedNodeData extends BaseNodeData {
         model: string;
         system_prompt: string;
         stop_sequences: string;
+        cache_responses?: boolean;
     };
 } 
\ No newline at end of file
@@ -11,7 +11,6 @@ export const anthropicAdvancedNodeConfig: NodeTypeConfig = {
         nodeType: 'anthropicAdvanced',
         label: 'Claude Pro',
         pythonFunction: `def process(inputs):
-    import anthropic
     import os
     
     # Get API key - check inputs first, then environment variables
@@ -43,8 +42,8 @@ export const anthropicAdvancedNodeConfig: NodeTypeConfig = {
         log_progress(f"🎯 System: {system_prompt[:50]}{'...' if len(system_prompt) > 50 else ''}")
     
     try:
-        # Create Anthropic client
-        client = anthropic.Anthropic(api_key=api_key)
+        # Shared client for this key, with connection reuse, rate limiting and retries
+        client = get_anthropic_client(api_key)
         
         # Prepare message parameters
         message_params = {
@@ -66,7 +65,8 @@ export const anthropicAdvancedNodeConfig: NodeTypeConfig = {
         log_progress("🚀 Making API call...")
         
         # Make API call
-        response = client.messages.create(**message_params)
+        # Identical requests are answered from the response cache when enabled (unset follows SMART_FOLDER_LLM_CACHE)
+        response = client.messages.create(**message_params, use_cache=inputs.get("cache_responses"))
         
         # Extract response text
         result = response.content[0].text
@@ -11,7 +11,6 @@ export const anthropicNodeConfig: NodeTypeConfig = {
         nodeType: 'anthropic',
         label: 'Claude AI',
         pythonFunction: `def process(inputs):
-    import anthropic
     import os
     
     # Get API key - check inputs first, then environment variables
@@ -33,8 +32,8 @@ export const anthropicNodeConfig: NodeTypeConfig = {
     log_progress(f"📝 Prompt: {prompt[:100]}{'...' if len(prompt) > 100 else ''}")
     
     try:
-        # Create Anthropic client
-        client = anthropic.Anthropic(api_key=api_key)
+        # Shared client for this key, with connection reuse, rate limiting and retries
+        client = get_anthropic_client(api_key)
         
         # Make API call
         response = client.messages.create(
@@ -81,12 +81,13 @@ const FileUploaderNode: React.FC<NodeProps> = ({ id, data }) => {
 
                 // Create FormData for file upload
                 const formData = new FormData();
-                formData.append('file', file);
+                // Fields go before the file so the server can write it straight to its destination
                 formData.append('directory', customData.targetDirectory);
                 formData.append('nodeId', id);
                 formData.append('allowedExtensions', customData.allowedExtensions.join(','));
                 formData.append('maxFileSize', customData.maxFileSize.toString());
                 formData.append('overwriteExisting', customData.overwriteExisting.toString());
+                formData.append('file', file);
 
                 // Upload to server
                 const response = await fetch('http://localhost:8000/api/upload-file', {
@@ -140,6 +140,11 @@ const PromptTemplateNode: React.FC<NodeProps> = ({ id, data }) => {
             inputObj.stop_sequences = customData.stop_sequences.split(',').map((s: string) => s.trim()).filter((s: string) => s);
         }
 
+        // Reuse cached responses for identical requests
+        if (customData.cache_responses !== undefined) {
+            inputObj.cache_responses = customData.cache_responses;
+        }
+
         // Execute with the prepared inputs using the Python function
         executeSmartFolder(id, inputObj);
     };
@@ -575,6 +580,32 @@ const PromptTemplateNode: React.FC<NodeProps> = ({ id, data }) => {
                         }}
                     />
                 </div>
+
+                <div style={{ marginTop: '8px' }}>
+                    <label style={{ display: 'block', marginBottom: '2px', fontSize: '10px' }}>
+                        Reuse cached responses for identical requests:
+                    </label>
+                    {/* Unset follows the server's SMART_FOLDER_LLM_CACHE setting */}
+                    <select
+                        value={customData.cache_responses === undefined ? 'default' : customData.cache_responses ? 'on' : 'off'}
+                        onChange={(e) => updateCustomData({
+                            cache_responses: e.target.value === 'default' ? undefined : e.target.value === 'on'
+                        })}
+                        style={{
+                            width: '100%',
+                            background: 'rgba(255,255,255,0.2)',
+                            color: 'white',
+                            border: '1px solid rgba(255,255,255,0.3)',
+                            borderRadius: '4px',
+                            padding: '4px',
+                            fontSize: '10px'
+                        }}
+                    >
+                        <option value="default">Server default</option>
+                        <option value="on">Always</option>
+                        <option value="off">Never</option>
+                    </select>
+                </div>
             </details>
 
             {/* Execute Button */}
@@ -12,5 +12,6 @@ export interface PromptTemplateNodeData extends BaseNodeData {
         model: string;
         system_prompt: string;
         stop_sequences: string;
+        cache_responses?: boolean;
     };
 } 
\ No newline at end of file
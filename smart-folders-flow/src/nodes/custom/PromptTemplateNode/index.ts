@@ -12,7 +12,6 @@ export const promptTemplateNodeConfig: NodeTypeConfig = {
     defaultData: {
         label: 'Prompt Template',
         pythonFunction: `def process(inputs):
-    import anthropic
     import os
     import re
     
@@ -38,7 +37,7 @@ export const promptTemplateNodeConfig: NodeTypeConfig = {
         # Fill template with any input variables
         filled_template = template
         for key, value in inputs.items():
-            if key not in ["api_key", "template", "model", "temperature", "top_p", "top_k", "max_tokens", "system_prompt", "stop_sequences"]:
+            if key not in ["api_key", "template", "model", "temperature", "top_p", "top_k", "max_tokens", "system_prompt", "stop_sequences", "cache_responses"]:
                 # Replace {{key}} with value
                 pattern = f"{{{{\\s*{re.escape(key)}\\s*}}}}"
                 filled_template = re.sub(pattern, str(value), filled_template)
@@ -71,8 +70,8 @@ export const promptTemplateNodeConfig: NodeTypeConfig = {
         log_progress(f"🎭 System: {system_prompt[:50]}{'...' if len(system_prompt) > 50 else ''}")
     
     try:
-        # Create Anthropic client
-        client = anthropic.Anthropic(api_key=api_key)
+        # Shared client for this key, with connection reuse, rate limiting and retries
+        client = get_anthropic_client(api_key)
         
         # Prepare message parameters
         message_params = {
@@ -94,7 +93,8 @@ export const promptTemplateNodeConfig: NodeTypeConfig = {
         log_progress("🚀 Making API call...")
         
         # Make API call
-        response = client.messages.create(**message_params)
+        # Identical requests are answered from the response cache when enabled (unset follows SMART_FOLDER_LLM_CACHE)
+        response = client.messages.create(**message_params, use_cache=inputs.get("cache_responses"))
         
         # Extract response text
         result = response.content[0].text
@@ -137,7 +137,6 @@ export const promptTemplateNodeFactory: NodeFactory = (position) => {
         data: {
             label: `Prompt Template ${Date.now()}`,
             pythonFunction: `def process(inputs):
-    import anthropic
     import os
     import re
     
@@ -163,7 +162,7 @@ export const promptTemplateNodeFactory: NodeFactory = (position) => {
         # Fill template with any input variables
         filled_template = template
         for key, value in inputs.items():
-            if key not in ["api_key", "template", "model", "temperature", "top_p", "top_k", "max_tokens", "system_prompt", "stop_sequences"]:
+            if key not in ["api_key", "template", "model", "temperature", "top_p", "top_k", "max_tokens", "system_prompt", "stop_sequences", "cache_responses"]:
                 # Replace {{key}} with value
                 pattern = f"{{{{\\s*{re.escape(key)}\\s*}}}}"
                 filled_template = re.sub(pattern, str(value), filled_template)
@@ -196,8 +195,8 @@ export const promptTemplateNodeFactory: NodeFactory = (position) => {
         log_progress(f"🎭 System: {system_prompt[:50]}{'...' if len(system_prompt) > 50 else ''}")
     
     try:
-        # Create Anthropic client
-        client = anthropic.Anthropic(api_key=api_key)
+        # Shared client for this key, with connection reuse, rate limiting and retries
+        client = get_anthropic_client(api_key)
         
         # Prepare message parameters
         message_params = {
@@ -219,7 +218,8 @@ export const promptTemplateNodeFactory: NodeFactory = (position) => {
         log_progress("🚀 Making API call...")
         
         # Make API call
-        response = client.messages.create(**message_params)
+        # Identical requests are answered from the response cache when enabled (unset follows SMART_FOLDER_LLM_CACHE)
+        response = client.messages.create(**message_params, use_cache=inputs.get("cache_responses"))
         
         # Extract response text
         result = response.content[0].text
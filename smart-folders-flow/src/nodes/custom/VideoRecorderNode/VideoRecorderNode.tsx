@@ -100,9 +100,10 @@ const VideoRecorderNode: React.FC<NodeProps> = ({ id, data }) => {
         try {
             const formData = new FormData();
             const filename = `recording_${Date.now()}.webm`;
-            formData.append('video', blob, filename);
+            // Fields go before the video so the server can write it straight to its destination
             formData.append('directory', customData.outputDirectory);
             formData.append('nodeId', id);
+            formData.append('video', blob, filename);
 
             const response = await fetch('http://localhost:8000/api/upload-video', {
                 method: 'POST',
@@ -366,6 +366,52 @@ const WebhookNode: React.FC<NodeProps> = ({ id, data }) => {
                 </div>
             )}
 
+            {/* Micro-batching */}
+            {hasInboxName && (
+                <div style={{ marginBottom: '12px' }}>
+                    <div style={{ fontSize: '12px', opacity: 0.8, marginBottom: '4px' }}>
+                        Batching (optional):
+                    </div>
+                    <div style={{ display: 'flex', gap: '8px' }}>
+                        <input
+                            type="number"
+                            min={0}
+                            defaultValue={customData.batchSize || ''}
+                            placeholder="Max payloads"
+                            onBlur={(e) => updateNodeCustomData(id, { batchSize: Number(e.target.value) || 0 })}
+                            className="nodrag"
+                            style={{
+                                flex: 1,
+                                background: 'rgba(255, 255, 255, 0.2)',
+                                border: 'none',
+                                color: 'white',
+                                padding: '6px 8px',
+                                borderRadius: '4px',
+                                fontSize: '12px'
+                            }}
+                        />
+                        <input
+                            type="number"
+                            min={0}
+                            step={0.1}
+                            defaultValue={customData.batchWindow || ''}
+                            placeholder="Window (s)"
+                            onBlur={(e) => updateNodeCustomData(id, { batchWindow: Number(e.target.value) || 0 })}
+                            className="nodrag"
+                            style={{
+                                flex: 1,
+                                background: 'rgba(255, 255, 255, 0.2)',
+                                border: 'none',
+                                color: 'white',
+                                padding: '6px 8px',
+                                borderRadius: '4px',
+                                fontSize: '12px'
+                            }}
+                        />
+                    </div>
+                </div>
+            )}
+
             {/* Status */}
             <div style={{ fontSize: '12px', opacity: 0.9 }}>
                 <span>
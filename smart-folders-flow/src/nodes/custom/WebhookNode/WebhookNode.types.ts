@@ -8,5 +8,8 @@ export interface WebhookNodeData extends BaseNodeData {
         lastData?: any;
         lastReceived?: string;
         autoExecute: boolean;
+        // Coalesce deliveries into lists of up to batchSize payloads or batchWindow seconds
+        batchSize?: number;
+        batchWindow?: number;
     };
 } 
\ No newline at end of file
@@ -122,7 +122,9 @@ const WhisperTranscriptionNode: React.FC<NodeProps> = ({ id, data }) => {
                 model: customData.model,
                 language: customData.language,
                 temperature: customData.temperature,
-                verbose: customData.verbose
+                verbose: customData.verbose,
+                chunked: customData.chunked,
+                chunkSeconds: customData.chunkSeconds
             };
 
             executeSmartFolder(id, input);
@@ -318,6 +320,49 @@ const WhisperTranscriptionNode: React.FC<NodeProps> = ({ id, data }) => {
                 </select>
             </div>
 
+            {/* Transcription Mode */}
+            <div style={{ marginBottom: '12px' }}>
+                <label style={{ display: 'block', fontSize: '12px', marginBottom: '4px', opacity: 0.9 }}>
+                    Mode:
+                </label>
+                <select
+                    value={customData.chunked ? 'chunked' : 'single'}
+                    onChange={(e) => updateNodeCustomData(id, { chunked: e.target.value === 'chunked' })}
+                    style={{
+                        width: '100%',
+                        padding: '6px',
+                        border: '1px solid rgba(255,255,255,0.3)',
+                        borderRadius: '4px',
+                        background: 'rgba(255,255,255,0.1)',
+                        color: 'white',
+                        fontSize: '12px'
+                    }}
+                >
+                    <option value="single">Single pass</option>
+                    <option value="chunked">Parallel chunks (long audio)</option>
+                </select>
+                {customData.chunked && (
+                    <input
+                        type="number"
+                        min={10}
+                        value={customData.chunkSeconds ?? 120}
+                        onChange={(e) => updateNodeCustomData(id, { chunkSeconds: Number(e.target.value) || 120 })}
+                        title="Chunk length in seconds"
+                        style={{
+                            width: '100%',
+                            marginTop: '6px',
+                            padding: '6px',
+                            border: '1px solid rgba(255,255,255,0.3)',
+                            borderRadius: '4px',
+                            background: 'rgba(255,255,255,0.1)',
+                            color: 'white',
+                            fontSize: '12px',
+                            boxSizing: 'border-box'
+                        }}
+                    />
+                )}
+            </div>
+
             {/* Transcribe Button */}
             <button
                 onClick={handleTranscribe}
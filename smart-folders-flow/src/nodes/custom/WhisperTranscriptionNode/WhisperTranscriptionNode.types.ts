@@ -8,6 +8,8 @@ export interface WhisperTranscriptionNodeData extends BaseNodeData {
         language?: string; // Target language (optional, auto-detect if not specified)
         temperature: number; // Temperature for transcription (0.0 to 1.0)
         verbose: boolean; // Enable verbose output
+        chunked?: boolean; // Split long audio and transcribe chunks in parallel
+        chunkSeconds?: number; // Target chunk length for chunked transcription
         lastTranscriptionStatus?: 'success' | 'error' | 'processing';
         lastTranscriptionMessage?: string;
         lastTranscriptionTime?: number;
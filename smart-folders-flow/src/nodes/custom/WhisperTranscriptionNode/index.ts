@@ -15,7 +15,6 @@ def process(inputs):
     """
     Transcribe audio file using Whisper
     """
-    import whisper
     import os
     import time
     import json
@@ -31,6 +30,8 @@ def process(inputs):
     language = inputs.get("language")
     temperature = inputs.get("temperature", 0.0)
     verbose = inputs.get("verbose", False)
+    chunked = inputs.get("chunked", False)
+    chunk_seconds = float(inputs.get("chunkSeconds") or 120)
     
     # If no direct inputs, check manual input
     if not audio_path:
@@ -41,7 +42,7 @@ def process(inputs):
     # If still no audio path, check other inputs
     if not audio_path:
         for key, value in inputs.items():
-            if key not in ["manual", "model", "language", "temperature", "verbose"] and value:
+            if key not in ["manual", "model", "language", "temperature", "verbose", "chunked", "chunkSeconds"] and value:
                 audio_path = str(value).strip()
                 break
     
@@ -55,14 +56,6 @@ def process(inputs):
         return f"Error: Audio file not found: {audio_path}"
     
     try:
-        # Load Whisper model
-        print(f"Loading Whisper model: {model_size}")
-        model = whisper.load_model(model_size)
-        
-        # Transcribe audio
-        print(f"Transcribing audio file: {audio_path}")
-        start_time = time.time()
-        
         # Set up transcription options
         options = {
             "temperature": float(temperature),
@@ -72,8 +65,28 @@ def process(inputs):
         if language:
             options["language"] = str(language)
         
-        # Perform transcription
-        result = model.transcribe(audio_path, **options)
+        start_time = time.time()
+        if chunked:
+            # Split long recordings and transcribe the chunks in parallel,
+            # logging each chunk's text as it completes
+            print(f"Transcribing audio file in {chunk_seconds:.0f}s chunks: {audio_path}")
+            result = transcribe_chunked(
+                audio_path,
+                model_size,
+                chunk_seconds=chunk_seconds,
+                language=options.get("language"),
+                temperature=options["temperature"]
+            )
+        else:
+            # Use the shared Whisper model, loaded once per process
+            print(f"Acquiring Whisper model: {model_size}")
+            with use_model("whisper", model_size) as model:
+                # Transcribe audio
+                print(f"Transcribing audio file: {audio_path}")
+                start_time = time.time()
+                
+                # Perform transcription
+                result = model.transcribe(audio_path, **options)
         
         end_time = time.time()
         processing_time = end_time - start_time
@@ -103,6 +116,8 @@ def process(inputs):
             language: undefined,
             temperature: 0.0,
             verbose: false,
+            chunked: false,
+            chunkSeconds: 120,
         }
     } as WhisperTranscriptionNodeData,
     icon: '🎤',
@@ -132,6 +147,8 @@ export const whisperTranscriptionNodeFactory: NodeFactory = (position) => {
                 language: undefined,
                 temperature: 0.0,
                 verbose: false,
+                chunked: false,
+                chunkSeconds: 120,
             }
         } as WhisperTranscriptionNodeData,
     };
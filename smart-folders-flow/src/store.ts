@@ -128,7 +128,8 @@ const executePythonFunctionWithLogging = async (
     pythonCode: string,
     input: string,
     onUpdate: (logs: string, output?: string) => void,
-    onSessionStart?: (sessionId: string) => void
+    onSessionStart?: (sessionId: string) => void,
+    nodeType?: string
 ): Promise<string> => {
     try {
         // Start execution with logging (now returns immediately)
@@ -141,6 +142,7 @@ const executePythonFunctionWithLogging = async (
                 function_code: pythonCode,
                 input_value: input,
                 timeout: 600,
+                node_type: nodeType,
             }),
         });
 
@@ -159,68 +161,95 @@ const executePythonFunctionWithLogging = async (
             let position = 0;
             let fullLogs = '';
             let finalOutput = '';
-            let isComplete = false;
 
-            // Start polling immediately and continuously
-            const startPolling = () => {
-                const pollLogs = async () => {
+            // Returns true once the final result or error marker has arrived
+            const handleLogContent = (content: string): boolean => {
+                fullLogs += content;
+
+                // Check if we have final output
+                if (fullLogs.includes('--- FINAL RESULT ---')) {
+                    const parts = fullLogs.split('--- FINAL RESULT ---');
+                    const logs = parts[0];
+                    finalOutput = parts[1]?.replace('✅ EXECUTION COMPLETE\n', '').replace('🚫 EXECUTION CANCELLED\n', '').trim() || '';
+                    onUpdate(logs, finalOutput);
+                    return true;
+                } else if (fullLogs.includes('--- ERROR ---')) {
+                    const parts = fullLogs.split('--- ERROR ---');
+                    const logs = parts[0];
+                    finalOutput = `Error: ${parts[1]?.replace('❌ EXECUTION FAILED\n', '').trim() || 'Unknown error'}`;
+                    onUpdate(logs, finalOutput);
+                    return true;
+                }
+
+                // Just update logs, no final output yet
+                onUpdate(fullLogs);
+                return false;
+            };
+
+            // Fallback: long-poll the log endpoint, which holds each request until new output arrives
+            const pollLogs = async (): Promise<void> => {
+                while (true) {
                     try {
-                        const logResponse = await fetch(`${getApiBaseUrl()}/api/logs/${result.log_file_id}?last_position=${position}`);
+                        const logResponse = await fetch(`${getApiBaseUrl()}/api/logs/${result.log_file_id}?last_position=${position}&wait=25`);
                         const logData = await logResponse.json();
 
                         if (logData.content) {
-                            fullLogs += logData.content;
                             position = logData.position;
-
-                            // Check if we have final output
-                            if (fullLogs.includes('--- FINAL RESULT ---')) {
-                                const parts = fullLogs.split('--- FINAL RESULT ---');
-                                const logs = parts[0];
-                                finalOutput = parts[1]?.replace('✅ EXECUTION COMPLETE\n', '').replace('🚫 EXECUTION CANCELLED\n', '').trim() || '';
-                                onUpdate(logs, finalOutput);
-                                isComplete = true;
-                                return finalOutput;
-                            } else if (fullLogs.includes('--- ERROR ---')) {
-                                const parts = fullLogs.split('--- ERROR ---');
-                                const logs = parts[0];
-                                finalOutput = `Error: ${parts[1]?.replace('❌ EXECUTION FAILED\n', '').trim() || 'Unknown error'}`;
-                                onUpdate(logs, finalOutput);
-                                isComplete = true;
-                                return finalOutput;
-                            } else {
-                                // Just update logs, no final output yet
-                                onUpdate(fullLogs);
+                            if (handleLogContent(logData.content)) {
+                                return;
                             }
                         }
 
-                        // Continue polling if not complete
-                        if (!isComplete) {
-                            setTimeout(pollLogs, 500); // Poll every 500ms
+                        if (logData.complete || logData.exists === false) {
+                            return;
                         }
-
                     } catch (error) {
                         console.error('Failed to poll logs:', error);
-                        isComplete = true;
+                        return;
                     }
-                };
-
-                pollLogs();
+                }
             };
 
-            // Start polling immediately
-            startPolling();
+            // Preferred: server push over Server-Sent Events
+            const streamLogs = (): Promise<void> => new Promise((resolve) => {
+                if (typeof EventSource === 'undefined') {
+                    pollLogs().then(resolve);
+                    return;
+                }
 
-            // Wait for completion
-            return new Promise((resolve) => {
-                const checkComplete = () => {
-                    if (isComplete) {
-                        resolve(finalOutput);
-                    } else {
-                        setTimeout(checkComplete, 100);
+                const source = new EventSource(`${getApiBaseUrl()}/api/logs/${result.log_file_id}/stream`);
+                let finished = false;
+                const finish = () => {
+                    finished = true;
+                    source.close();
+                    resolve();
+                };
+
+                source.onmessage = (event) => {
+                    const message = JSON.parse(event.data);
+                    if (message.type === 'log') {
+                        position = message.position;
+                        if (handleLogContent(message.content)) {
+                            finish();
+                        }
+                    } else if (message.type === 'end') {
+                        finish();
                     }
                 };
-                checkComplete();
+
+                source.onerror = () => {
+                    if (finished) {
+                        return;
+                    }
+                    // Stream unavailable or dropped, continue from the last position by polling
+                    finished = true;
+                    source.close();
+                    pollLogs().then(resolve);
+                };
             });
+
+            await streamLogs();
+            return finalOutput;
         }
 
         // Fallback if no log file ID
@@ -515,7 +544,8 @@ const useStore = create<RFState>((set, get) => ({
                                 : n
                         ),
                     });
-                }
+                },
+                node.type
             );
 
             // Update the node with final output
@@ -715,7 +745,7 @@ const useStore = create<RFState>((set, get) => ({
         set({ isLoading: true });
 
         try {
-            const response = await fetch(`${getApiBaseUrl()}/api/flows/load/default?t=${Date.now()}`);
+            const response = await fetch(`${getApiBaseUrl()}/api/flows/load/default`, { cache: 'no-cache' });
 
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);